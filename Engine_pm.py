@@ -8,55 +8,61 @@ Output: the power generated on a timely basis (updates every 2 mins)
 
 """
 
-import pandas as pd
+import numpy as np
+
+from energy_engine import EnergyEngine
+from output_sink import default_sink
+from power_cache import CSVParseError, MissingColumnsError, load_power_series
+
+ROW_TEMPLATE = "Time: {}, Solar Power: {} W, running total = {}"
 
 class SolarPowerModel:
-    def __init__(self, filepath, time_column="Time (UTCG)", power_column="Power (W)"):
+    def __init__(self, filepath, time_column="Time (UTCG)", power_column="Power (W)",
+                 use_cache=True, sink=None):
         self.filepath = filepath
         self.time_column = time_column
         self.power_column = power_column
+        self.use_cache = use_cache  # Keep the parsed CSV in a binary sidecar
+        self.sink = default_sink(sink, ROW_TEMPLATE)  # Where main writes the rows
 
-    def process_csv_data(self):
+    def load_power_series(self):
         try:
-            data = pd.read_csv(self.filepath)
+            return load_power_series(
+                self.filepath, self.time_column, self.power_column, self.use_cache
+            )
         except FileNotFoundError as e:
             print(f"Error: File not found - {e}")
-            return None
-        except pd.errors.ParserError as e:
+        except CSVParseError as e:
             print(f"Error: Parsing error in CSV - {e}")
-            return None
+        except MissingColumnsError as e:
+            print(f"Error: {e}")
+        return None
 
-        if not (self.time_column in data.columns and self.power_column in data.columns):
-            print(f"Error: Columns '{self.time_column}' and '{self.power_column}' not found in CSV")
+    def process_csv_data(self):
+        solar_data = self.load_power_series()
+        if solar_data is None:
             return None
 
-        return data[[self.time_column, self.power_column]]
+        return solar_data.to_frame(self.time_column, self.power_column)
 
     def main(self):
-        running_total = 0
-        solar_data = self.process_csv_data()
+        solar_data = self.load_power_series()
         if solar_data is None:
             return
 
-        for index, row in solar_data.iterrows():
-            time = row[self.time_column]
-            solar_power = row[self.power_column]
-
-            running_total += solar_power
-
-            print(f"Time: {time}, Solar Power: {solar_power} W, running total = {running_total}")
+        # (time, solar power, running total) rows, handed to the sink in one batch
+        running_totals = np.cumsum(solar_data.power)
+        self.sink.write_batch(
+            solar_data.label_strings(), solar_data.power, running_totals
+        )
+        self.sink.flush()
 
     def get_running_total(self):
-        running_total = 0
-        solar_data = self.process_csv_data()
+        solar_data = self.load_power_series()
         if solar_data is None:
             return
 
-        for index, row in solar_data.iterrows():
-            solar_power = row[self.power_column]
-            running_total += solar_power
-
-        return running_total
+        return EnergyEngine(solar_data.power).total_power()
     
 def get_running_total(filepath, time_column="Time (UTCG)", power_column="Power (W)"):
     model = SolarPowerModel(filepath, time_column, power_column)
@@ -7,305 +7,246 @@ Output: the power generated on a timely basis (updates every 2 mins)
 
 """
 
-import pandas as pd
-import schedule
-import time
-import math
-from datetime import datetime
-
-from numpy.typing import NDArray
 import numpy as np
-from ecef2eci import ecef_to_eci
+import os
+
+from battery import Battery, step_durations
+from energy_engine import EnergyEngine
+from energy_index import EnergyIndex
+from output_sink import default_sink
+from power_cache import CSVParseError, MissingColumnsError, load_power_series
+from power_store import PowerStore
+from sample_stream import PowerSampleStream
+from sun_intervals import extract_intervals
+
+ROW_TEMPLATE = "Time: {}, Solar Power: {} W, running total = {}"
 
 
 class SolarPowerModel:
-    def __init__(self, filepath, time_column="Time (UTCG)", power_column="Power (W)"):
+    def __init__(
+        self,
+        filepath,
+        time_column="Time (UTCG)",
+        power_column="Power (W)",
+        follow=False,
+        use_cache=True,
+        sink=None,
+    ):
         self.filepath = filepath
         self.time_column = time_column
         self.power_column = power_column
+        self.follow = follow  # Tail the CSV while it is still being written
+        self.use_cache = use_cache  # Keep the parsed CSV in a binary sidecar
+        self.sink = default_sink(sink, ROW_TEMPLATE)  # Where read_one_row writes
         self.current_row = 0
         self.running_total = 0
+        self.sample_stream = None
+        self.store = None
+        self.index = None
 
-        self.ARC_SECONDS_TO_RADIANS = np.pi / 648000
-        self.EARTH_ROTATION_DERIVATIVE = np.pi * 1.00273781191135448 / 43200
-        self.DERIVATIVE_MATRIX = np.array(
-            [
-                [0.0, -self.EARTH_ROTATION_DERIVATIVE, 0.0],
-                [self.EARTH_ROTATION_DERIVATIVE, 0.0, 0.0],
-                [0.0, 0.0, 0.0],
-            ]
-        )
-
-        ## Precession Polynomials (Arc-Seconds)
-        # Equation 5.16
-        self.precession_x = np.polynomial.polynomial.Polynomial(
-            [-0.016617, 2004.191898, -0.4297829, -0.19861834]
-        )
-        self.precession_y = np.polynomial.polynomial.Polynomial(
-            [-0.006951, -0.025896, -22.4072747, 0.00190059]
-        )
-
-        # Nutation Polynomials (Arc-Seconds)
-        # Equation 5.43
+    def load_power_series(self):
+        try:
+            return load_power_series(
+                self.filepath, self.time_column, self.power_column, self.use_cache
+            )
+        except FileNotFoundError as e:
+            print(f"Error: File not found - {e}")
+        except CSVParseError as e:
+            print(f"Error: Parsing error in CSV - {e}")
+        except MissingColumnsError as e:
+            print(f"Error: {e}")
+        return None
 
-        # Mean_anomaly of the moon (l)
-        self.moon_anomoly = np.polynomial.polynomial.Polynomial(
-            [485868.249036, 1717915923.217800, 31.879200, 0.05163500]
-        )
+    def process_csv_data(self):
+        solar_data = self.load_power_series()
+        if solar_data is None:
+            return None
 
-        # Mean_anomaly of the sun (l-prime)
-        self.sun_anomoly = np.polynomial.polynomial.Polynomial(
-            [1287104.793048, 129596581.048100, -0.55320]
-        )
+        return solar_data.to_frame(self.time_column, self.power_column)
 
-        # Moon thing 1 (F)
-        self.moon_longitude = np.polynomial.polynomial.Polynomial(
-            [335779.526232, 1739527262.8478, -12.7512]
-        )
+    def power_store(self):
+        """Return the series as a PowerStore, memory-mapped when it comes from disk.
 
-        # Moon elongation from sun (D)
-        self.moon_elongation = np.polynomial.polynomial.Polynomial(
-            [1072260.703692, 1602961601.209000, -6.3706]
-        )
+        filepath may also be a PowerStore directory instead of a CSV.
+        """
+        if self.store is not None:
+            return self.store
 
-        # Moon ascension node (Omega)
-        self.moon_ascension = np.polynomial.polynomial.Polynomial(
-            [450160.398036, -6962890.5431, 7.4722]
-        )
+        if os.path.isdir(self.filepath):
+            self.store = PowerStore.open(self.filepath)
+            return self.store
 
-    def process_csv_data(self):
-        try:
-            data = pd.read_csv(self.filepath)
-        except FileNotFoundError as e:
-            print(f"Error: File not found - {e}")
+        solar_data = self.load_power_series()
+        if solar_data is None:
             return None
-        except pd.errors.ParserError as e:
-            print(f"Error: Parsing error in CSV - {e}")
+        if solar_data.times is None:
+            print(f"Error: Column '{self.time_column}' is not a known time format")
             return None
 
-        if not (self.time_column in data.columns and self.power_column in data.columns):
-            print(
-                f"Error: Columns '{self.time_column}' and '{self.power_column}' not found in CSV"
-            )
+        self.store = PowerStore(solar_data.times.view(np.int64), solar_data.power)
+        return self.store
+
+    def window(self, start_time=None, stop_time=None):
+        """Return the samples with start_time <= time < stop_time, without copying."""
+        store = self.power_store()
+        if store is None:
             return None
 
-        # Ensure the power column is numeric
-        data[self.power_column] = pd.to_numeric(
-            data[self.power_column], errors="coerce"
-        )
+        return store.window(start_time, stop_time)
+
+    def energy_index(self):
+        """Return the series' EnergyIndex, for windowed energy queries.
+
+        The index is built on first use, and answers every later query by binary
+        search instead of reading the CSV again.
+        """
+        if self.index is None:
+            store = self.power_store()
+            if store is None:
+                return None
+            self.index = EnergyIndex(store.times, store.power)
+
+        return self.index
+
+    def sun_intervals(self, threshold=None):
+        """Return the sunlit and eclipse intervals of the series.
+
+        Args:
+            threshold (float): Sunlit while power > threshold W. If None, sunlit
+                while the "Solar Intensity" column is > 0, or power > 0 if the CSV
+                has no such column.
+        """
+        solar_data = self.load_power_series()
+        index = self.energy_index()
+        if solar_data is None or index is None:
+            return None
 
-        # Drop rows with non-numeric values in the power column
-        data = data.dropna(subset=[self.power_column])
+        if threshold is None and solar_data.intensity is not None:
+            sunlit = solar_data.intensity > 0
+        else:
+            sunlit = solar_data.power > (0.0 if threshold is None else threshold)
+        return extract_intervals(solar_data.times, solar_data.power, sunlit, index)
 
-        return data[[self.time_column, self.power_column]]
+    def store_sample(self, row):
+        """Return the (time label, power) of a row of the PowerStore, None past its end."""
+        store = self.power_store()
+        if store is None or row >= len(store):
+            return None
+        return str(np.datetime_as_string(store.times[row])), float(store.power[row])
 
     def read_one_row(self):
-        solar_data = self.process_csv_data()
-        if solar_data is None:
-            return
+        if os.path.isdir(self.filepath):
+            # A PowerStore directory has no CSV to stream, rows come from its memory map
+            sample = self.store_sample(self.current_row)
+        else:
+            if self.sample_stream is None:
+                self.sample_stream = PowerSampleStream(
+                    self.filepath, self.time_column, self.power_column, self.follow
+                )
+            try:
+                sample = self.sample_stream.read_sample()
+            except FileNotFoundError as e:
+                print(f"Error: File not found - {e}")
+                self.sample_stream = None
+                return
 
         # Check if there are more rows to read
-        if self.current_row < len(solar_data):
-            # Read the current row
-            row = solar_data.iloc[self.current_row]
-            # Process the row as needed
-            solar_power = float(row[self.power_column])  # Convert to float
-            time_value = row[self.time_column]
+        if sample is not None:
+            time_value, solar_power = sample
 
             # Update the running total
             self.running_total += solar_power
 
-            # Print the current row's data
-            print(
-                f"Time: {time_value}, Solar Power: {solar_power} W, running total = {self.running_total}"
-            )
+            # Write the current row's data
+            self.sink.write(time_value, solar_power, self.running_total)
 
             # Move to the next row
             self.current_row += 1
-        else:
+        elif not self.follow:
             print("No more data to read")
 
+    def publish_rows(self, bus, max_rows=1024):
+        """Publish the next rows, from current_row on, to a SampleBus.
+
+        Rows a full subscriber cannot take stay unread, the next call publishes
+        them again.
+
+        Returns:
+            published (int): Rows published, 0 once the data has run out
+        """
+        store = self.power_store()
+        if store is None:
+            return None
+
+        rows = store.slice(self.current_row, self.current_row + max_rows)
+        published = bus.publish_batch(rows.times, rows.power)
+        self.running_total += float(rows.power[:published].sum())
+        self.current_row += published
+        return published
+
+    async def read_rows(self, interval=1.0):
+        """Read one row every interval seconds, until the data runs out (or forever
+        when following the CSV)."""
+        from replay import ticks
+
+        async for _ in ticks(interval):
+            row = self.current_row
+            self.read_one_row()
+            if self.current_row == row and not self.follow:
+                break
+
     def schedule_reading(self):
-        # Schedule the task to run every 1 seconds
-        schedule.every(1).seconds.do(self.read_one_row)
-        while True:
-            schedule.run_pending()
-            time.sleep(1)
+        # Read a row every 1 seconds, on drift-free ticks
+        import asyncio
+
+        asyncio.run(self.read_rows())
+
+    def replay(self, speedup=1.0):
+        """Return a PowerReplay of the whole series, to run on an event loop (e.g.
+        with other satellites in a ReplayEngine)."""
+        from replay import PowerReplay
+
+        store = self.power_store()
+        if store is None:
+            return None
+        return PowerReplay.from_store(os.path.basename(self.filepath), store, speedup)
 
     def main(self):
         self.schedule_reading()
 
     def get_running_total(self):
-        running_total = 0  # Reset running total to 0
-        solar_data = self.process_csv_data()
+        solar_data = self.load_power_series()
+        if solar_data is None:
+            return
+
+        return EnergyEngine(solar_data.power).total_power()
+
+    def get_energy_summary(self):
+        solar_data = self.load_power_series()
         if solar_data is None:
             return
 
-        for index, row in solar_data.iterrows():
-            solar_power = row[self.power_column]
-            running_total += solar_power
-
-        return running_total
-
-    ## ECEF to ECI Conversion from https://github.com/eribean/Geneci
-    # def ecef_to_eci(
-    #     self,
-    #     ecef_point: NDArray[np.float64],
-    #     utc_time: datetime,
-    #     ecef_velocity: NDArray[np.float64] = None,
-    # ) -> NDArray[np.float64] | tuple[NDArray[np.float64], NDArray[np.float64]]:
-    #     """Convert ECEF point/velocity to ECI point/velocity.
-
-    #     Args:
-    #         ecef_point (NDArray[np.float64]): (3,) 1-d vector describing ECEF point [X, Y, Z]
-    #         utc_time (datetime): Observed time of position and/or velocity
-    #         ecef_velocity (NDArray[np.float64]): (3,) 1-d vector describing ECEF velocity [Vx, Vy, Vz]
-
-    #     Returns:
-    #         eci_point (NDArray[np.float64]): (3,) 1-d vector describing ECI point [X, Y, Z]
-    #         eci_velocity (NDArray[np.float64]): (3,) 1-d vector describing ECI velocity [Vx, Vy, Vz]
-
-    #     Note:
-    #         The velocity is only returned if a velocity is supplied
-    #     """
-    #     # Convert the utc time to julian day, then to century
-    #     julian_day = self.utc_time_to_julian_date(utc_time)
-    #     julian_century = (julian_day - 2451545.0) / 36525.0  # Eq. 5.2
-
-    #     # Get the rotation matrix
-    #     rotation_ecef_to_eci = self.rotation_matrix_ecef_to_eci(julian_century)
-
-    #     # Rotate the position
-    #     eci_point = rotation_ecef_to_eci @ ecef_point
-
-    #     # Rotate the velocity if it is supplied
-    #     if ecef_velocity is not None:
-    #         eci_velocity = (
-    #             rotation_ecef_to_eci @ ecef_velocity
-    #             + (rotation_ecef_to_eci @ self.DERIVATIVE_MATRIX) @ ecef_point
-    #         )
-    #         return eci_point, eci_velocity
-
-    # def rotation_matrix_ecef_to_eci(self, julian_century: float) -> NDArray[np.float64]:
-    #     """Return ecef to eci rotation matrix for a given time.
-
-    #     Rotation is applied to the vector components.
-
-    #     P_eci = R(t) @ P_ecef
-
-    #     Args:
-    #         julian_date (float): Time in Julian centuries.
-
-    #     Returns:
-    #         rotation_matrx (NDArray[float]): 3x3 Matrix to rotate ECEF to ECI
-    #     """
-    #     # Angular motion of the earth
-    #     earth_rotation_angle = (
-    #         2
-    #         * np.pi
-    #         * (0.7790572732640 + 1.00273781191135448 * 36525.0 * julian_century)
-    #     )
-    #     earth_matrix = np.eye(3)
-    #     earth_matrix[0, 0] = earth_matrix[1, 1] = np.cos(earth_rotation_angle)
-    #     earth_matrix[1, 0] = np.sin(earth_rotation_angle)
-    #     earth_matrix[0, 1] = -1 * earth_matrix[1, 0]
-
-    #     # Precession / Nutation rotation matrix (Eq. 5.10)
-    #     gcrs_x, gcrs_y = self.compute_celestial_positions(julian_century)
-    #     a = 0.5 + 0.125 * (gcrs_x * gcrs_x + gcrs_y * gcrs_y)
-
-    #     pn_matrix = np.array(
-    #         [
-    #             [1 - a * gcrs_x * gcrs_x, -a * gcrs_x * gcrs_y, gcrs_x],
-    #             [-a * gcrs_x * gcrs_y, 1 - gcrs_y * gcrs_y, gcrs_y],
-    #             [-gcrs_x, -gcrs_y, 1 - a * (gcrs_x * gcrs_x + gcrs_y * gcrs_y)],
-    #         ]
-    #     )
-
-    #     # Return the rotation
-    #     return pn_matrix @ earth_matrix
-
-    # ## The monstrosity that is the nutation / precession
-    # def compute_celestial_positions(self, julian_century: float) -> tuple[float, float]:
-    #     """Compute the x-y components of the celestial pole in earth reference frame.
-
-    #     Args:
-    #         julian_date (float): Time in Julian centuries.
-
-    #     Returns:
-    #         celestial_x (float): x-component of the pole vector in radians
-    #         celestial_y (float): y-component of the pole vector in radians
-
-    #     """
-    #     celestial_x = self.precession_x(julian_century)
-    #     celestial_y = self.precession_y(julian_century)
-
-    #     # Update for nutation (Coeffients are micro arc-seconds)
-    #     omega = self.moon_ascension(julian_century) * self.ARC_SECONDS_TO_RADIANS
-    #     D = self.moon_elongation(julian_century) * self.ARC_SECONDS_TO_RADIANS
-    #     F = self.moon_longitude(julian_century) * self.ARC_SECONDS_TO_RADIANS
-    #     l_prime = self.sun_anomoly(julian_century) * self.ARC_SECONDS_TO_RADIANS
-
-    #     # Precompute reoccuring argument
-    #     f_omega_d = 2 * (F + omega - D)
-
-    #     celestial_x += 1e-6 * (
-    #         (
-    #             -6844318.44 * np.sin(omega)
-    #             - 523908.04 * np.sin(f_omega_d)
-    #             - 90552.22 * np.sin(2 * (F + omega))
-    #             + 82168.76 * np.sin(2 * omega)
-    #             + 58707.02 * np.sin(l_prime)
-    #         )
-    #         + julian_century
-    #         * (205833.11 * np.cos(omega) + 12814.01 * np.cos(f_omega_d))
-    #     )
-
-    #     celestial_y += 1e-6 * (
-    #         (
-    #             9205236.26 * np.cos(omega)
-    #             + 573033.42 * np.cos(f_omega_d)
-    #             + 97846.69 * np.cos(2 * (F + omega))
-    #             - 89618.24 * np.cos(2 * omega)
-    #             + 22438.42 * np.cos(l_prime - f_omega_d)
-    #         )
-    #         + julian_century
-    #         * (153041.79 * np.sin(omega) + 11714.49 * np.sin(f_omega_d))
-    #     )
-
-    #     return (
-    #         celestial_x * self.ARC_SECONDS_TO_RADIANS,
-    #         celestial_y * self.ARC_SECONDS_TO_RADIANS,
-    #     )
-
-    # def utc_time_to_julian_date(self, utc_time: datetime) -> float:
-    #     """Convert UTC time to Julian date.
-
-    #     This calculation is only valid for days after March 1900.
-
-    #     Args:
-    #         utc_time (datetime): The observation time as a datetime object
-
-    #     Returns:
-    #         julian_date (float): The observation time as a julian date.
-    #     """
-    #     year, month, day = utc_time.year, utc_time.month, utc_time.day
-    #     julian_date = (
-    #         367 * year
-    #         - 7 * (year + (month + 9) // 12) // 4
-    #         + 275 * month // 9
-    #         + day
-    #         + 1721013.5
-    #     )
-
-    #     # update with the frational day
-    #     julian_date += (
-    #         utc_time.hour
-    #         + utc_time.minute / 60
-    #         + (utc_time.second + 1e-6 * utc_time.microsecond) / 3600
-    #     ) / 24
-
-    #     return julian_date
+        return EnergyEngine(solar_data.power, solar_data.times).summary()
+
+    def simulate_battery(self, load_w, battery=None):
+        """Return the battery state of charge after every sample.
+
+        Args:
+            load_w (ArrayLike): Load in watts, a scalar (e.g. from mode_power_w) or one
+                per sample
+            battery (Battery): Battery to run, a full 20 Wh battery if None
+        """
+        solar_data = self.load_power_series()
+        if solar_data is None:
+            return
+        if solar_data.times is None:
+            print(f"Error: Column '{self.time_column}' is not a known time format")
+            return
+
+        battery = Battery() if battery is None else battery
+        return battery.simulate(
+            solar_data.power, load_w, step_durations(solar_data.times)
+        )
 
 
 def get_running_total(filepath, time_column="Time (UTCG)", power_column="Power (W)"):
@@ -325,11 +266,9 @@ if __name__ == "__main__":
     # ecef_velocity = np.array([0.0, 463.8, 0.0])  # Sample velocity at the equator (m/s)
     # utc_time = datetime.utcnow()
 
-    # # Initialize the SolarPowerModel without reading CSV
-    # model = SolarPowerModel(filepath="dummy.csv")  # The filepath is a placeholder
-
     # # Convert ECEF to ECI
-    # eci_point, eci_velocity = model.ecef_to_eci(ecef_point, utc_time, ecef_velocity)
+    # from ecef2eci import FrameTransformer
+    # eci_point, eci_velocity = FrameTransformer().ecef_to_eci(ecef_point, utc_time, ecef_velocity)
 
     # print(f"ECEF Point: {ecef_point}")
     # print(f"ECEF Velocity: {ecef_velocity}")
@@ -13,13 +13,15 @@ the power consumption dictionary).
 
 """
 
-import datetime
-import time
+import os
 from Engine_pm import get_running_total  # Assuming this retrieves total power available
+from budget_loader import load_mode_table
+from mode_table import FIXED_SECONDS_MODES, ActionBatch, ModePowerTable
+from state_machine import StateMachine, open_transitions
+import numpy as np
 
 filepath=r"Enter the filepath"
 
-running_total=get_running_total(filepath)
 state_time=0
 
 
@@ -183,6 +185,48 @@ voltage_consumption = {
 action_state_list=["detumbling", "antenna_deploy" , "detumbed_beacon", "idle", "low_power", "camera", "centrifuge"]
 state_time_dict={}
 
+# The dictionaries compiled into a table, only used if the workbook cannot be read
+builtin_mode_table = ModePowerTable.from_dicts(
+    power_consumption,
+    {
+        "detumbling": detumbling,
+        "antenna_deploy": antenna_deploy,
+        "detumbed_beacon": detumbed_beacon,
+        "idle": idle,
+        "low_power": low_power,
+        "camera": camera,
+        "centrifuge": centrifuge,
+    },
+    FIXED_SECONDS_MODES,
+)
+
+
+def get_mode_table():
+    """
+    Returns the mode table of the Power Budget workbook, loaded on first use.
+
+    The workbook is the one source of the tables, the dictionaries above are only
+    the fallback (with a warning) when it cannot be read.
+    """
+    if "mode_table" not in globals():
+        globals()["mode_table"] = load_mode_table(builtin_mode_table)
+    return globals()["mode_table"]
+
+
+def __getattr__(name):
+    # running_total used to be read from the engine and mode_table from the workbook
+    # on import, now both on first use
+    if name == "mode_table":
+        return get_mode_table()
+    if name == "running_total":
+        if not os.path.exists(filepath):
+            raise FileNotFoundError(
+                f"{__name__}.running_total is read from {__name__}.filepath, which "
+                f"does not exist: {filepath!r}"
+            )
+        globals()["running_total"] = get_running_total(filepath)
+        return globals()["running_total"]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 class FSM:
@@ -191,23 +235,49 @@ class FSM:
     This class handles action processing for the CubeSat, managing power consumption.
     """
 
-    def __init__(self):
-        # Current state of the FSM
-        self.action_state = "idle"  # Assuming "idle" is the initial state
+    def __init__(self, mode_table=None, transitions=None):
+        # The workbook's table unless another one is given
+        if mode_table is None:
+            mode_table = get_mode_table()
+        # Current state of the FSM, mode changes go through the transition table,
+        # which allows them all unless one is given (e.g. default_transitions)
+        if transitions is None:
+            transitions = open_transitions(mode_table)
+        self.state_machine = StateMachine(transitions, "idle")
+        self.mode_table = mode_table
+        self.power_consumption = mode_table.power_consumption()
+
+    @property
+    def action_state(self):
+        return self.state_machine.state_name
+
+    @action_state.setter
+    def action_state(self, state):
+        self.state_machine.enter(state)
+
+    def transition(self, action_state, soc_wh=np.inf, power_w=np.inf):
+        """
+        Moves to the mode if the transition table allows it from the current one.
+
+        Returns:
+            bool: False if the mode may not follow the current one.
+        """
+        return self.state_machine.request(action_state, soc_wh, power_w)
         
         
-    def is_action_valid(self, action_name):
+    def is_action_valid(self, action_name, running_total):
         """
         Checks if the requested action is valid based on available power.
 
         Args:
             action_name (str): The name of the action to be performed.
+            running_total (float): The available power in watts.
 
         Returns:
             bool: True if the action is valid (enough power), False otherwise.
         """
 
-        return running_total >= power_consumption[action_name]
+        return running_total >= self.power_consumption[action_name]
     def process_action(self, action_name,running_total):
       
       """
@@ -221,65 +291,71 @@ class FSM:
             str: "Action successful" if valid, "Insufficient power" otherwise.
       """
 
-      if self.is_action_valid(action_name):
+      if self.is_action_valid(action_name, running_total):
         
         # Update running total with power consumption
-        running_total = running_total-power_consumption[action_name]
+        running_total = running_total-self.power_consumption[action_name]
 
         return running_total
       else:
           return "Insufficient power for action"
     
     def process_action_state(self,action_name,action_state_time):
-        
-        
-        for action_state in action_state_list:
-            if action_state=="antenna_deploy":
-                state_time=antenna_deploy[action_name]
-                state_time_dict[action_state]=state_time
-        
-            elif action_state=="camera":
-                state_time=camera[action_name]
-                state_time_dict[action_state]=state_time
-        
-            elif action_state=="centrifuge":
-                state_time=centrifuge[action_name]
-                state_time_dict[action_state]=state_time
-            
-            elif action_state=="detumbling":
-                state_time=action_state_time*detumbling[action_name]/100
-                state_time_dict[action_state]=state_time
-            
-            elif action_state=="detumbed_beacon":
-                state_time=action_state_time*detumbed_beacon[action_name]/100
-                state_time_dict[action_state]=state_time
-            
-            elif action_state=="idle":
-                state_time=action_state_time*idle[action_name]/100
-                state_time_dict[action_state]=state_time
-            
-            elif action_state=="low_power":
-                state_time=action_state_time*low_power[action_name]/100
-                state_time_dict[action_state]=state_time
- 
-            
-
-# Example usage (replace with your integration)
-action_name = "EPS_LOW_POWER" # enter the action that needs to be performed
-action_state_time= 100 # enter the total time spent in the state
-
-fsm = FSM()  
-result = fsm.process_action(action_name, running_total)
-state_time=fsm.process_action_state(action_name,action_state_time)
-
-
-if result=="Insufficient power for action":
-    print(result)
-else:
-    print(f"Action completed, Power remaining: {result} W")
+        # Time the subsystem is active in every mode: the seconds of a sec_active
+        # mode, a share of the state time in a %_active mode
+        subsystem = self.mode_table.subsystem_ids([action_name])[0]
+        column = self.mode_table.activity[:, subsystem].tolist()
+        for mode, action_state in enumerate(self.mode_table.modes):
+            if self.mode_table.fixed_seconds[mode]:
+                state_time_dict[action_state] = column[mode]
+            else:
+                state_time_dict[action_state] = action_state_time * column[mode] / 100
+        return state_time_dict
+
+    def process_actions(self, action_ids, running_totals, action_state_times):
+        """
+        Evaluates many actions at once, without printing.
 
-    
-for key, value in state_time_dict.items():
-    print(f'{key}:{value} Sec')
+        Args:
+            action_ids (ArrayLike): (N,) subsystem names or mode_table subsystem indices.
+            running_totals (ArrayLike): (N,) available power in watts.
+            action_state_times (ArrayLike): (N,) time spent in each state in seconds.
 
-    
+        Returns:
+            ActionBatch: (N,) energy drawn by the subsystem in Wh and time spent in
+            seconds (NaN where infeasible), and feasible, True where the available
+            power covers the subsystem's power consumption.
+        """
+        subsystems = self.mode_table.subsystem_ids(action_ids)
+        watts = self.mode_table.watts[subsystems]
+        action_state_times = np.asarray(action_state_times, dtype=np.float64)
+
+        feasible = np.asarray(running_totals, dtype=np.float64) >= watts
+        return ActionBatch(
+            np.where(feasible, watts * action_state_times / 3600, np.nan),
+            np.where(feasible, action_state_times, np.nan),
+            feasible,
+        )
+
+
+if __name__ == "__main__":
+
+    running_total = get_running_total(filepath)
+
+    # Example usage (replace with your integration)
+    action_name = "EPS_LOW_POWER" # enter the action that needs to be performed
+    action_state_time= 100 # enter the total time spent in the state
+
+    fsm = FSM()  
+    result = fsm.process_action(action_name, running_total)
+    state_time=fsm.process_action_state(action_name,action_state_time)
+
+
+    if result=="Insufficient power for action":
+        print(result)
+    else:
+        print(f"Action completed, Power remaining: {result} W")
+
+
+    for key, value in state_time_dict.items():
+        print(f'{key}:{value} Sec')
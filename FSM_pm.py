@@ -13,13 +13,16 @@ the power consumption dictionary).
 
 """
 
-import datetime
-import time
+import os
 from Engine_pm import get_running_total  # Assuming this retrieves total power available
+from budget_loader import load_mode_table
+from mode_table import FIXED_SECONDS_MODES, ActionBatch, ModePowerTable
+from output_sink import default_sink
+from state_machine import StateMachine, open_transitions
+import numpy as np
 
 filepath = r"enter the filepath"
 
-running_total=get_running_total(filepath)
 state_time=0
 #x=16.619899999999998
 l1=[] # list to track the time spent in each "functionality"
@@ -187,92 +190,148 @@ voltage_consumption = {
 action_state_list=["detumbling", "antenna_deploy" , "detumbed_beacon", "idle", "low_power", "camera", "centrifuge"]
 state_time_dict={}
 
+# The dictionaries compiled into a table, only used if the workbook cannot be read
+builtin_mode_table = ModePowerTable.from_dicts(
+    power_consumption,
+    {
+        "detumbling": detumbling,
+        "antenna_deploy": antenna_deploy,
+        "detumbed_beacon": detumbed_beacon,
+        "idle": idle,
+        "low_power": low_power,
+        "camera": camera,
+        "centrifuge": centrifuge,
+    },
+    FIXED_SECONDS_MODES,
+)
+
+
+def get_mode_table():
+    """
+    Returns the mode table of the Power Budget workbook, loaded on first use.
+
+    The workbook is the one source of the tables, the dictionaries above are only
+    the fallback (with a warning) when it cannot be read.
+    """
+    if "mode_table" not in globals():
+        globals()["mode_table"] = load_mode_table(builtin_mode_table)
+    return globals()["mode_table"]
+
 def get_total_power_cons():
     sum=0
-    for key,value in power_consumption.items():
+    for key,value in get_mode_table().power_consumption().items():
         sum=sum+value
     return sum
 
+
+def __getattr__(name):
+    # Read the engine and the workbook lazily, importing the FSM should load neither
+    if name == "mode_table":
+        return get_mode_table()
+    if name == "running_total":
+        if not os.path.exists(filepath):
+            raise FileNotFoundError(
+                f"{__name__}.running_total is read from {__name__}.filepath, which "
+                f"does not exist: {filepath!r}"
+            )
+        globals()["running_total"] = get_running_total(filepath)
+        return globals()["running_total"]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 class FSM:
 
     """
     This class handles action processing for the CubeSat, managing power consumption.
     """
 
-    def __init__(self):
-        # Current state of the FSM
-        self.action_state = "idle"  # Assuming "idle" is the initial state
+    def __init__(self, mode_table=None, sink=None, transitions=None):
+        # The workbook's table unless another one is given
+        if mode_table is None:
+            mode_table = get_mode_table()
+        # Current state of the FSM, mode changes go through the transition table,
+        # which allows them all unless one is given (e.g. default_transitions)
+        if transitions is None:
+            transitions = open_transitions(mode_table)
+        self.state_machine = StateMachine(transitions, "idle")
+        self.mode_table = mode_table
+        # (subsystem, seconds active) rows of verbose process_action calls
+        self.sink = default_sink(sink, "time spent in {} is: {}")
+
+    @property
+    def action_state(self):
+        return self.state_machine.state_name
+
+    @action_state.setter
+    def action_state(self, state):
+        self.state_machine.enter(state)
     
-    def process_action(self, action_name,running_total, action_state_time):     
+    def process_action(self, action_name,running_total, action_state_time, verbose=True, soc_wh=np.inf):     
         
-        x=get_total_power_cons()
         if action_name == "power_consumption":
-            return running_total-x
+            return running_total-self.mode_table.total_watts
         
-        if action_name=="antenna_deploy":
-            sum=0
-            for key,value in antenna_deploy.items():
-                sum=sum+value
-                print("time spent in",key,"is:",value)
-            return sum
-        if action_name=="camera":
-            sum=0
-            for key,value in camera.items():
-                sum=sum+value
-                print("time spent in",key,"is:",value)
-            return sum
-        if action_name=="centrifuge":
-            sum=0
-            for key,value in centrifuge.items():
-                sum=sum+value
-                print("time spent in",key,"is:",value)
-            return sum
+        mode = self.mode_table.mode_index.get(action_name)
+        if mode is None:
+            return None
+
+        # A mode the transition table does not allow from the current one is refused
+        if not self.state_machine.dispatch(mode, soc_wh, running_total):
+            return None
         
-        if action_name=="detumbling":
-            sum=0
-            for key,value in detumbling.items():
-                sum=sum+value*action_state_time/100
-                print("time spent in",key,"is:",value*action_state_time/100)
-            return sum
-        if action_name=="detumbed_beacon":
-            sum=0
-            for key,value in detumbed_beacon.items():
-                sum=sum+value*action_state_time/100
-                print("time spent in",key,"is:",value*action_state_time/100)
-            return sum
-        if action_name=="idle":
-            sum=0
-            for key,value in idle.items():
-                sum=sum+value*action_state_time/100
-                print("time spent in",key,"is:",value*action_state_time/100)
-            return sum
-        if action_name=="low_power":
-            sum=0
-            for key,value in low_power.items():
-                sum=sum+value*action_state_time/100
-                print("time spent in",key,"is:",value*action_state_time/100)
-            return sum
+        # sec_active modes give their seconds, %_active modes a share of the state time
+        if verbose:
+            seconds_active = self.mode_table.seconds_active(mode, action_state_time)
+            self.sink.write_batch(self.mode_table.subsystems, seconds_active)
+        return self.mode_table.total_seconds_active(mode, action_state_time)
+
+    def process_actions(self, action_ids, running_totals, action_state_times, soc_wh=np.inf):
+        """
+        Evaluates many mode actions at once, in order, without printing. Feasible
+        actions change the mode as process_action does, so the FSM ends in the mode
+        of the last one the transition table allowed.
+
+        Args:
+            action_ids (ArrayLike): (N,) mode names or mode_table indices.
+            running_totals (ArrayLike): (N,) available power in watts.
+            action_state_times (ArrayLike): (N,) time spent in each state in seconds.
+            soc_wh (ArrayLike): (N,) state of charge, for the transition guards.
+
+        Returns:
+            ActionBatch: (N,) energy drawn by the subsystems in Wh and time spent
+            active in seconds (NaN where infeasible), and feasible, True where the
+            available power covers the total power consumption and the transition
+            table allows the mode.
+        """
+        modes = self.mode_table.mode_ids(action_ids)
+        running_totals = np.asarray(running_totals, dtype=np.float64)
+        feasible = running_totals >= self.mode_table.total_watts
+        # The feasible actions go through the transition table, in order
+        feasible = self.state_machine.replay_where(modes, feasible, soc_wh, running_totals)
+        energy = self.mode_table.energies_wh(modes, action_state_times)
+        time_spent = self.mode_table.total_seconds_active_batch(modes, action_state_times)
+        return ActionBatch(
+            np.where(feasible, energy, np.nan),
+            np.where(feasible, time_spent, np.nan),
+            feasible,
+        )
                 
                 
             
 
-for action in action_state_list:
-    action_name = action # enter the action that needs to be performed
-    action_state_time= 100 # enter the total time spent in the state
+if __name__ == "__main__":
 
-    fsm = FSM()  
-    result = fsm.process_action(action_name, running_total,action_state_time)
+    running_total = get_running_total(filepath)
 
+    for action in action_state_list:
+        action_name = action # enter the action that needs to be performed
+        action_state_time= 100 # enter the total time spent in the state
 
-    if action_name=="power_consumption":
-        print("Total power consumed is",result,"Watts")
-    else:
-        print("Total time spent doing task is",result,"seconds")
-    print(running_total)
-    
+        fsm = FSM()  
+        result = fsm.process_action(action_name, running_total,action_state_time)
 
-    
-    
-        
-        
-    
+
+        if action_name=="power_consumption":
+            print("Total power consumed is",result,"Watts")
+        else:
+            print("Total time spent doing task is",result,"seconds")
+        print(running_total)
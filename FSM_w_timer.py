@@ -16,12 +16,15 @@ the power consumption dictionary).
 
 """
 
-import datetime
-import time
 from Engine_w_timer import (
     get_running_total,
 )  # Assuming this retrieves total power available
-import random
+
+import numpy as np
+
+from budget_loader import load_mode_table
+from mode_table import FIXED_SECONDS_MODES, ActionBatch, ModePowerTable
+from state_machine import StateMachine, open_transitions
 
 filepath = r"enter the filepath"
 
@@ -178,7 +181,42 @@ action_state_list = [
     "centrifuge",
 ]
 state_time_dict = {}
-avg_power_cons = sum(power_consumption.values())  # 16.619899999999998 W
+
+# The dictionaries compiled into a table, only used if the workbook cannot be read
+builtin_mode_table = ModePowerTable.from_dicts(
+    power_consumption,
+    {
+        "detumbling": detumbling,
+        "antenna_deploy": antenna_deploy,
+        "detumbed_beacon": detumbed_beacon,
+        "idle": idle,
+        "low_power": low_power,
+        "camera": camera,
+        "centrifuge": centrifuge,
+    },
+    FIXED_SECONDS_MODES,
+)
+
+
+def get_mode_table():
+    """
+    Returns the mode table of the Power Budget workbook, loaded on first use.
+
+    The workbook is the one source of the tables, the dictionaries above are only
+    the fallback (with a warning) when it cannot be read.
+    """
+    if "mode_table" not in globals():
+        globals()["mode_table"] = load_mode_table(builtin_mode_table)
+    return globals()["mode_table"]
+
+
+def __getattr__(name):
+    # The workbook is read on first use, importing the FSM should not parse it
+    if name == "mode_table":
+        return get_mode_table()
+    if name == "avg_power_cons":
+        return get_mode_table().total_watts
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 class FSM:
@@ -186,19 +224,58 @@ class FSM:
     This class handles action processing for the CubeSat, managing power consumption.
     """
 
-    def __init__(self, battery_capacity=20):
+    def __init__(self, battery_capacity=20, mode_table=None, transitions=None):
         # Current state of the FSM
         self.battery_capacity = (
             battery_capacity  # Assuming the battery capacity is 20 Wh
         )
-        self.action_state = "idle"  # Assuming "idle" is the initial state
+        if mode_table is None:
+            mode_table = get_mode_table()  # The workbook's table
+        self.mode_table = mode_table
+        self.running_total = 0  # Sum of the power samples consumed from a bus
+        # Mode changes go through the transition table, starting in idle. It allows
+        # them all unless one is given, e.g. default_transitions(mode_table, 20)
+        if transitions is None:
+            transitions = open_transitions(mode_table)
+        self.state_machine = StateMachine(transitions, "idle")
+
+    @property
+    def action_state(self):
+        return self.state_machine.state_name
+
+    @action_state.setter
+    def action_state(self, state):
+        self.state_machine.enter(state)
+
+    def transition(self, action_name, soc_wh=np.inf, power_w=np.inf):
+        """Move to the action's mode if the transition table allows it now.
+
+        Returns:
+            accepted (bool): False if the mode may not follow the current one
+        """
+        return self.state_machine.request(action_name, soc_wh, power_w)
+
+    def consume(self, subscription, max_samples=None):
+        """Add the samples waiting in a SampleBus subscription to the running total.
+
+        The engine publishes samples as it reads them, so the FSM keeps up with it
+        incrementally instead of calling get_running_total on the whole file.
+
+        Returns:
+            batch (SampleBatch): The samples consumed, empty if none were waiting
+        """
+        batch = subscription.read(max_samples)
+        self.running_total += float(batch.power.sum())
+        return batch
 
     def process_action(
-        self, action_name, running_total, action_state_time, avg_power_cons
+        self,
+        action_name,
+        running_total,
+        action_state_time,
+        avg_power_cons,
+        soc_wh=np.inf,
     ):
-        total_energy_consumed = 0
-        total_time_spent = 0
-
         # Check if running total power is greater than average power consumption
         if running_total < avg_power_cons:
             print(
@@ -206,56 +283,101 @@ class FSM:
             )
             return None, None
 
-        if action_name in ["detumbling", "detumbed_beacon", "idle", "low_power"]:
-            total_energy_consumed = running_total * (action_state_time / 3600)
-            if total_energy_consumed > self.battery_capacity:
-                print(
-                    f"Action '{action_name}' cannot be performed. Not enough battery capacity."
-                )
-                print(running_total)
-                return None, None
-            total_time_spent = action_state_time
-
-        elif action_name in ["antenna_deploy", "camera", "centrifuge"]:
-            total_energy_consumed = running_total * (
-                sum(eval(action_name).values()) / 3600
+        try:
+            mode = self.mode_table.mode_index[action_name]
+        except KeyError:
+            raise ValueError(f"Unknown action name: {action_name}") from None
+
+        # sec_active modes take their summed seconds, %_active modes the state time
+        total_time_spent = self.mode_table.state_time(mode, action_state_time)
+        total_energy_consumed = running_total * (total_time_spent / 3600)
+        if total_energy_consumed > self.battery_capacity:
+            print(
+                f"Action '{action_name}' cannot be performed. Not enough battery capacity."
             )
-            if total_energy_consumed > self.battery_capacity:
-                print(
-                    f"Action '{action_name}' cannot be performed. Not enough battery capacity."
-                )
-                print(running_total)
-                return None, None
-            total_time_spent = sum(eval(action_name).values())
+            print(running_total)
+            return None, None
 
-        else:
-            raise ValueError(f"Unknown action name: {action_name}")
+        # The mode changes only if the transition table allows it from the current one
+        if not self.state_machine.dispatch(mode, soc_wh, running_total):
+            print(
+                f"Action '{action_name}' cannot be performed from '{self.action_state}'."
+            )
+            return None, None
 
         return total_energy_consumed, total_time_spent
 
+    def process_actions(
+        self,
+        action_ids,
+        running_totals,
+        action_state_times,
+        avg_power_cons=None,
+        soc_wh=np.inf,
+    ):
+        """Evaluate many actions at once, in order, with the checks of process_action.
+
+        Nothing is printed, infeasible actions are flagged instead. Feasible actions
+        change the mode as process_action does, so the FSM ends in the mode of the
+        last one the transition table allowed.
+
+        Args:
+            action_ids (ArrayLike): (N,) mode names or mode_table indices
+            running_totals (ArrayLike): (N,) available power in watts
+            action_state_times (ArrayLike): (N,) state times in seconds
+            avg_power_cons (float): Power the available power has to cover, the
+                summed load of the table's subsystems if None
+            soc_wh (ArrayLike): (N,) state of charge, for the transition guards
+
+        Returns:
+            batch (ActionBatch): (N,) energy in Wh, time spent in seconds (NaN
+                where infeasible) and feasibility flags
+        """
+        if avg_power_cons is None:
+            avg_power_cons = self.mode_table.total_watts
+        modes = self.mode_table.mode_ids(action_ids)
+        running_totals = np.asarray(running_totals, dtype=np.float64)
+
+        total_time_spent = self.mode_table.state_times(modes, action_state_times)
+        total_energy_consumed = running_totals * (total_time_spent / 3600)
+        feasible = (running_totals >= avg_power_cons) & (
+            total_energy_consumed <= self.battery_capacity
+        )
+        # The feasible actions go through the transition table, in order
+        feasible = self.state_machine.replay_where(
+            modes, feasible, soc_wh, running_totals
+        )
+        return ActionBatch(
+            np.where(feasible, total_energy_consumed, np.nan),
+            np.where(feasible, total_time_spent, np.nan),
+            feasible,
+        )
+
 
-# Initialize FSM and retrieve running total
-running_total = 18  # get_running_total(filepath)
+if __name__ == "__main__":
 
-# Instantiate the FSM
-fsm = FSM()
+    # Initialize FSM and retrieve running total
+    running_total = 18  # get_running_total(filepath)
 
-# Calculate average power consumption
-avg_power_cons = sum(power_consumption.values())
+    # Instantiate the FSM
+    fsm = FSM()
 
-# Process action based on current running total
-action_name = action_state_list[2]
-action_state_time = (
-    100  # Provide the number of seconds for the actions that work under %seconds
-)
-energy_consumed, time_spent = fsm.process_action(
-    action_name, running_total, action_state_time, avg_power_cons
-)
+    # Calculate average power consumption
+    avg_power_cons = fsm.mode_table.total_watts
 
-# Check if the action was performed successfully
-if energy_consumed is not None and time_spent is not None:
-    print(
-        f"Total power consumed: {energy_consumed:.2f} Wh, Total time spent doing {action_name}: {time_spent:.2f} seconds"
+    # Process action based on current running total
+    action_name = action_state_list[2]
+    action_state_time = (
+        100  # Provide the number of seconds for the actions that work under %seconds
     )
-else:
-    print("Action could not be performed due to insufficient battery capacity.")
+    energy_consumed, time_spent = fsm.process_action(
+        action_name, running_total, action_state_time, avg_power_cons
+    )
+
+    # Check if the action was performed successfully
+    if energy_consumed is not None and time_spent is not None:
+        print(
+            f"Total power consumed: {energy_consumed:.2f} Wh, Total time spent doing {action_name}: {time_spent:.2f} seconds"
+        )
+    else:
+        print("Action could not be performed due to insufficient battery capacity.")
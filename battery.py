@@ -0,0 +1,211 @@
+"""
+This is the battery model for the power model, it carries the battery state of charge
+from one timestep to the next
+
+Input: the generated power (from SolarPowerModel), the load (from the power consumption
+and mode tables of the FSM) and the timestep
+
+Output: the state of charge in Wh after every timestep
+
+"""
+
+from typing import NamedTuple
+
+from numpy.typing import ArrayLike, NDArray
+import numpy as np
+
+ORBITAL_PERIOD_SECONDS = 5400  # "Orbital Period (s)" of the Power Budget workbook
+
+
+class BatteryTrace(NamedTuple):
+    soc_wh: NDArray[np.float64]  # State of charge after every step
+    clipped_wh: NDArray[np.float64]  # > 0 surplus that did not fit, < 0 unmet load
+
+
+class Battery:
+    """
+    This class simulates the state of charge of the battery over a power series.
+    """
+
+    def __init__(
+        self,
+        capacity_wh=20,
+        charge_efficiency=1.0,
+        discharge_efficiency=1.0,
+        min_soc=0.0,
+        initial_soc=1.0,
+    ):
+        self.capacity_wh = capacity_wh  # Scalar, or one value per simulated lane
+        self.charge_efficiency = charge_efficiency
+        self.discharge_efficiency = discharge_efficiency
+        self.min_soc = min_soc  # Fraction of the capacity that is never used
+        self.initial_soc = initial_soc  # Fraction of the capacity at the start
+
+    def with_capacity(self, capacity_wh, initial_soc=None):
+        """Return a battery of another capacity (and initial_soc, if given) with the
+        same efficiencies and min_soc."""
+        return Battery(
+            capacity_wh,
+            self.charge_efficiency,
+            self.discharge_efficiency,
+            self.min_soc,
+            self.initial_soc if initial_soc is None else initial_soc,
+        )
+
+    def simulate(
+        self, generation_w: ArrayLike, load_w: ArrayLike, step_seconds: ArrayLike
+    ) -> BatteryTrace:
+        """Run the battery over the series.
+
+        The power of sample i is held for step i. Surplus power charges the battery
+        at charge_efficiency, a deficit drains it at 1 / discharge_efficiency, and
+        the charge is kept between min_soc and the full capacity.
+
+        Args:
+            generation_w (ArrayLike): (..., T) generated power in watts
+            load_w (ArrayLike): Load in watts, broadcast against generation_w
+            step_seconds (ArrayLike): Step length, a scalar or (T,)
+
+        Returns:
+            trace (BatteryTrace): (..., T) state of charge and clipped energy in Wh
+        """
+        net_w = np.asarray(generation_w, dtype=np.float64) - np.asarray(
+            load_w, dtype=np.float64
+        )
+        requested_wh = (
+            np.where(
+                net_w > 0,
+                net_w * self.charge_efficiency,
+                net_w / self.discharge_efficiency,
+            )
+            * np.asarray(step_seconds, dtype=np.float64)
+            / 3600.0
+        )
+
+        capacity = np.asarray(self.capacity_wh, dtype=np.float64)
+        lower = capacity * self.min_soc
+        initial = capacity * self.initial_soc
+        soc = clamped_cumsum(requested_wh, lower, capacity, initial)
+
+        lanes = soc.shape[:-1]
+        start = np.clip(
+            np.broadcast_to(initial, lanes),
+            np.broadcast_to(lower, lanes),
+            np.broadcast_to(capacity, lanes),
+        )
+        actual_wh = np.diff(soc, axis=-1, prepend=start[..., np.newaxis])
+        return BatteryTrace(soc, requested_wh - actual_wh)
+
+
+def clamped_cumsum(
+    delta: ArrayLike,
+    lower: ArrayLike,
+    upper: ArrayLike,
+    initial: ArrayLike,
+    chunk_size=None,
+) -> NDArray[np.float64]:
+    """Return x[t] = clip(x[t - 1] + delta[t], lower, upper) along the last axis.
+
+    A clipped step x -> clip(x + d, lo, hi) composed with another is again a clipped
+    step, x -> clip(x + d1 + d2, clip(lo1 + d2, lo, hi), clip(hi1 + d2, lo, hi)).
+    The series is cut into about sqrt(T) chunks of sqrt(T) steps. All chunks are
+    composed at once (numpy over the chunks, a loop over the steps), the chunk maps
+    are chained to give every chunk its start value, and a last pass over all chunks
+    at once fills in the steps. That is O(sqrt(T)) numpy calls instead of T Python
+    steps.
+
+    Args:
+        delta (ArrayLike): (..., T) increments
+        lower, upper, initial (ArrayLike): Bounds and start value, broadcast against
+            the leading axes of delta
+
+    Returns:
+        x (NDArray[np.float64]): (..., T) clipped running sum
+    """
+    delta = np.asarray(delta, dtype=np.float64)
+    shape = delta.shape
+    steps = shape[-1]
+    if delta.size == 0:
+        return np.empty(shape)
+    rows = delta.reshape(-1, steps)
+    lanes = rows.shape[0]
+
+    def per_lane(value):
+        value = np.asarray(value, dtype=np.float64)
+        return np.broadcast_to(value, shape[:-1]).reshape(lanes, 1)
+
+    lower, upper = per_lane(lower), per_lane(upper)
+    start = np.clip(per_lane(initial), lower, upper)[:, 0]
+
+    if chunk_size is None:
+        chunk_size = int(np.ceil(np.sqrt(steps)))
+    chunks = -(-steps // chunk_size)
+
+    # (chunk_size, lanes, chunks) so every step of every chunk is one contiguous row.
+    # The zero padding past the end clips to itself and is dropped again.
+    blocks = np.zeros((lanes, chunks * chunk_size))
+    blocks[:, :steps] = rows
+    blocks = np.ascontiguousarray(
+        blocks.reshape(lanes, chunks, chunk_size).transpose(2, 0, 1)
+    )
+
+    # Every chunk as one map x -> clip(x + shift, low, high)
+    shift = blocks.sum(axis=0)
+    low = np.full((lanes, chunks), -np.inf)
+    high = np.full((lanes, chunks), np.inf)
+    for step in blocks:
+        for bound in (low, high):
+            np.add(bound, step, out=bound)
+            np.maximum(bound, lower, out=bound)
+            np.minimum(bound, upper, out=bound)
+
+    # Chain the chunk maps for the value every chunk starts from
+    chunk_start = np.empty((lanes, chunks))
+    value = start
+    for chunk in range(chunks):
+        chunk_start[:, chunk] = value
+        value = np.clip(value + shift[:, chunk], low[:, chunk], high[:, chunk])
+
+    # Fill in the steps of all chunks at once
+    value = chunk_start
+    for step in blocks:
+        np.add(value, step, out=step)
+        np.maximum(step, lower, out=step)
+        np.minimum(step, upper, out=step)
+        value = step
+
+    x = blocks.transpose(1, 2, 0).reshape(lanes, chunks * chunk_size)[:, :steps]
+    return x.reshape(shape)
+
+
+def mode_power_w(
+    mode: dict,
+    power_consumption: dict,
+    fixed_seconds=False,
+    period_seconds=ORBITAL_PERIOD_SECONDS,
+) -> float:
+    """Return the average power drawn in a mode of the FSM.
+
+    Args:
+        mode (dict): Mode table, e.g. detumbling, giving each subsystem's %_active,
+            or its seconds active per orbit if fixed_seconds
+        power_consumption (dict): Power of every subsystem in watts
+        fixed_seconds (bool): The mode table is in seconds, not percent
+        period_seconds (float): Orbit the seconds are spread over
+
+    Returns:
+        power (float): Average load in watts
+    """
+    weighted = sum(power_consumption[name] * value for name, value in mode.items())
+    return weighted / period_seconds if fixed_seconds else weighted / 100
+
+
+def step_durations(times: ArrayLike) -> NDArray[np.float64]:
+    """Return how long every sample is held in seconds, the last as long as the one before."""
+    times = np.asarray(times)
+    if times.dtype.kind == "M":
+        seconds = (times - times[0]).astype("timedelta64[ns]").astype(np.int64) / 1e9
+    else:
+        seconds = times.astype(np.float64)
+    steps = np.diff(seconds)
+    return np.append(steps, steps[-1:] if steps.size else 0.0)
@@ -0,0 +1,92 @@
+"""
+Benchmark of the battery state of charge simulation over a year at 1 s resolution
+
+The bundled Satellite1 power profile (1 min samples) is held for 60 s per sample and
+tiled up to --days days. The numpy kernel is checked against a plain Python loop on
+the first --loop-steps steps, and the loop time is extrapolated to the whole series.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_battery --days 365
+
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from battery import Battery, mode_power_w
+from power_cache import read_power_csv
+
+CSV_PATH = "Satellite1_Solar_Panel_Power.csv"
+
+# power_consumption and low_power of FSM_w_timer, which runs its demo on import
+POWER_CONSUMPTION = {
+    "ADCS_OFF": 0,
+    "CAM_OFF": 0,
+    "OBC_LOW_POWER": 0.6,
+    "COMMS_IDLE": 0.0005,
+    "EPS_LOW_POWER": 0.043,
+}
+LOW_POWER = {
+    "ADCS_OFF": 100,
+    "CAM_OFF": 100,
+    "OBC_LOW_POWER": 100,
+    "COMMS_IDLE": 100,
+    "EPS_LOW_POWER": 100,
+}
+
+
+def python_loop(battery, generation_w, load_w, step_seconds):
+    capacity = battery.capacity_wh
+    lower = capacity * battery.min_soc
+    soc = capacity * battery.initial_soc
+    trace = []
+    for power in generation_w:
+        net = power - load_w
+        if net > 0:
+            net *= battery.charge_efficiency
+        else:
+            net /= battery.discharge_efficiency
+        soc = min(max(soc + net * step_seconds / 3600, lower), capacity)
+        trace.append(soc)
+    return trace
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--loop-steps", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    steps = args.days * 86400
+    per_second = np.repeat(read_power_csv(CSV_PATH).power, 60)
+    generation_w = np.tile(per_second, -(-steps // per_second.size))[:steps]
+    load_w = mode_power_w(LOW_POWER, POWER_CONSUMPTION)
+    battery = Battery(20, charge_efficiency=0.95, discharge_efficiency=0.95)
+
+    loop_steps = min(args.loop_steps, steps)
+    start = time.perf_counter()
+    expected = python_loop(battery, generation_w[:loop_steps], load_w, 1.0)
+    loop_seconds = (time.perf_counter() - start) * steps / loop_steps
+
+    start = time.perf_counter()
+    trace = battery.simulate(generation_w, load_w, 1.0)
+    kernel_seconds = time.perf_counter() - start
+    assert np.allclose(trace.soc_wh[:loop_steps], expected)
+
+    print(f"steps: {steps:,} ({args.days} days at 1 s), load {load_w:.4f} W")
+    print(
+        f"python loop:  {loop_seconds:8.3f} s (extrapolated from {loop_steps:,} steps)"
+    )
+    print(
+        f"numpy kernel: {kernel_seconds:8.3f} s  ({loop_seconds / kernel_seconds:,.0f}x)"
+    )
+    print(
+        f"final SoC = {trace.soc_wh[-1]:.3f} Wh, min SoC = {trace.soc_wh.min():.3f} Wh"
+    )
+
+
+if __name__ == "__main__":
+    main()
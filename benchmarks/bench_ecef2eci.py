@@ -0,0 +1,163 @@
+"""
+Microbenchmark of the per-call latency of the ECEF to ECI conversion
+
+"before" is the old code path: numpy Polynomial objects evaluated on every call,
+with the constants stored on a SolarPowerModel-like object. "after" is
+FrameTransformer with its Horner coefficient arrays, and the batched call
+amortised per epoch, with and without the PN cache.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_ecef2eci
+
+"""
+
+import timeit
+from datetime import datetime
+
+import numpy as np
+
+from ecef2eci import (
+    ARC_SECONDS_TO_RADIANS,
+    MOON_ASCENSION,
+    MOON_ELONGATION,
+    MOON_LONGITUDE,
+    PRECESSION_X,
+    PRECESSION_Y,
+    SUN_ANOMOLY,
+    FrameTransformer,
+)
+
+
+class PolynomialTransformer(FrameTransformer):
+    """The pre-FrameTransformer evaluation, kept here as the baseline."""
+
+    def __init__(self):
+        super().__init__()
+        Polynomial = np.polynomial.polynomial.Polynomial
+        self.precession_x = Polynomial(PRECESSION_X)
+        self.precession_y = Polynomial(PRECESSION_Y)
+        self.sun_anomoly = Polynomial(SUN_ANOMOLY)
+        self.moon_longitude = Polynomial(MOON_LONGITUDE)
+        self.moon_elongation = Polynomial(MOON_ELONGATION)
+        self.moon_ascension = Polynomial(MOON_ASCENSION)
+
+    def rotation_matrix_ecef_to_eci(self, julian_century):
+        earth_rotation_angle = (
+            2
+            * np.pi
+            * (0.7790572732640 + 1.00273781191135448 * 36525.0 * julian_century)
+        )
+        earth_matrix = np.eye(3)
+        earth_matrix[0, 0] = earth_matrix[1, 1] = np.cos(earth_rotation_angle)
+        earth_matrix[1, 0] = np.sin(earth_rotation_angle)
+        earth_matrix[0, 1] = -1 * earth_matrix[1, 0]
+
+        gcrs_x, gcrs_y = self.compute_celestial_positions(julian_century)
+        a = 0.5 + 0.125 * (gcrs_x * gcrs_x + gcrs_y * gcrs_y)
+
+        pn_matrix = np.array(
+            [
+                [1 - a * gcrs_x * gcrs_x, -a * gcrs_x * gcrs_y, gcrs_x],
+                [-a * gcrs_x * gcrs_y, 1 - gcrs_y * gcrs_y, gcrs_y],
+                [-gcrs_x, -gcrs_y, 1 - a * (gcrs_x * gcrs_x + gcrs_y * gcrs_y)],
+            ]
+        )
+        return pn_matrix @ earth_matrix
+
+    def compute_celestial_positions(self, julian_century):
+        celestial_x = self.precession_x(julian_century)
+        celestial_y = self.precession_y(julian_century)
+
+        omega = self.moon_ascension(julian_century) * ARC_SECONDS_TO_RADIANS
+        D = self.moon_elongation(julian_century) * ARC_SECONDS_TO_RADIANS
+        F = self.moon_longitude(julian_century) * ARC_SECONDS_TO_RADIANS
+        l_prime = self.sun_anomoly(julian_century) * ARC_SECONDS_TO_RADIANS
+        f_omega_d = 2 * (F + omega - D)
+
+        celestial_x += 1e-6 * (
+            (
+                -6844318.44 * np.sin(omega)
+                - 523908.04 * np.sin(f_omega_d)
+                - 90552.22 * np.sin(2 * (F + omega))
+                + 82168.76 * np.sin(2 * omega)
+                + 58707.02 * np.sin(l_prime)
+            )
+            + julian_century
+            * (205833.11 * np.cos(omega) + 12814.01 * np.cos(f_omega_d))
+        )
+        celestial_y += 1e-6 * (
+            (
+                9205236.26 * np.cos(omega)
+                + 573033.42 * np.cos(f_omega_d)
+                + 97846.69 * np.cos(2 * (F + omega))
+                - 89618.24 * np.cos(2 * omega)
+                + 22438.42 * np.cos(l_prime - f_omega_d)
+            )
+            + julian_century
+            * (153041.79 * np.sin(omega) + 11714.49 * np.sin(f_omega_d))
+        )
+        return (
+            celestial_x * ARC_SECONDS_TO_RADIANS,
+            celestial_y * ARC_SECONDS_TO_RADIANS,
+        )
+
+
+def per_call_microseconds(function, number):
+    return min(timeit.repeat(function, number=number, repeat=5)) / number * 1e6
+
+
+def main():
+    point = np.array([6378137.0, 0.0, 0.0])
+    velocity = np.array([0.0, 463.8, 0.0])
+    utc_time = datetime(2024, 6, 1, 12, 0, 0)
+
+    before = PolynomialTransformer()
+    after = FrameTransformer()
+    assert np.allclose(
+        before.ecef_to_eci(point, utc_time, velocity),
+        after.ecef_to_eci(point, utc_time, velocity),
+        rtol=0,
+        atol=1e-6,
+    )
+
+    count = 100_000
+    points = np.tile(point, (count, 1))
+    velocities = np.tile(velocity, (count, 1))
+    times = np.datetime64(utc_time) + np.arange(count) * np.timedelta64(1, "s")
+
+    rows = [
+        ("before: ecef_to_eci", lambda: before.ecef_to_eci(point, utc_time, velocity)),
+        ("after:  ecef_to_eci", lambda: after.ecef_to_eci(point, utc_time, velocity)),
+        (
+            "before: compute_celestial_positions",
+            lambda: before.compute_celestial_positions(0.24),
+        ),
+        (
+            "after:  compute_celestial_positions",
+            lambda: after.compute_celestial_positions(0.24),
+        ),
+    ]
+    for name, function in rows:
+        print(f"{name:40s} {per_call_microseconds(function, 2000):8.2f} us/call")
+
+    batch = per_call_microseconds(
+        lambda: after.ecef_to_eci_batch(points, times, velocities), 1
+    )
+    print(f"{'after:  ecef_to_eci_batch':40s} {batch / count:8.3f} us/epoch")
+
+    for bucket_seconds in (60, 3600):
+        cached = FrameTransformer(pn_cache_seconds=bucket_seconds)
+        batch = per_call_microseconds(
+            lambda: cached.ecef_to_eci_batch(points, times, velocities), 1
+        )
+        error = cached.pn_cache_error(times)
+        print(
+            f"{f'after:  batch, {bucket_seconds} s PN cache':40s} {batch / count:8.3f} us/epoch"
+            f"  (max error {error.max_microarcseconds:.1f} uas,"
+            f" rms {error.rms_microarcseconds:.1f} uas)"
+        )
+
+
+if __name__ == "__main__":
+    main()
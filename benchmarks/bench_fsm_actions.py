@@ -0,0 +1,136 @@
+"""
+Benchmark of FSM_w_timer.FSM.process_action: the old eval() and dict sums against the
+compiled mode table
+
+--actions random (action, running total, state time) triples are evaluated by both
+implementations, on the mode tables of the same FSM, and the results are compared.
+The battery (--battery-capacity) and the state times are drawn so that every mode,
+the sec_active ones included, has both feasible and infeasible actions. Infeasible
+actions print a message, so stdout is sent to os.devnull while timing.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_fsm_actions --actions 1000000
+
+"""
+
+import argparse
+import contextlib
+import os
+import time
+
+import numpy as np
+
+import FSM_w_timer
+
+
+def mode_dicts(mode_table):
+    """Return the {mode: {subsystem: activity}} dictionaries of a mode table."""
+    return {
+        mode: dict(zip(mode_table.subsystems, row))
+        for mode, row in zip(mode_table.modes, mode_table.activity.tolist())
+    }
+
+
+# Mode name -> dictionary the legacy code evals, filled from the FSM's table in main
+legacy_tables = {}
+
+
+def legacy_process_action(
+    fsm, action_name, running_total, action_state_time, avg_power_cons
+):
+    """process_action as it was before the mode table, eval() and all."""
+    total_energy_consumed = 0
+    total_time_spent = 0
+
+    if running_total < avg_power_cons:
+        print(
+            f"Action '{action_name}' cannot be performed. Running total {running_total:.2f}W is less than average power consumption {avg_power_cons:.2f}W."
+        )
+        return None, None
+
+    if action_name in ["detumbling", "detumbed_beacon", "idle", "low_power"]:
+        total_energy_consumed = running_total * (action_state_time / 3600)
+        if total_energy_consumed > fsm.battery_capacity:
+            print(
+                f"Action '{action_name}' cannot be performed. Not enough battery capacity."
+            )
+            print(running_total)
+            return None, None
+        total_time_spent = action_state_time
+
+    elif action_name in ["antenna_deploy", "camera", "centrifuge"]:
+        table = eval(action_name, legacy_tables)
+        total_energy_consumed = running_total * (sum(table.values()) / 3600)
+        if total_energy_consumed > fsm.battery_capacity:
+            print(
+                f"Action '{action_name}' cannot be performed. Not enough battery capacity."
+            )
+            print(running_total)
+            return None, None
+        total_time_spent = sum(table.values())
+
+    else:
+        raise ValueError(f"Unknown action name: {action_name}")
+
+    return total_energy_consumed, total_time_spent
+
+
+def timed_loop(process_action, fsm, actions, running_totals, state_times):
+    avg_power_cons = fsm.mode_table.total_watts
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        start = time.perf_counter()
+        results = [
+            process_action(fsm, action, running_total, state_time, avg_power_cons)
+            for action, running_total, state_time in zip(
+                actions, running_totals, state_times
+            )
+        ]
+        seconds = time.perf_counter() - start
+    return seconds, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--actions", type=int, default=1_000_000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--battery-capacity", type=float, default=100.0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    modes = FSM_w_timer.action_state_list[1:]
+    actions = [modes[index] for index in rng.integers(len(modes), size=args.actions)]
+    running_totals = rng.uniform(10, 30, args.actions).tolist()
+    state_times = rng.uniform(0, 14400, args.actions).tolist()
+
+    fsm = FSM_w_timer.FSM(args.battery_capacity)
+    legacy_tables.update(mode_dicts(fsm.mode_table))
+    legacy_seconds, expected = timed_loop(
+        legacy_process_action, fsm, actions, running_totals, state_times
+    )
+    table_seconds, results = timed_loop(
+        FSM_w_timer.FSM.process_action, fsm, actions, running_totals, state_times
+    )
+    assert results == expected
+    # A comparison of infeasible results only would prove nothing
+    for mode in modes:
+        done = [
+            result[0] is not None
+            for action, result in zip(actions, results)
+            if action == mode
+        ]
+        if all(done) or not any(done):
+            raise AssertionError(f"{mode}: {sum(done)} of {len(done)} feasible")
+
+    per_action = 1e6 / args.actions
+    print(f"actions: {args.actions:,}")
+    print(
+        f"eval + dict sums:  {legacy_seconds:8.3f} s  ({legacy_seconds * per_action:.2f} us/action)"
+    )
+    print(
+        f"mode table:        {table_seconds:8.3f} s  ({table_seconds * per_action:.2f} us/action, {legacy_seconds / table_seconds:.1f}x)"
+    )
+
+
+if __name__ == "__main__":
+    main()
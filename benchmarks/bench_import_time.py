@@ -0,0 +1,102 @@
+"""
+Benchmark of the start-up cost of the power model modules, with python -X importtime
+
+Every module is imported --repeats times in a fresh interpreter, and once more with
+the Power Budget sidecar moved aside, as on a clean checkout. The median cumulative
+import time and the time without the sidecar are checked against --target-ms, and
+pandas, schedule and openpyxl, which only the CSV parsing, the timed reading and the
+workbook parsing need, must not be imported at all. The exit status is 1 if a module
+misses the target.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_import_time --target-ms 250
+
+"""
+
+import argparse
+import contextlib
+import os
+import statistics
+import subprocess
+import sys
+
+from budget_loader import BUDGET_PATH, SIDECAR_SUFFIX
+
+MODULES = ["FSM", "FSM_pm", "FSM_w_timer", "Engine_pm", "Engine_w_timer"]
+LAZY_MODULES = ["pandas", "schedule", "openpyxl"]
+
+
+@contextlib.contextmanager
+def without_sidecar():
+    """Move the Power Budget sidecar aside, and put it back afterwards."""
+    sidecar = BUDGET_PATH + SIDECAR_SUFFIX
+    moved = sidecar + ".bench"
+    present = os.path.exists(sidecar)
+    if present:
+        os.replace(sidecar, moved)
+    try:
+        yield
+    finally:
+        if present:
+            os.replace(moved, sidecar)
+        elif os.path.exists(sidecar):
+            os.remove(sidecar)  # Written by the run, leave the tree as it was
+
+
+def import_once(module):
+    """Return the cumulative import time of module in us and the lazy modules it loaded."""
+    check = (
+        f"import sys, {module}; "
+        f"print(','.join(name for name in {LAZY_MODULES!r} if name in sys.modules))"
+    )
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", check],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+    # "import time: self [us] | cumulative | imported package"
+    for line in result.stderr.splitlines():
+        fields = line.split("|")
+        if len(fields) == 3 and fields[2].strip() == module:
+            cumulative_us = int(fields[1])
+            break
+    else:
+        raise RuntimeError(f"No import time reported for {module}")
+
+    loaded = [name for name in result.stdout.strip().split(",") if name]
+    return cumulative_us, loaded
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--target-ms", type=float, default=250.0)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("modules", nargs="*", default=MODULES)
+    args = parser.parse_args()
+
+    failed = False
+    print(f"target: {args.target_ms:.0f} ms, median of {args.repeats} runs")
+    for module in args.modules:
+        runs = [import_once(module) for _ in range(args.repeats)]
+        median_ms = statistics.median(cumulative for cumulative, _ in runs) / 1000
+        with without_sidecar():
+            runs.append(import_once(module))
+        cold_ms = runs[-1][0] / 1000
+        loaded = sorted({name for _, names in runs for name in names})
+
+        ok = max(median_ms, cold_ms) <= args.target_ms and not loaded
+        failed |= not ok
+        note = f", loads {', '.join(loaded)}" if loaded else ""
+        print(
+            f"{module:16s} {median_ms:8.1f} ms  {cold_ms:8.1f} ms without sidecar  "
+            f"{'ok' if ok else 'MISSED'}{note}"
+        )
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Benchmark of loading a solar power CSV: the CSV path against the binary sidecar cache
+
+The bundled Satellite1 power profile is tiled up to --rows samples and written to a
+temporary CSV, which is then loaded through the plain CSV path, a cold cache (parse
+and write the sidecar) and a warm cache (memory-map the sidecar).
+
+Run from the repository root:
+
+    python -m benchmarks.bench_power_cache --rows 2000000
+
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from power_cache import load_power_series, read_power_csv
+
+CSV_PATH = "Satellite1_Solar_Panel_Power.csv"
+
+
+def write_scaled_csv(path, rows):
+    series = read_power_csv(CSV_PATH)
+    repeats = -(-rows // len(series.power))
+    labels = np.tile(series.labels.astype(str), repeats)[:rows]
+    power = np.tile(series.power, repeats)[:rows]
+    with open(path, "w") as file:
+        file.write("Time (UTCG),Power (W),Solar Intensity\n")
+        file.writelines(
+            f"{label},{value},{int(value > 0)}\n" for label, value in zip(labels, power)
+        )
+
+
+def timed(function):
+    start = time.perf_counter()
+    result = function()
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=2_000_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "power.csv")
+        write_scaled_csv(path, args.rows)
+
+        csv_seconds, expected = timed(lambda: read_power_csv(path))
+        cold_seconds, _ = timed(lambda: load_power_series(path))
+        warm_seconds, cached = timed(lambda: load_power_series(path))
+        frame_seconds, _ = timed(lambda: cached.to_frame())
+        assert np.array_equal(cached.power, expected.power)
+
+    print(f"rows: {args.rows:,}")
+    print(f"CSV parse:             {csv_seconds:8.3f} s")
+    print(f"cold cache (+write):   {cold_seconds:8.3f} s")
+    print(
+        f"warm cache (mmap):     {warm_seconds:8.3f} s  ({csv_seconds / warm_seconds:,.0f}x)"
+    )
+    print(f"warm cache + to_frame: {warm_seconds + frame_seconds:8.3f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Benchmark of the running total: the old iterrows loop against the numpy energy engine
+
+The bundled Satellite1 power profile is tiled up to --rows samples (10M by default).
+The iterrows loop is far too slow to run on all of them, so it is timed on
+--loop-rows samples and extrapolated linearly.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_running_total --rows 10000000
+
+"""
+
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from energy_engine import EnergyEngine
+
+CSV_PATH = "Satellite1_Solar_Panel_Power.csv"
+TIME_COLUMN = "Time (UTCG)"
+POWER_COLUMN = "Power (W)"
+
+
+def load_scaled_frame(rows):
+    data = pd.read_csv(CSV_PATH)
+    data[POWER_COLUMN] = pd.to_numeric(data[POWER_COLUMN], errors="coerce")
+    data = data.dropna(subset=[POWER_COLUMN])[[TIME_COLUMN, POWER_COLUMN]]
+
+    repeats = -(-rows // len(data))
+    return pd.DataFrame(
+        {
+            TIME_COLUMN: np.tile(data[TIME_COLUMN].to_numpy(), repeats)[:rows],
+            POWER_COLUMN: np.tile(data[POWER_COLUMN].to_numpy(), repeats)[:rows],
+        }
+    )
+
+
+def iterrows_running_total(solar_data):
+    running_total = 0
+    for index, row in solar_data.iterrows():
+        running_total += row[POWER_COLUMN]
+    return running_total
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--loop-rows", type=int, default=200_000)
+    args = parser.parse_args()
+
+    solar_data = load_scaled_frame(args.rows)
+    loop_rows = min(args.loop_rows, args.rows)
+
+    start = time.perf_counter()
+    loop_total = iterrows_running_total(solar_data.iloc[:loop_rows])
+    loop_seconds = (time.perf_counter() - start) * args.rows / loop_rows
+
+    start = time.perf_counter()
+    summary = EnergyEngine.from_frame(solar_data, TIME_COLUMN, POWER_COLUMN).summary()
+    engine_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    engine_total = EnergyEngine.from_frame(
+        solar_data, power_column=POWER_COLUMN
+    ).total_power()
+    total_seconds = time.perf_counter() - start
+
+    check = EnergyEngine(solar_data[POWER_COLUMN].iloc[:loop_rows]).total_power()
+    assert check == loop_total, (check, loop_total)
+
+    print(f"rows: {args.rows:,}")
+    print(
+        f"iterrows loop:        {loop_seconds:10.3f} s (extrapolated from {loop_rows:,} rows)"
+    )
+    print(
+        f"engine total:         {total_seconds:10.3f} s  ({loop_seconds / total_seconds:,.0f}x)"
+    )
+    print(
+        f"engine summary (Wh):  {engine_seconds:10.3f} s  ({loop_seconds / engine_seconds:,.0f}x)"
+    )
+    print(f"running total = {engine_total:.3f} W, energy = {summary.energy_wh:.3f} Wh")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,328 @@
+"""
+This is the budget loader for the power model, it reads the subsystem wattages and
+the mode duty cycles straight from the Power Budget workbook instead of the copies
+hard-coded in the FSM files
+
+Input: "Power Budget xlsx.xlsx", its "Power States" sheet (one row per subsystem
+functionality, a "POWER CONSUMPTION" column in Watts and one %_active or sec_active
+column per mode)
+
+Output: a validated PowerBudget, and from it the ModePowerTable the FSMs use
+
+Notes: The compiled arrays are kept in the sidecar "<workbook>.budget.npz", keyed by
+the workbook's content hash, so openpyxl only parses the workbook after it changed.
+Nothing is loaded on import: default_mode_table loads the workbook on first use and
+keeps its table for the process. The FSM files fall back to their dictionaries (with
+a warning) through load_mode_table when the workbook cannot be read.
+
+"""
+
+import os
+from typing import NamedTuple
+import warnings
+
+from numpy.typing import NDArray
+import numpy as np
+
+from mode_table import ModePowerTable
+from power_cache import file_hash
+
+BUDGET_WORKBOOK = "Power Budget xlsx.xlsx"
+BUDGET_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), BUDGET_WORKBOOK)
+BUDGET_SHEET = "Power States"
+SIDECAR_SUFFIX = ".budget.npz"
+SIDECAR_VERSION = 1
+
+FUNCTIONALITY_HEADER = "Functionality"
+WATTS_HEADER = "POWER CONSUMPTION"
+ORBITAL_PERIOD_LABEL = "Orbital Period (s)"
+MODE_UNITS = ("%_active", "sec_active")
+
+
+class BudgetError(ValueError):
+    pass
+
+
+class PowerBudget(NamedTuple):
+    subsystems: list[str]  # Functionalities, e.g. ADCS_IDLE, in workbook order
+    watts: NDArray[np.float64]  # (S,)
+    modes: list[str]  # e.g. detumbling, antenna_deploy, in workbook order
+    activity: NDArray[np.float64]  # (M, S) %_active or sec_active, blanks are 0
+    fixed_seconds: NDArray[np.bool_]  # (M,) True for sec_active modes
+    orbital_period_seconds: float
+
+    def mode_table(self) -> ModePowerTable:
+        return ModePowerTable(
+            self.subsystems,
+            self.watts,
+            self.modes,
+            self.activity,
+            self.fixed_seconds,
+            self.orbital_period_seconds,
+        )
+
+    def power_consumption(self) -> dict:
+        """Return {subsystem: W}, as the FSM files write it."""
+        return dict(zip(self.subsystems, self.watts.tolist()))
+
+
+def mode_name(header: str) -> str:
+    """Return the FSM name of a mode column, e.g. "ANTENNA DEPLOY" -> antenna_deploy."""
+    return "_".join(header.split()).lower()
+
+
+def read_budget_workbook(filepath=BUDGET_WORKBOOK, sheet=BUDGET_SHEET) -> PowerBudget:
+    """Parse and validate the budget sheet, without the sidecar.
+
+    Raises:
+        FileNotFoundError: The workbook does not exist
+        BudgetError: The file is not a workbook, or the sheet is missing, laid out
+            differently or has bad values
+    """
+    import zipfile
+
+    import openpyxl
+    from openpyxl.utils.exceptions import InvalidFileException
+
+    try:
+        workbook = openpyxl.load_workbook(filepath, read_only=True, data_only=True)
+    except (InvalidFileException, zipfile.BadZipFile, KeyError) as e:
+        raise BudgetError(f"{filepath} is not a readable workbook: {e}") from None
+    try:
+        if sheet not in workbook.sheetnames:
+            raise BudgetError(f"Sheet '{sheet}' not found in {filepath}")
+        rows = [list(row) for row in workbook[sheet].iter_rows(values_only=True)]
+    finally:
+        workbook.close()
+    return parse_budget_rows(rows)
+
+
+def parse_budget_rows(rows: list) -> PowerBudget:
+    """Find the table in the rows of the sheet and check every value."""
+    period = next(
+        (row[1] for row in rows if row and row[0] == ORBITAL_PERIOD_LABEL), None
+    )
+    if not isinstance(period, (int, float)) or period <= 0:
+        raise BudgetError(f"'{ORBITAL_PERIOD_LABEL}' must be a positive number")
+
+    header_row = next(
+        (number for number, row in enumerate(rows) if FUNCTIONALITY_HEADER in row),
+        None,
+    )
+    if header_row is None or header_row + 1 >= len(rows):
+        raise BudgetError(f"No '{FUNCTIONALITY_HEADER}' header row found")
+    header, units = rows[header_row], rows[header_row + 1]
+    if WATTS_HEADER not in header:
+        raise BudgetError(f"No '{WATTS_HEADER}' column found")
+    name_column = header.index(FUNCTIONALITY_HEADER)
+    watts_column = header.index(WATTS_HEADER)
+
+    # Mode columns follow the wattage, up to the first column without a header
+    mode_columns = []
+    for column in range(watts_column + 1, len(header)):
+        if header[column] is None:
+            break
+        if units[column] not in MODE_UNITS:
+            raise BudgetError(
+                f"Mode '{header[column]}' must be in {' or '.join(MODE_UNITS)}, "
+                f"not {units[column]!r}"
+            )
+        mode_columns.append(column)
+    if not mode_columns:
+        raise BudgetError("No mode columns found")
+
+    # Subsystem rows run to the first row without a functionality
+    table = []
+    for row in rows[header_row + 2 :]:
+        if name_column >= len(row) or row[name_column] is None:
+            break
+        table.append(row)
+    subsystems = [str(row[name_column]).strip() for row in table]
+    duplicates = sorted({name for name in subsystems if subsystems.count(name) > 1})
+    if duplicates:
+        raise BudgetError(f"Duplicate functionalities: {duplicates}")
+
+    def number(value, subsystem, column):
+        if value is None:
+            return 0.0  # Blank cells are inactive, as in the FSM dictionaries
+        if not isinstance(value, (int, float)) or isinstance(value, bool):
+            raise BudgetError(
+                f"{subsystem}, {header[column]}: {value!r} is not a number"
+            )
+        if value < 0:
+            raise BudgetError(f"{subsystem}, {header[column]}: {value} is negative")
+        return float(value)
+
+    watts = np.array(
+        [
+            number(row[watts_column], name, watts_column)
+            for name, row in zip(subsystems, table)
+        ]
+    )
+    activity = np.array(
+        [
+            [number(row[column], name, column) for name, row in zip(subsystems, table)]
+            for column in mode_columns
+        ]
+    ).reshape(len(mode_columns), len(subsystems))
+    fixed_seconds = np.array([units[column] == "sec_active" for column in mode_columns])
+
+    for mode, column in enumerate(mode_columns):
+        if fixed_seconds[mode] and activity[mode].max(initial=0) > period:
+            subsystem = subsystems[int(activity[mode].argmax())]
+            raise BudgetError(
+                f"{subsystem}, {header[column]}: active for longer than the orbit"
+            )
+
+    return PowerBudget(
+        subsystems,
+        watts,
+        [mode_name(header[column]) for column in mode_columns],
+        activity,
+        fixed_seconds,
+        float(period),
+    )
+
+
+def load_power_budget(filepath=BUDGET_WORKBOOK, sheet=BUDGET_SHEET, use_cache=True):
+    """Return the budget of the workbook, from the sidecar when its hash matches.
+
+    A miss parses the workbook and writes the sidecar, if the directory is writable.
+    """
+    if not use_cache:
+        return read_budget_workbook(filepath, sheet)
+
+    sha256 = file_hash(filepath)
+    sidecar = os.fspath(filepath) + SIDECAR_SUFFIX
+    budget = read_budget_sidecar(sidecar, sha256, sheet)
+    if budget is not None:
+        return budget
+
+    budget = read_budget_workbook(filepath, sheet)
+    try:
+        write_budget_sidecar(sidecar, budget, sha256, sheet)
+    except OSError:
+        pass  # Read-only location, run without the cache
+    return budget
+
+
+loaded_tables = {}  # Workbook path -> its ModePowerTable, or why it did not load
+
+
+def default_mode_table(filepath=BUDGET_PATH) -> ModePowerTable:
+    """Return the mode table of the workbook, loaded on first use and then kept.
+
+    Raises:
+        BudgetError: The workbook is missing or unreadable, or it needs parsing
+            and openpyxl is not installed
+    """
+    if filepath not in loaded_tables:
+        try:
+            loaded_tables[filepath] = load_power_budget(filepath).mode_table()
+        except (OSError, ImportError, BudgetError) as e:
+            loaded_tables[filepath] = f"{filepath} could not be loaded: {e}"
+
+    table = loaded_tables[filepath]
+    if isinstance(table, str):
+        raise BudgetError(table)
+    return table
+
+
+def load_mode_table(fallback: ModePowerTable, filepath=BUDGET_PATH) -> ModePowerTable:
+    """Return default_mode_table, or fallback if the workbook cannot be read.
+
+    Args:
+        fallback (ModePowerTable): e.g. compiled from a FSM file's dictionaries
+        filepath (str): The workbook, by default the one in the repository
+
+    Returns:
+        table (ModePowerTable): The workbook's table, fallback (with a warning) when
+            the workbook is missing or unreadable, or openpyxl is not installed
+    """
+    try:
+        return default_mode_table(filepath)
+    except BudgetError as e:
+        warnings.warn(f"Using the built-in mode tables: {e}")
+        return fallback
+
+
+def read_budget_sidecar(sidecar, sha256, sheet):
+    import zipfile
+
+    try:
+        with np.load(sidecar) as data:
+            key = (int(data["version"]), str(data["sha256"]), str(data["sheet"]))
+            if key != (SIDECAR_VERSION, sha256, sheet):
+                return None
+            return PowerBudget(
+                data["subsystems"].tolist(),
+                data["watts"],
+                data["modes"].tolist(),
+                data["activity"],
+                data["fixed_seconds"],
+                float(data["orbital_period_seconds"]),
+            )
+    except (OSError, ValueError, KeyError, EOFError, zipfile.BadZipFile):
+        return None  # Missing, truncated or from another version, parse again
+
+
+def write_budget_sidecar(sidecar, budget: PowerBudget, sha256, sheet):
+    temporary = sidecar + ".tmp.npz"
+    np.savez(
+        temporary,
+        version=SIDECAR_VERSION,
+        sha256=sha256,
+        sheet=sheet,
+        subsystems=np.array(budget.subsystems, dtype=str),
+        watts=budget.watts,
+        modes=np.array(budget.modes, dtype=str),
+        activity=budget.activity,
+        fixed_seconds=budget.fixed_seconds,
+        orbital_period_seconds=budget.orbital_period_seconds,
+    )
+    os.replace(temporary, sidecar)
+
+
+def table_differences(expected: ModePowerTable, actual: ModePowerTable) -> list:
+    """List where two mode tables disagree, e.g. a FSM file and the workbook.
+
+    Returns:
+        differences (list): (what, expected value, actual value) tuples. A subsystem
+            or mode only one table has is listed with None for the other table.
+    """
+    differences = []
+    for names in (
+        (expected.subsystems, actual.subsystems),
+        (expected.modes, actual.modes),
+    ):
+        for name in sorted(set(names[0]) ^ set(names[1])):
+            differences.append(
+                tuple([name] + [name if name in side else None for side in names])
+            )
+
+    shared = [name for name in expected.subsystems if name in actual.subsystems]
+    expected_columns = [expected.subsystems.index(name) for name in shared]
+    actual_columns = [actual.subsystems.index(name) for name in shared]
+    for name, expected_watts, actual_watts in zip(
+        shared,
+        expected.watts[expected_columns].tolist(),
+        actual.watts[actual_columns].tolist(),
+    ):
+        if expected_watts != actual_watts:
+            differences.append((f"{name} W", expected_watts, actual_watts))
+
+    for mode in expected.modes:
+        if mode not in actual.mode_index:
+            continue
+        expected_seconds = bool(expected.fixed_seconds[expected.mode_index[mode]])
+        actual_seconds = bool(actual.fixed_seconds[actual.mode_index[mode]])
+        if expected_seconds != actual_seconds:
+            differences.append((f"{mode} sec_active", expected_seconds, actual_seconds))
+        expected_row = expected.activity[expected.mode_index[mode], expected_columns]
+        actual_row = actual.activity[actual.mode_index[mode], actual_columns]
+        for name, expected_value, actual_value in zip(
+            shared, expected_row.tolist(), actual_row.tolist()
+        ):
+            if expected_value != actual_value:
+                differences.append((f"{mode}.{name}", expected_value, actual_value))
+    return differences
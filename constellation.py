@@ -0,0 +1,135 @@
+"""
+This is the constellation model for the power model, it puts the solar power profiles
+of many satellites on one time grid
+
+Input: one power CSV (or PowerStore directory) per satellite
+
+Output: a (satellites x time) power array and the per-satellite and fleet-wide energy,
+eclipse fractions and power margins
+
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+import os
+
+from numpy.typing import ArrayLike, NDArray
+import numpy as np
+
+from power_cache import load_power_series
+from power_store import PowerStore
+
+
+class ConstellationModel:
+    """
+    This class holds the power of N satellites aligned on a common, uniform time grid.
+    """
+
+    def __init__(
+        self,
+        filepaths,
+        time_column="Time (UTCG)",
+        power_column="Power (W)",
+        step_seconds=None,
+        max_workers=None,
+        use_cache=True,
+    ):
+        self.filepaths = list(filepaths)
+        self.names = [
+            os.path.splitext(os.path.basename(os.path.normpath(path)))[0]
+            for path in self.filepaths
+        ]
+
+        def load(filepath):
+            if os.path.isdir(filepath):
+                return PowerStore.open(filepath)
+            series = load_power_series(filepath, time_column, power_column, use_cache)
+            if series.times is None:
+                raise ValueError(
+                    f"{filepath}: '{time_column}' is not a known time format"
+                )
+            return PowerStore(series.times.view(np.int64), series.power)
+
+        # Parsing is mostly pandas/numpy C code and cache hits are just mmaps, so
+        # threads overlap the files well
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            stores = list(executor.map(load, self.filepaths))
+
+        self.times, self.power = align_power(stores, step_seconds)
+        self.step_seconds = (
+            float(np.diff(self.times[:2]).astype(np.int64)[0] / 1e9)
+            if self.times.size > 1
+            else 0.0
+        )
+
+    def energy_wh(self) -> NDArray[np.float64]:
+        """Return the trapezoidal energy of every satellite in Wh, shape (S,)."""
+        if self.times.size < 2:
+            return np.zeros(self.power.shape[0])
+        inner = self.power[:, 1:-1].sum(axis=1)
+        edges = 0.5 * (self.power[:, 0] + self.power[:, -1])
+        return (inner + edges) * self.step_seconds / 3600.0
+
+    def fleet_energy_wh(self) -> float:
+        return float(self.energy_wh().sum())
+
+    def fleet_power(self) -> NDArray[np.float64]:
+        """Return the power of the whole fleet at every grid time, shape (T,)."""
+        return self.power.sum(axis=0)
+
+    def eclipse_fraction(self, threshold=0.0) -> NDArray[np.float64]:
+        """Return the fraction of grid samples each satellite generates <= threshold W."""
+        return (self.power <= threshold).mean(axis=1)
+
+    def margins(self, load_w: ArrayLike) -> NDArray[np.float64]:
+        """Return generation minus load, shape (S, T).
+
+        Args:
+            load_w (ArrayLike): Load in watts, a scalar, (S,) per satellite, (T,)
+                per time or (S, T)
+        """
+        load_w = np.asarray(load_w, dtype=np.float64)
+        if load_w.ndim == 1 and load_w.shape[0] == self.power.shape[0]:
+            load_w = load_w[:, np.newaxis]
+        return self.power - load_w
+
+    def minimum_margin(self, load_w: ArrayLike) -> NDArray[np.float64]:
+        """Return the lowest generation minus load of every satellite, shape (S,)."""
+        return self.margins(load_w).min(axis=1)
+
+
+def align_power(
+    stores, step_seconds=None
+) -> tuple[NDArray[np.datetime64], NDArray[np.float64]]:
+    """Resample the stores linearly onto the time span they all cover.
+
+    Args:
+        stores (list[PowerStore]): One store per satellite
+        step_seconds (float): Grid step, the finest median sample step if None
+
+    Returns:
+        times (NDArray[np.datetime64]): (T,) grid times
+        power (NDArray[np.float64]): (S, T) power of every satellite on the grid
+    """
+    start = max(int(store.times_ns[0]) for store in stores)
+    stop = min(int(store.times_ns[-1]) for store in stores)
+    if stop < start:
+        raise ValueError("The power profiles do not overlap in time")
+
+    if step_seconds is None:
+        step_seconds = min(
+            float(np.median(np.diff(store.times_ns))) / 1e9
+            for store in stores
+            if len(store) > 1
+        )
+    step_ns = int(round(step_seconds * 1e9))
+    grid_ns = np.arange(start, stop + 1, step_ns, dtype=np.int64)
+
+    power = np.empty((len(stores), grid_ns.shape[0]))
+    for row, store in enumerate(stores):
+        # Relative to start, so the float64 interpolation keeps its precision
+        power[row] = np.interp(
+            (grid_ns - start).astype(np.float64),
+            (np.asarray(store.times_ns) - start).astype(np.float64),
+            store.power,
+        )
+    return grid_ns.view("datetime64[ns]"), power
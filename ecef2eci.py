@@ -3,166 +3,484 @@ This is the ECEF to ECI Convertor for the power model
 
 """
 
+from collections import OrderedDict
 from datetime import datetime
+from typing import NamedTuple
+import math
 
-from numpy.typing import NDArray
+from numpy.typing import ArrayLike, NDArray
 import numpy as np
 
+from julian_time import J2000_JULIAN_DATE
+import julian_time
+
+ARC_SECONDS_TO_RADIANS = np.pi / 648000
+EARTH_ROTATION_DERIVATIVE = np.pi * 1.00273781191135448 / 43200
+SECONDS_PER_CENTURY = 36525.0 * 86400.0
+
+## Polynomial coefficients (Arc-Seconds), lowest order first as printed in the equations
+# Precession, Equation 5.16
+PRECESSION_X = np.array([-0.016617, 2004.191898, -0.4297829, -0.19861834])
+PRECESSION_Y = np.array([-0.006951, -0.025896, -22.4072747, 0.00190059])
+
+# Nutation, Equation 5.43
+SUN_ANOMOLY = np.array([1287104.793048, 129596581.048100, -0.55320])
+MOON_LONGITUDE = np.array([335779.526232, 1739527262.8478, -12.7512])
+MOON_ELONGATION = np.array([1072260.703692, 1602961601.209000, -6.3706])
+MOON_ASCENSION = np.array([450160.398036, -6962890.5431, 7.4722])
+
+
+class PNCacheError(NamedTuple):
+    max_microarcseconds: float
+    rms_microarcseconds: float
+
 
 ## ECEF to ECI Conversion from https://github.com/eribean/Geneci
-def ecef_to_eci(
-    self,
-    ecef_point: NDArray[np.float64],
-    utc_time: datetime,
-    ecef_velocity: NDArray[np.float64] = None,
-) -> NDArray[np.float64] | tuple[NDArray[np.float64], NDArray[np.float64]]:
-    """Convert ECEF point/velocity to ECI point/velocity.
+class FrameTransformer:
+    """
+    This class converts ECEF points/velocities to ECI, it holds all the astronomy
+    constants so the power engine does not have to.
+
+    Precession and nutation drift far slower than the earth rotates, so with
+    pn_cache_seconds set the celestial pole (which the PN matrix is built from) is
+    computed once per time bucket, at the bucket centre, and kept in an LRU cache
+    of pn_cache_size buckets. Only the earth rotation is evaluated per epoch.
+    pn_cache_error reports what that costs against the exact path.
+    """
 
-    Args:
-        ecef_point (NDArray[np.float64]): (3,) 1-d vector describing ECEF point [X, Y, Z]
-        utc_time (datetime): Observed time of position and/or velocity
-        ecef_velocity (NDArray[np.float64]): (3,) 1-d vector describing ECEF velocity [Vx, Vy, Vz]
+    def __init__(self, pn_cache_seconds=None, pn_cache_size=1024):
+        self.pn_cache_seconds = pn_cache_seconds  # e.g. 3600 for 1 hour buckets
+        self.pn_cache_size = pn_cache_size
+        self.pn_cache = OrderedDict()  # bucket -> (celestial_x, celestial_y)
+
+        self.DERIVATIVE_MATRIX = np.array(
+            [
+                [0.0, -EARTH_ROTATION_DERIVATIVE, 0.0],
+                [EARTH_ROTATION_DERIVATIVE, 0.0, 0.0],
+                [0.0, 0.0, 0.0],
+            ]
+        )
 
-    Returns:
-        eci_point (NDArray[np.float64]): (3,) 1-d vector describing ECI point [X, Y, Z]
+        # Coefficients highest order first, as Horner's method consumes them
+        self.precession_x = horner_coefficients(PRECESSION_X)
+        self.precession_y = horner_coefficients(PRECESSION_Y)
+        self.sun_anomoly = horner_coefficients(SUN_ANOMOLY)
+        self.moon_longitude = horner_coefficients(MOON_LONGITUDE)
+        self.moon_elongation = horner_coefficients(MOON_ELONGATION)
+        self.moon_ascension = horner_coefficients(MOON_ASCENSION)
+
+    def ecef_to_eci(
+        self,
+        ecef_point: NDArray[np.float64],
+        utc_time: datetime,
+        ecef_velocity: NDArray[np.float64] = None,
+    ) -> NDArray[np.float64] | tuple[NDArray[np.float64], NDArray[np.float64]]:
+        """Convert ECEF point/velocity to ECI point/velocity.
+
+        Args:
+            ecef_point (NDArray[np.float64]): (3,) 1-d vector describing ECEF point [X, Y, Z]
+            utc_time (datetime): Observed time of position and/or velocity
+            ecef_velocity (NDArray[np.float64]): (3,) 1-d vector describing ECEF velocity [Vx, Vy, Vz]
+
+        Returns:
+            eci_point (NDArray[np.float64]): (3,) 1-d vector describing ECI point [X, Y, Z]
             eci_velocity (NDArray[np.float64]): (3,) 1-d vector describing ECI velocity [Vx, Vy, Vz]
 
-    Note:
-        The velocity is only returned if a velocity is supplied
-    """
-    # Convert the utc time to julian day, then to century
-    julian_day = self.utc_time_to_julian_date(utc_time)
-    julian_century = (julian_day - 2451545.0) / 36525.0  # Eq. 5.2
+        Note:
+            The velocity is only returned if a velocity is supplied
+        """
+        # Convert the utc time to julian day, then to century
+        julian_day = self.utc_time_to_julian_date(utc_time)
+        julian_century = (julian_day - J2000_JULIAN_DATE) / 36525.0  # Eq. 5.2
 
-    # Get the rotation matrix
-    rotation_ecef_to_eci = self.rotation_matrix_ecef_to_eci(julian_century)
+        # Get the rotation matrix
+        rotation_ecef_to_eci = self.rotation_matrix_ecef_to_eci(julian_century)
 
-    # Rotate the position
-    eci_point = rotation_ecef_to_eci @ ecef_point
+        # Rotate the position
+        eci_point = rotation_ecef_to_eci @ ecef_point
+        if ecef_velocity is None:
+            return eci_point
 
-    # Rotate the velocity if it is supplied
-    if ecef_velocity is not None:
+        # Rotate the velocity if it is supplied
         eci_velocity = (
             rotation_ecef_to_eci @ ecef_velocity
             + (rotation_ecef_to_eci @ self.DERIVATIVE_MATRIX) @ ecef_point
         )
         return eci_point, eci_velocity
 
+    def ecef_to_eci_batch(
+        self,
+        ecef_points: NDArray[np.float64],
+        times: ArrayLike,
+        ecef_velocities: NDArray[np.float64] = None,
+    ) -> NDArray[np.float64] | tuple[NDArray[np.float64], NDArray[np.float64]]:
+        """Convert N ECEF points/velocities to ECI points/velocities.
+
+        Args:
+            ecef_points (NDArray[np.float64]): (N, 3) ECEF points [X, Y, Z]
+            times (ArrayLike): (N,) observation times, numpy datetime64 or Julian dates
+            ecef_velocities (NDArray[np.float64]): (N, 3) ECEF velocities [Vx, Vy, Vz]
+
+        Returns:
+            eci_points (NDArray[np.float64]): (N, 3) ECI points [X, Y, Z]
+            eci_velocities (NDArray[np.float64]): (N, 3) ECI velocities [Vx, Vy, Vz]
+
+        Note:
+            The velocities are only returned if velocities are supplied
+        """
+        ecef_points = np.asarray(ecef_points, dtype=np.float64)
+        julian_centuries = julian_time.julian_centuries(times)
+
+        rotations = self.rotation_matrices_ecef_to_eci(julian_centuries)
+        eci_points = np.einsum("nij,nj->ni", rotations, ecef_points)
+        if ecef_velocities is None:
+            return eci_points
+
+        # DERIVATIVE_MATRIX @ point, written out since it only has two entries
+        rotating_velocities = np.zeros_like(ecef_points)
+        rotating_velocities[:, 0] = -EARTH_ROTATION_DERIVATIVE * ecef_points[:, 1]
+        rotating_velocities[:, 1] = EARTH_ROTATION_DERIVATIVE * ecef_points[:, 0]
+
+        eci_velocities = np.einsum(
+            "nij,nj->ni",
+            rotations,
+            np.asarray(ecef_velocities, dtype=np.float64) + rotating_velocities,
+        )
+        return eci_points, eci_velocities
 
-def rotation_matrix_ecef_to_eci(self, julian_century: float) -> NDArray[np.float64]:
-    """Return ecef to eci rotation matrix for a given time.
+    def rotation_matrix_ecef_to_eci(self, julian_century: float) -> NDArray[np.float64]:
+        """Return ecef to eci rotation matrix for a given time.
 
-    Rotation is applied to the vector components.
+        Rotation is applied to the vector components.
 
-    P_eci = R(t) @ P_ecef
+        P_eci = R(t) @ P_ecef
 
-    Args:
-        julian_date (float): Time in Julian centuries.
-     Returns:
-        rotation_matrx (NDArray[float]): 3x3 Matrix to rotate ECEF to ECI
-    """
-    # Angular motion of the earth
-    earth_rotation_angle = (
-        2 * np.pi * (0.7790572732640 + 1.00273781191135448 * 36525.0 * julian_century)
-    )
-    earth_matrix = np.eye(3)
-    earth_matrix[0, 0] = earth_matrix[1, 1] = np.cos(earth_rotation_angle)
-    earth_matrix[1, 0] = np.sin(earth_rotation_angle)
-    earth_matrix[0, 1] = -1 * earth_matrix[1, 0]
+        Args:
+            julian_date (float): Time in Julian centuries.
 
-    # Precession / Nutation rotation matrix (Eq. 5.10)
-    gcrs_x, gcrs_y = self.compute_celestial_positions(julian_century)
-    a = 0.5 + 0.125 * (gcrs_x * gcrs_x + gcrs_y * gcrs_y)
+        Returns:
+            rotation_matrx (NDArray[float]): 3x3 Matrix to rotate ECEF to ECI
+        """
+        julian_century = float(julian_century)
+        earth_cos, earth_sin = earth_rotation(julian_century)
+        gcrs_x, gcrs_y = self.celestial_pole(julian_century)
 
-    pn_matrix = np.array(
-        [
-            [1 - a * gcrs_x * gcrs_x, -a * gcrs_x * gcrs_y, gcrs_x],
-            [-a * gcrs_x * gcrs_y, 1 - gcrs_y * gcrs_y, gcrs_y],
-            [-gcrs_x, -gcrs_y, 1 - a * (gcrs_x * gcrs_x + gcrs_y * gcrs_y)],
-        ]
-    )
+        # Precession / Nutation rotation matrix (Eq. 5.10) @ earth matrix, written out
+        # since the earth matrix only rotates about z
+        a = 0.5 + 0.125 * (gcrs_x * gcrs_x + gcrs_y * gcrs_y)
+        pn_xx, pn_xy, pn_yy = (
+            1 - a * gcrs_x * gcrs_x,
+            -a * gcrs_x * gcrs_y,
+            1 - gcrs_y * gcrs_y,
+        )
+        return np.array(
+            [
+                [
+                    pn_xx * earth_cos + pn_xy * earth_sin,
+                    pn_xy * earth_cos - pn_xx * earth_sin,
+                    gcrs_x,
+                ],
+                [
+                    pn_xy * earth_cos + pn_yy * earth_sin,
+                    pn_yy * earth_cos - pn_xy * earth_sin,
+                    gcrs_y,
+                ],
+                [
+                    -gcrs_x * earth_cos - gcrs_y * earth_sin,
+                    gcrs_x * earth_sin - gcrs_y * earth_cos,
+                    1 - a * (gcrs_x * gcrs_x + gcrs_y * gcrs_y),
+                ],
+            ]
+        )
 
-    # Return the rotation
-    return pn_matrix @ earth_matrix
+    def rotation_matrices_ecef_to_eci(
+        self, julian_centuries: NDArray[np.float64]
+    ) -> NDArray[np.float64]:
+        """Return the ecef to eci rotation matrices for N epochs.
 
+        Args:
+            julian_centuries (NDArray[np.float64]): (N,) times in Julian centuries.
 
-## The monstrosity that is the nutation / precession
-def compute_celestial_positions(self, julian_century: float) -> tuple[float, float]:
-    """Compute the x-y components of the celestial pole in earth reference frame.
+        Returns:
+            rotation_matrices (NDArray[np.float64]): (N, 3, 3) matrices to rotate ECEF to ECI
+        """
+        julian_centuries = np.asarray(julian_centuries, dtype=np.float64)
+        gcrs_x, gcrs_y = self.celestial_poles(julian_centuries)
+        return combine_rotations(pn_matrix_from_pole(gcrs_x, gcrs_y), julian_centuries)
 
-    Args:
-        julian_date (float): Time in Julian centuries.
+    def celestial_pole(self, julian_century: float) -> tuple[float, float]:
+        """Return the celestial pole for one epoch, from the PN cache if it is enabled."""
+        if self.pn_cache_seconds is None:
+            return self.compute_celestial_positions(julian_century)
 
-    Returns:
-        celestial_x (float): x-component of the pole vector in radians
-        celestial_y (float): y-component of the pole vector in radians
+        bucket = math.floor(
+            julian_century * SECONDS_PER_CENTURY / self.pn_cache_seconds
+        )
+        pole = self.pn_cache.get(bucket)
+        if pole is None:
+            pole = self.compute_celestial_positions(self.bucket_centers(bucket))
+            self.remember_pole(bucket, pole)
+        else:
+            self.pn_cache.move_to_end(bucket)
+        return pole
+
+    def celestial_poles(
+        self, julian_centuries: NDArray[np.float64]
+    ) -> tuple[NDArray[np.float64], NDArray[np.float64]]:
+        """Return the celestial poles for N epochs, from the PN cache if it is enabled.
+
+        The pole is only evaluated (in one vectorised call) for the buckets that are
+        not cached yet.
+        """
+        if self.pn_cache_seconds is None:
+            return self.compute_celestial_positions(julian_centuries)
+
+        buckets = np.floor(
+            julian_centuries * SECONDS_PER_CENTURY / self.pn_cache_seconds
+        ).astype(np.int64)
+        if np.all(buckets[1:] >= buckets[:-1]):
+            # Ephemerides are time ordered, so runs are cheaper than a sort
+            starts = np.flatnonzero(np.diff(buckets, prepend=buckets[:1] - 1))
+            unique_buckets = buckets[starts]
+            inverse = np.cumsum(np.diff(buckets, prepend=buckets[:1]) != 0)
+        else:
+            unique_buckets, inverse = np.unique(buckets, return_inverse=True)
+
+        gcrs_x = np.empty(unique_buckets.shape[0])
+        gcrs_y = np.empty(unique_buckets.shape[0])
+        missing = []
+        for index, bucket in enumerate(unique_buckets.tolist()):
+            pole = self.pn_cache.get(bucket)
+            if pole is None:
+                missing.append(index)
+            else:
+                self.pn_cache.move_to_end(bucket)
+                gcrs_x[index], gcrs_y[index] = pole
+
+        if missing:
+            missing_buckets = unique_buckets[missing]
+            poles = self.compute_celestial_positions(
+                self.bucket_centers(missing_buckets)
+            )
+            gcrs_x[missing], gcrs_y[missing] = poles
+            for bucket, pole in zip(
+                missing_buckets.tolist(), zip(*(pole.tolist() for pole in poles))
+            ):
+                self.remember_pole(bucket, pole)
+
+        return gcrs_x[inverse], gcrs_y[inverse]
+
+    def bucket_centers(self, buckets):
+        """Return the centre of PN cache buckets in Julian centuries."""
+        return (buckets + 0.5) * self.pn_cache_seconds / SECONDS_PER_CENTURY
+
+    def remember_pole(self, bucket, pole):
+        self.pn_cache[bucket] = pole
+        if len(self.pn_cache) > self.pn_cache_size:
+            self.pn_cache.popitem(last=False)
+
+    def pn_cache_error(self, times: ArrayLike) -> PNCacheError:
+        """Report the rotation error of the PN cache against the exact path.
+
+        Args:
+            times (ArrayLike): (N,) epochs to compare, numpy datetime64 or Julian dates
+
+        Returns:
+            error (PNCacheError): Max and RMS rotation angle between the cached and
+                exact ECEF to ECI matrices, in micro arc-seconds
+        """
+        julian_centuries = julian_time.julian_centuries(times)
+        cached = self.rotation_matrices_ecef_to_eci(julian_centuries)
+        exact = combine_rotations(
+            pn_matrix_from_pole(*self.compute_celestial_positions(julian_centuries)),
+            julian_centuries,
+        )
 
-    """
-    celestial_x = self.precession_x(julian_century)
-    celestial_y = self.precession_y(julian_century)
-
-    # Update for nutation (Coeffients are micro arc-seconds)
-    omega = self.moon_ascension(julian_century) * self.ARC_SECONDS_TO_RADIANS
-    D = self.moon_elongation(julian_century) * self.ARC_SECONDS_TO_RADIANS
-    F = self.moon_longitude(julian_century) * self.ARC_SECONDS_TO_RADIANS
-    l_prime = self.sun_anomoly(julian_century) * self.ARC_SECONDS_TO_RADIANS
-
-    # Precompute reoccuring argument
-    f_omega_d = 2 * (F + omega - D)
-
-    celestial_x += 1e-6 * (
-        (
-            -6844318.44 * np.sin(omega)
-            - 523908.04 * np.sin(f_omega_d)
-            - 90552.22 * np.sin(2 * (F + omega))
-            + 82168.76 * np.sin(2 * omega)
-            + 58707.02 * np.sin(l_prime)
+        # Angle of the residual rotation cached.T @ exact
+        residual = np.einsum("nji,njk->nik", cached, exact)
+        skew = np.stack(
+            [
+                residual[:, 2, 1] - residual[:, 1, 2],
+                residual[:, 0, 2] - residual[:, 2, 0],
+                residual[:, 1, 0] - residual[:, 0, 1],
+            ],
+            axis=1,
         )
-        + julian_century * (205833.11 * np.cos(omega) + 12814.01 * np.cos(f_omega_d))
-    )
+        trace = np.trace(residual, axis1=1, axis2=2)
+        angles = np.arctan2(np.linalg.norm(skew, axis=1) / 2, (trace - 1) / 2)
 
-    celestial_y += 1e-6 * (
-        (
-            9205236.26 * np.cos(omega)
-            + 573033.42 * np.cos(f_omega_d)
-            + 97846.69 * np.cos(2 * (F + omega))
-            - 89618.24 * np.cos(2 * omega)
-            + 22438.42 * np.cos(l_prime - f_omega_d)
+        microarcseconds = angles / ARC_SECONDS_TO_RADIANS * 1e6
+        return PNCacheError(
+            float(microarcseconds.max()), float(np.sqrt(np.mean(microarcseconds**2)))
         )
-        + julian_century * (153041.79 * np.sin(omega) + 11714.49 * np.sin(f_omega_d))
-    )
 
-    return (
-        celestial_x * self.ARC_SECONDS_TO_RADIANS,
-        celestial_y * self.ARC_SECONDS_TO_RADIANS,
-    )
+    ## The monstrosity that is the nutation / precession
+    def compute_celestial_positions(
+        self, julian_century: float | NDArray[np.float64]
+    ) -> tuple[float, float] | tuple[NDArray[np.float64], NDArray[np.float64]]:
+        """Compute the x-y components of the celestial pole in earth reference frame.
+
+        Args:
+            julian_date (float | NDArray[np.float64]): Time(s) in Julian centuries.
+
+        Returns:
+            celestial_x (float | NDArray[np.float64]): x-component of the pole vector in radians
+            celestial_y (float | NDArray[np.float64]): y-component of the pole vector in radians
+
+        """
+        t = julian_century
+        # math is much faster than numpy on single floats
+        sin, cos = (math.sin, math.cos) if isinstance(t, float) else (np.sin, np.cos)
+
+        celestial_x = horner(self.precession_x, t)
+        celestial_y = horner(self.precession_y, t)
+
+        # Update for nutation (Coeffients are micro arc-seconds)
+        omega = horner(self.moon_ascension, t) * ARC_SECONDS_TO_RADIANS
+        D = horner(self.moon_elongation, t) * ARC_SECONDS_TO_RADIANS
+        F = horner(self.moon_longitude, t) * ARC_SECONDS_TO_RADIANS
+        l_prime = horner(self.sun_anomoly, t) * ARC_SECONDS_TO_RADIANS
+
+        # Precompute reoccuring argument
+        f_omega_d = 2 * (F + omega - D)
+
+        celestial_x += 1e-6 * (
+            (
+                -6844318.44 * sin(omega)
+                - 523908.04 * sin(f_omega_d)
+                - 90552.22 * sin(2 * (F + omega))
+                + 82168.76 * sin(2 * omega)
+                + 58707.02 * sin(l_prime)
+            )
+            + t * (205833.11 * cos(omega) + 12814.01 * cos(f_omega_d))
+        )
 
+        celestial_y += 1e-6 * (
+            (
+                9205236.26 * cos(omega)
+                + 573033.42 * cos(f_omega_d)
+                + 97846.69 * cos(2 * (F + omega))
+                - 89618.24 * cos(2 * omega)
+                + 22438.42 * cos(l_prime - f_omega_d)
+            )
+            + t * (153041.79 * sin(omega) + 11714.49 * sin(f_omega_d))
+        )
 
-def utc_time_to_julian_date(self, utc_time: datetime) -> float:
-    """Convert UTC time to Julian date.
+        return (
+            celestial_x * ARC_SECONDS_TO_RADIANS,
+            celestial_y * ARC_SECONDS_TO_RADIANS,
+        )
 
-    This calculation is only valid for days after March 1900.
+    @staticmethod
+    def utc_time_to_julian_date(utc_time: datetime) -> float:
+        """Convert UTC time to Julian date.
+
+        This calculation is only valid for days after March 1900.
+
+        Args:
+            utc_time (datetime): The observation time as a datetime object
+
+        Returns:
+            julian_date (float): The observation time as a julian date.
+        """
+        year, month, day = utc_time.year, utc_time.month, utc_time.day
+        julian_date = (
+            367 * year
+            - 7 * (year + (month + 9) // 12) // 4
+            + 275 * month // 9
+            + day
+            + 1721013.5
+        )
 
-    Args:
-        utc_time (datetime): The observation time as a datetime object
+        # update with the frational day
+        julian_date += (
+            utc_time.hour
+            + utc_time.minute / 60
+            + (utc_time.second + 1e-6 * utc_time.microsecond) / 3600
+        ) / 24
+
+        return julian_date
+
+
+def horner_coefficients(coefficients: NDArray[np.float64]) -> NDArray[np.float64]:
+    """Return lowest-order-first coefficients as a contiguous highest-first array."""
+    return np.ascontiguousarray(coefficients[::-1], dtype=np.float64)
+
+
+def horner(
+    coefficients: NDArray[np.float64], t: float | NDArray[np.float64]
+) -> float | NDArray[np.float64]:
+    """Evaluate a polynomial (highest order first) at t with Horner's method."""
+    result = 0.0
+    for coefficient in coefficients.tolist():
+        result = result * t + coefficient
+    return result
+
+
+def earth_rotation(
+    julian_century: float | NDArray[np.float64],
+) -> tuple[float, float] | tuple[NDArray[np.float64], NDArray[np.float64]]:
+    """Return the cosine and sine of the earth rotation angle."""
+    # Angular motion of the earth
+    earth_rotation_angle = (
+        2 * np.pi * (0.7790572732640 + 1.00273781191135448 * 36525.0 * julian_century)
+    )
+    if isinstance(earth_rotation_angle, float):
+        return math.cos(earth_rotation_angle), math.sin(earth_rotation_angle)
+    return np.cos(earth_rotation_angle), np.sin(earth_rotation_angle)
+
+
+def pn_matrix_from_pole(
+    gcrs_x: float | NDArray[np.float64], gcrs_y: float | NDArray[np.float64]
+) -> NDArray[np.float64]:
+    """Build the precession / nutation matrix (Eq. 5.10) from the pole components.
 
     Returns:
-        julian_date (float): The observation time as a julian date.
+        pn_matrix (NDArray[np.float64]): (3, 3) matrix, or (N, 3, 3) for (N,) inputs
     """
-    year, month, day = utc_time.year, utc_time.month, utc_time.day
-    julian_date = (
-        367 * year
-        - 7 * (year + (month + 9) // 12) // 4
-        + 275 * month // 9
-        + day
-        + 1721013.5
-    )
+    gcrs_x = np.asarray(gcrs_x, dtype=np.float64)
+    gcrs_y = np.asarray(gcrs_y, dtype=np.float64)
+    a = 0.5 + 0.125 * (gcrs_x * gcrs_x + gcrs_y * gcrs_y)
+
+    pn_matrix = np.empty(gcrs_x.shape + (3, 3))
+    pn_matrix[..., 0, 0] = 1 - a * gcrs_x * gcrs_x
+    pn_matrix[..., 0, 1] = pn_matrix[..., 1, 0] = -a * gcrs_x * gcrs_y
+    pn_matrix[..., 0, 2] = gcrs_x
+    pn_matrix[..., 1, 1] = 1 - gcrs_y * gcrs_y
+    pn_matrix[..., 1, 2] = gcrs_y
+    pn_matrix[..., 2, 0] = -gcrs_x
+    pn_matrix[..., 2, 1] = -gcrs_y
+    pn_matrix[..., 2, 2] = 1 - a * (gcrs_x * gcrs_x + gcrs_y * gcrs_y)
+    return pn_matrix
 
-    # update with the frational day
-    julian_date += (
-        utc_time.hour
-        + utc_time.minute / 60
-        + (utc_time.second + 1e-6 * utc_time.microsecond) / 3600
-    ) / 24
 
-    return julian_date
+def combine_rotations(
+    pn_matrices: NDArray[np.float64], julian_centuries: NDArray[np.float64]
+) -> NDArray[np.float64]:
+    """Return pn_matrix @ earth_matrix for N epochs.
+
+    Args:
+        pn_matrices (NDArray[np.float64]): (N, 3, 3) precession / nutation matrices
+        julian_centuries (NDArray[np.float64]): (N,) times in Julian centuries.
+
+    Returns:
+        rotation_matrices (NDArray[np.float64]): (N, 3, 3) matrices to rotate ECEF to ECI
+    """
+    earth_cos, earth_sin = earth_rotation(julian_centuries)
+    earth_matrices = np.zeros((julian_centuries.shape[0], 3, 3))
+    earth_matrices[:, 0, 0] = earth_matrices[:, 1, 1] = earth_cos
+    earth_matrices[:, 1, 0] = earth_sin
+    earth_matrices[:, 0, 1] = -earth_sin
+    earth_matrices[:, 2, 2] = 1.0
+
+    return np.einsum("nij,njk->nik", pn_matrices, earth_matrices)
+
+
+# Module level shortcuts on a shared transformer
+_transformer = FrameTransformer()
+ecef_to_eci = _transformer.ecef_to_eci
+ecef_to_eci_batch = _transformer.ecef_to_eci_batch
+rotation_matrix_ecef_to_eci = _transformer.rotation_matrix_ecef_to_eci
+rotation_matrices_ecef_to_eci = _transformer.rotation_matrices_ecef_to_eci
+compute_celestial_positions = _transformer.compute_celestial_positions
+utc_time_to_julian_date = FrameTransformer.utc_time_to_julian_date
@@ -0,0 +1,96 @@
+"""
+This is the energy engine for the power model, it does the running total bookkeeping
+for a whole solar power series at once instead of row by row
+
+Input: the power column (and optionally the time column) of the CSV data
+
+Output: the cumulative power series, the running total and the energy in Wh
+
+"""
+
+from typing import NamedTuple
+
+from numpy.typing import NDArray
+import numpy as np
+
+import julian_time
+from utcg_time import parse_utcg_time
+
+
+class EnergySummary(NamedTuple):
+    cumulative_power: NDArray[np.float64]
+    total_power: float
+    energy_wh: float
+
+
+class EnergyEngine:
+    """
+    This class does the energy bookkeeping of a solar power series with numpy.
+    """
+
+    def __init__(self, power, time_seconds=None):
+        self.power = np.ascontiguousarray(power, dtype=np.float64)
+        if time_seconds is not None and not julian_time.is_numeric(time_seconds):
+            # datetime64 / DatetimeIndex time axis
+            time_seconds = julian_time.seconds_since(time_seconds)
+        self.time_seconds = (
+            None
+            if time_seconds is None
+            else np.ascontiguousarray(time_seconds, dtype=np.float64)
+        )
+
+    @classmethod
+    def from_frame(cls, data, time_column=None, power_column="Power (W)"):
+        """Build the engine from the frame returned by process_csv_data.
+
+        Args:
+            data (pd.DataFrame): Frame holding the time and power columns
+            time_column (str): Column with the "Time (UTCG)" labels, if any
+            power_column (str): Column with the power samples in watts
+
+        Returns:
+            engine (EnergyEngine): Engine over the frame's columns
+        """
+        time_seconds = None
+        if time_column is not None and len(data):
+            time_seconds = parse_utcg_time(data[time_column]).elapsed_seconds
+        return cls(data[power_column].to_numpy(dtype=np.float64), time_seconds)
+
+    def cumulative_power(self) -> NDArray[np.float64]:
+        """Return the running total after every sample."""
+        return np.cumsum(self.power)
+
+    def total_power(self) -> float:
+        """Return the running total over the whole series.
+
+        The total is the last element of the cumsum, so it is accumulated in the
+        same order (and to the same value) as the old row by row loop.
+        """
+        if self.power.size == 0:
+            return 0.0
+        return float(self.cumulative_power()[-1])
+
+    def cumulative_energy_wh(self) -> NDArray[np.float64]:
+        """Return the trapezoidal energy integral in Wh up to every sample."""
+        if self.time_seconds is None:
+            raise ValueError("A time axis is needed to integrate the energy")
+
+        energy = np.empty_like(self.power)
+        if energy.size == 0:
+            return energy
+        energy[0] = 0.0
+        segments = 0.5 * (self.power[1:] + self.power[:-1]) * np.diff(self.time_seconds)
+        np.cumsum(segments, out=energy[1:])
+        return energy / 3600.0
+
+    def energy_wh(self) -> float:
+        """Return the trapezoidal energy integral in Wh over the whole series."""
+        energy = self.cumulative_energy_wh()
+        return float(energy[-1]) if energy.size else 0.0
+
+    def summary(self) -> EnergySummary:
+        """Compute the cumulative power, the total and the energy in one pass."""
+        cumulative = self.cumulative_power()
+        total = float(cumulative[-1]) if cumulative.size else 0.0
+        energy = self.energy_wh() if self.time_seconds is not None else float("nan")
+        return EnergySummary(cumulative, total, energy)
@@ -0,0 +1,173 @@
+"""
+This is the energy index for the power model, it answers windowed energy questions
+("how much energy is generated between t1 and t2") without going back to the CSV
+
+Input: the time and power columns of a power series, once per dataset
+
+Output: the energy, average power and sunlit time of any window (or array of windows),
+each found by binary search in O(log n)
+
+"""
+
+from typing import NamedTuple
+
+from numpy.typing import ArrayLike, NDArray
+import numpy as np
+
+import julian_time
+
+
+class WindowStats(NamedTuple):
+    energy_wh: NDArray[np.float64]
+    average_power_w: NDArray[np.float64]
+    sunlit_seconds: NDArray[np.float64]
+
+
+class EnergyIndex:
+    """
+    This class keeps the prefix sums of a power series: the trapezoid energy and the
+    sunlit time up to every sample. Between samples the power is linear, as in the
+    trapezoid, so windows may start and end anywhere.
+    """
+
+    def __init__(self, times: ArrayLike, power: ArrayLike, sunlit_threshold=0.0):
+        self.epoch = None  # First time, for datetime64 queries
+        if julian_time.is_numeric(times):
+            self.seconds = np.ascontiguousarray(times, dtype=np.float64)
+        else:
+            self.epoch = julian_time.to_datetime64(times)[0]
+            self.seconds = julian_time.seconds_since(times, self.epoch)
+        self.power = np.ascontiguousarray(power, dtype=np.float64)
+        self.sunlit_threshold = sunlit_threshold  # Sunlit while power > threshold
+        if self.seconds.shape != self.power.shape or self.seconds.size < 2:
+            raise ValueError("times and power must be 1-d, with at least two samples")
+        if np.any(np.diff(self.seconds) < 0):
+            raise ValueError("times must be sorted")
+
+        spans = np.diff(self.seconds)
+        self.cumulative_wh = prefix_sum(
+            0.5 * (self.power[1:] + self.power[:-1]) * spans / 3600
+        )
+        self.cumulative_sunlit = prefix_sum(
+            spans * self.sunlit_fraction(np.arange(spans.size), np.ones(spans.size))
+        )
+
+    def to_seconds(self, times: ArrayLike) -> NDArray[np.float64]:
+        """Put query times (seconds on the index's axis, or datetime64) on the axis."""
+        if julian_time.is_numeric(times) or self.epoch is None:
+            return np.asarray(times, dtype=np.float64)
+        return julian_time.seconds_since(np.atleast_1d(times), self.epoch).reshape(
+            np.shape(times)
+        )
+
+    def clip(self, seconds: NDArray[np.float64]) -> NDArray[np.float64]:
+        """Clip times on the index's axis to the first and last sample."""
+        return np.clip(seconds, self.seconds[0], self.seconds[-1])
+
+    def locate(self, seconds: NDArray[np.float64]):
+        """Return the segment every time falls in and how far into it, as a fraction."""
+        seconds = self.clip(seconds)
+        left = np.clip(
+            np.searchsorted(self.seconds, seconds, side="right") - 1,
+            0,
+            self.seconds.size - 2,
+        )
+        span = self.seconds[left + 1] - self.seconds[left]
+        into = seconds - self.seconds[left]
+        fraction = np.divide(into, span, out=np.zeros_like(into), where=span > 0)
+        return left, fraction, into
+
+    def sunlit_fraction(self, segment, fraction) -> NDArray[np.float64]:
+        """Return the share of [0, fraction] of each segment where power > threshold."""
+        above_start = self.power[segment] - self.sunlit_threshold
+        above_stop = self.power[segment + 1] - self.sunlit_threshold
+        change = above_start - above_stop
+        crossing = np.divide(
+            above_start, change, out=np.zeros_like(change), where=change != 0
+        )
+        return np.select(
+            [
+                (above_start > 0) & (above_stop > 0),
+                (above_start <= 0) & (above_stop <= 0),
+                above_start > 0,  # Falling through the threshold at crossing
+            ],
+            [fraction, 0.0, np.minimum(fraction, crossing)],
+            np.maximum(fraction - crossing, 0.0),  # Rising through it
+        )
+
+    def energy_at(self, times: ArrayLike) -> NDArray[np.float64]:
+        """Return the energy generated from the first sample up to every time, in Wh."""
+        return self.prefix_values(self.to_seconds(times))[0]
+
+    def sunlit_at(self, times: ArrayLike) -> NDArray[np.float64]:
+        """Return the sunlit seconds from the first sample up to every time."""
+        return self.prefix_values(self.to_seconds(times))[1]
+
+    def prefix_values(self, seconds: NDArray[np.float64]):
+        """Return the energy in Wh and the sunlit seconds up to every time."""
+        left, fraction, into = self.locate(seconds)
+        power = self.power[left] + fraction * (self.power[left + 1] - self.power[left])
+        energy = (
+            self.cumulative_wh[left] + 0.5 * (self.power[left] + power) * into / 3600
+        )
+
+        span = self.seconds[left + 1] - self.seconds[left]
+        sunlit = self.cumulative_sunlit[left] + span * self.sunlit_fraction(
+            left, fraction
+        )
+        return energy, sunlit
+
+    def window_energy_wh(
+        self, start: ArrayLike, stop: ArrayLike
+    ) -> NDArray[np.float64]:
+        return self.energy_at(stop) - self.energy_at(start)
+
+    def average_power_w(self, start: ArrayLike, stop: ArrayLike) -> NDArray[np.float64]:
+        """Return the average power over the windows, clipped to the series, NaN for
+        empty windows."""
+        start = self.clip(self.to_seconds(start))
+        stop = self.clip(self.to_seconds(stop))
+        return average_power(self.window_energy_wh(start, stop), stop - start)
+
+    def sunlit_seconds(self, start: ArrayLike, stop: ArrayLike) -> NDArray[np.float64]:
+        return self.sunlit_at(stop) - self.sunlit_at(start)
+
+    def windows(self, start: ArrayLike, stop: ArrayLike) -> WindowStats:
+        """Answer all three questions for arrays of windows [start, stop).
+
+        Args:
+            start (ArrayLike): (N,) window starts, seconds on the index's axis or
+                datetime64
+            stop (ArrayLike): (N,) window ends
+
+        Returns:
+            stats (WindowStats): (N,) energy in Wh, average power in W (NaN for empty
+                windows) and sunlit seconds of every window. Windows are clipped to
+                the series.
+        """
+        start = self.clip(self.to_seconds(start))
+        stop = self.clip(self.to_seconds(stop))
+        start_energy, start_sunlit = self.prefix_values(start)
+        stop_energy, stop_sunlit = self.prefix_values(stop)
+
+        energy = stop_energy - start_energy
+        return WindowStats(
+            energy, average_power(energy, stop - start), stop_sunlit - start_sunlit
+        )
+
+
+def average_power(energy_wh, duration_seconds) -> NDArray[np.float64]:
+    energy_wh = np.asarray(energy_wh, dtype=np.float64)
+    return np.divide(
+        energy_wh * 3600,
+        duration_seconds,
+        out=np.full_like(energy_wh, np.nan),
+        where=np.asarray(duration_seconds) > 0,
+    )
+
+
+def prefix_sum(values: NDArray[np.float64]) -> NDArray[np.float64]:
+    """Return the running sums of values, starting from 0, (N + 1,)."""
+    total = np.zeros(values.size + 1)
+    np.cumsum(values, out=total[1:])
+    return total
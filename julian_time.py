@@ -0,0 +1,119 @@
+"""
+This is the time module for the power model, it converts whole time columns to
+Julian dates and elapsed seconds
+
+Input: numpy datetime64 arrays or pandas DatetimeIndex/Series (UTC)
+
+Output: float64 Julian dates / centuries, or an exact (day, fraction) split
+
+"""
+
+from typing import NamedTuple
+
+from numpy.typing import ArrayLike, NDArray
+import numpy as np
+
+J2000_JULIAN_DATE = 2451545.0
+UNIX_EPOCH_JULIAN_DATE = 2440587.5
+NANOSECONDS_PER_DAY = 86400 * 10**9
+
+
+class JulianDateParts(NamedTuple):
+    day: NDArray[np.float64]  # Julian day number, the integer part
+    fraction: NDArray[np.float64]  # Fraction of the day in [0, 1)
+
+
+def to_datetime64(times: ArrayLike) -> NDArray[np.datetime64]:
+    """Return UTC times as a datetime64[ns] array.
+
+    Args:
+        times (ArrayLike): datetime64 array, pandas DatetimeIndex/Series (naive UTC or
+            timezone aware) or a sequence of datetime objects
+
+    Returns:
+        times (NDArray[np.datetime64]): (N,) datetime64[ns] array
+    """
+    accessor = getattr(times, "dt", times)  # pandas Series keep tz on .dt
+    if getattr(accessor, "tz", None) is not None:
+        times = accessor.tz_convert("UTC")
+        times = getattr(times, "dt", times).tz_localize(None)
+    return np.asarray(times, dtype="datetime64[ns]")
+
+
+def julian_date_parts(times: ArrayLike) -> JulianDateParts:
+    """Split times into Julian day number and day fraction without rounding.
+
+    A single float64 Julian date only resolves ~40 us, the two parts together
+    keep the nanoseconds of the datetime64 input over any span.
+
+    Args:
+        times (ArrayLike): (N,) UTC times, see to_datetime64
+
+    Returns:
+        parts (JulianDateParts): (N,) day numbers and (N,) day fractions
+    """
+    # Julian days start at noon, shift so that integer division splits at noon
+    nanoseconds = to_datetime64(times).astype(np.int64) + NANOSECONDS_PER_DAY // 2
+    days, remainder = np.divmod(nanoseconds, NANOSECONDS_PER_DAY)
+    return JulianDateParts(
+        (days + int(UNIX_EPOCH_JULIAN_DATE - 0.5)).astype(np.float64),
+        remainder / NANOSECONDS_PER_DAY,
+    )
+
+
+def julian_dates(times: ArrayLike) -> NDArray[np.float64]:
+    """Convert an (N,) time array to Julian dates.
+
+    Args:
+        times (ArrayLike): (N,) UTC times, see to_datetime64, or Julian dates as floats
+
+    Returns:
+        julian_dates (NDArray[np.float64]): (N,) observation times as julian dates
+    """
+    if is_numeric(times):
+        return np.asarray(times, dtype=np.float64)
+    day, fraction = julian_date_parts(times)
+    return day + fraction
+
+
+def julian_centuries(times: ArrayLike) -> NDArray[np.float64]:
+    """Convert an (N,) time array to Julian centuries since J2000 (Eq. 5.2).
+
+    The day difference to J2000 is taken before adding the fraction, so the
+    precision of the two-part representation carries through.
+
+    Args:
+        times (ArrayLike): (N,) UTC times, see to_datetime64, or Julian dates as floats
+
+    Returns:
+        julian_centuries (NDArray[np.float64]): (N,) times in Julian centuries
+    """
+    if is_numeric(times):
+        return (np.asarray(times, dtype=np.float64) - J2000_JULIAN_DATE) / 36525.0
+    day, fraction = julian_date_parts(times)
+    return ((day - J2000_JULIAN_DATE) + fraction) / 36525.0
+
+
+def seconds_since(times: ArrayLike, epoch=None) -> NDArray[np.float64]:
+    """Return the seconds elapsed since epoch for every time.
+
+    Args:
+        times (ArrayLike): (N,) UTC times, see to_datetime64
+        epoch: Reference time (anything np.datetime64 accepts), the first time by default
+
+    Returns:
+        elapsed (NDArray[np.float64]): (N,) elapsed seconds
+    """
+    times = to_datetime64(times)
+    if epoch is None:
+        epoch = times[0] if times.size else np.datetime64(0, "ns")
+    nanoseconds = (times - np.datetime64(epoch, "ns")).astype(np.int64)
+    return nanoseconds / 1e9
+
+
+def is_numeric(times: ArrayLike) -> bool:
+    """Return True for plain numbers (e.g. Julian dates) rather than date-times."""
+    dtype = getattr(times, "dtype", None)
+    if not isinstance(dtype, np.dtype):  # lists, or pandas extension dtypes
+        dtype = np.asarray(times).dtype if dtype is None else np.dtype(object)
+    return np.issubdtype(dtype, np.number)
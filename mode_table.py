@@ -0,0 +1,201 @@
+"""
+This is the mode table for the power model, it compiles the power consumption
+dictionary and the mode dictionaries of the FSM into numpy arrays once, when the FSM
+is loaded
+
+Input: the power consumption dictionary (watts per subsystem) and the mode
+dictionaries (%_active or sec_active per subsystem)
+
+Output: a dense (modes x subsystems) activity matrix, a seconds flag per mode and the
+per-mode terms the FSM needs, so an action is an index lookup and a dot product
+instead of a dictionary walk
+
+"""
+
+from typing import NamedTuple
+
+from numpy.typing import ArrayLike, NDArray
+import numpy as np
+
+from battery import ORBITAL_PERIOD_SECONDS
+
+PERCENT_MODES = ("detumbling", "detumbed_beacon", "idle", "low_power")
+FIXED_SECONDS_MODES = ("antenna_deploy", "camera", "centrifuge")
+
+
+class ActionBatch(NamedTuple):
+    energy_wh: NDArray[np.float64]  # NaN where the action is not feasible
+    time_spent: NDArray[np.float64]  # NaN where the action is not feasible
+    feasible: NDArray[np.bool_]
+
+
+class ModePowerTable:
+    """
+    This class holds the modes of the FSM as one (modes x subsystems) matrix.
+    """
+
+    def __init__(
+        self,
+        subsystems: list[str],
+        watts: NDArray[np.float64],
+        modes: list[str],
+        activity: NDArray[np.float64],
+        fixed_seconds: NDArray[np.bool_],
+        period_seconds=ORBITAL_PERIOD_SECONDS,
+    ):
+        self.subsystems = list(subsystems)
+        self.watts = np.asarray(watts, dtype=np.float64)  # (S,) W per subsystem
+        self.modes = list(modes)
+        self.activity = np.asarray(activity, dtype=np.float64)  # (M, S) % or s
+        self.fixed_seconds = np.asarray(fixed_seconds, dtype=bool)  # (M,) s not %
+        self.period_seconds = period_seconds  # Orbit the sec_active modes are per
+        self.mode_index = {mode: index for index, mode in enumerate(self.modes)}
+
+        # Summed in order, to the same values as the sums over the dictionaries
+        self.activity_sum = np.array([sum(row) for row in self.activity.tolist()])
+        self.total_watts = sum(self.watts.tolist())
+
+        # Time spent in a mode for a state time t, as (offset, slope) . (1, t): the
+        # summed seconds of a sec_active mode, or t itself for a %_active mode
+        self.time_terms = np.stack(
+            [np.where(self.fixed_seconds, self.activity_sum, 0.0), ~self.fixed_seconds],
+            axis=1,
+        ).astype(np.float64)
+
+        # Summed seconds active over all subsystems, as (offset, slope) . (1, t)
+        self.seconds_terms = np.stack(
+            [
+                np.where(self.fixed_seconds, self.activity_sum, 0.0),
+                np.where(self.fixed_seconds, 0.0, self.activity_sum / 100),
+            ],
+            axis=1,
+        )
+
+        # Watt-seconds of a mode, per % of the state time or per orbit
+        self.weighted_watts = self.activity @ self.watts
+
+        # Python copies of the terms, scalar lookups on them beat numpy calls
+        self.time_terms_list = self.time_terms.tolist()
+        self.seconds_terms_list = self.seconds_terms.tolist()
+
+    @classmethod
+    def from_dicts(
+        cls,
+        power_consumption: dict,
+        mode_tables: dict,
+        fixed_seconds_modes=FIXED_SECONDS_MODES,
+    ):
+        """Compile the FSM dictionaries.
+
+        Args:
+            power_consumption (dict): Power of every subsystem in watts
+            mode_tables (dict): Mode name -> {subsystem: %_active or sec_active}
+            fixed_seconds_modes (tuple): Modes whose tables are in seconds
+
+        Returns:
+            table (ModePowerTable): The compiled table
+        """
+        subsystems = list(power_consumption)
+        activity = np.zeros((len(mode_tables), len(subsystems)))
+        for row, table in enumerate(mode_tables.values()):
+            unknown = set(table) - set(subsystems)
+            if unknown:
+                raise ValueError(f"Unknown subsystems in mode table: {sorted(unknown)}")
+            activity[row] = [table.get(name, 0) for name in subsystems]
+
+        return cls(
+            subsystems,
+            [power_consumption[name] for name in subsystems],
+            list(mode_tables),
+            activity,
+            [mode in fixed_seconds_modes for mode in mode_tables],
+        )
+
+    def index(self, mode) -> int:
+        return self.mode_index[mode]
+
+    def power_consumption(self) -> dict:
+        """Return {subsystem: W}, as the FSM files write it."""
+        return dict(zip(self.subsystems, self.watts.tolist()))
+
+    def mode_ids(self, actions: ArrayLike) -> NDArray[np.intp]:
+        """Return the mode indices of an array of mode names (or indices)."""
+        return lookup_ids(actions, self.mode_index, "mode")
+
+    def subsystem_ids(self, actions: ArrayLike) -> NDArray[np.intp]:
+        """Return the subsystem indices of an array of subsystem names (or indices)."""
+        index = {name: column for column, name in enumerate(self.subsystems)}
+        return lookup_ids(actions, index, "subsystem")
+
+    def state_time(self, mode: int, state_time) -> float:
+        """Return the time spent in the mode, as FSM_w_timer counts it."""
+        offset, slope = self.time_terms_list[mode]
+        return offset + slope * state_time
+
+    def seconds_active(self, mode: int, state_time) -> NDArray[np.float64]:
+        """Return the seconds active of every subsystem, (S,)."""
+        if self.fixed_seconds[mode]:
+            return self.activity[mode]
+        return self.activity[mode] * (state_time / 100)
+
+    def total_seconds_active(self, mode: int, state_time) -> float:
+        """Return the seconds active summed over the subsystems, as FSM_pm counts it."""
+        offset, slope = self.seconds_terms_list[mode]
+        return offset + slope * state_time
+
+    def energy_wh(self, mode: int, state_time) -> float:
+        """Return the energy the subsystems draw in the mode, in Wh."""
+        return float(self.watts @ self.seconds_active(mode, state_time)) / 3600
+
+    def state_times(
+        self, modes: NDArray[np.intp], state_times: ArrayLike
+    ) -> NDArray[np.float64]:
+        """state_time over arrays of mode indices and state times."""
+        terms = self.time_terms[modes]
+        return terms[..., 0] + terms[..., 1] * state_times
+
+    def total_seconds_active_batch(
+        self, modes: NDArray[np.intp], state_times: ArrayLike
+    ) -> NDArray[np.float64]:
+        """total_seconds_active over arrays of mode indices and state times."""
+        terms = self.seconds_terms[modes]
+        return terms[..., 0] + terms[..., 1] * state_times
+
+    def energies_wh(
+        self, modes: NDArray[np.intp], state_times: ArrayLike
+    ) -> NDArray[np.float64]:
+        """energy_wh over arrays of mode indices and state times."""
+        scale = np.where(
+            self.fixed_seconds[modes], 1.0, np.asarray(state_times, dtype=float) / 100
+        )
+        return self.weighted_watts[modes] * scale / 3600
+
+    def average_power_w(self, period_seconds=None):
+        """Return the average load of every mode in watts, (M,).
+
+        sec_active modes are spread over one orbit of period_seconds, the table's
+        orbital period if None.
+        """
+        if period_seconds is None:
+            period_seconds = self.period_seconds
+        return np.where(
+            self.fixed_seconds,
+            self.weighted_watts / period_seconds,
+            self.weighted_watts / 100,
+        )
+
+
+def lookup_ids(actions: ArrayLike, index: dict, kind: str) -> NDArray[np.intp]:
+    """Map an array of names to indices, integer arrays are taken as they are."""
+    actions = np.asarray(actions)
+    if actions.dtype.kind in "iu":
+        if actions.size and (actions.min() < 0 or actions.max() >= len(index)):
+            raise ValueError(f"{kind} indices must be in [0, {len(index)})")
+        return actions.astype(np.intp)
+
+    names, inverse = np.unique(actions.astype(str), return_inverse=True)
+    unknown = [name for name in names.tolist() if name not in index]
+    if unknown:
+        raise ValueError(f"Unknown {kind} names: {unknown}")
+    ids = np.array([index[name] for name in names.tolist()], dtype=np.intp)
+    return ids[inverse].reshape(actions.shape)
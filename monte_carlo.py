@@ -0,0 +1,246 @@
+"""
+This is the Monte Carlo analysis for the power model, it runs the battery over a
+power profile for many perturbed parameter sets and reports the spread of the margins
+
+Input: the power profile (Power_Generation.csv by default), the FSM mode of every
+sample and the uncertainty of the inputs: the subsystem wattages (+- tolerance), the
+panel output (degradation) and the battery capacity
+
+Output: the minimum state of charge, the unmet load and the energy margin of every
+sample, and their percentiles
+
+Notes: Every chunk of samples draws from its own child of one SeedSequence, so a seed
+gives the same results whatever the number of worker processes. The profile is put
+in shared memory once instead of being pickled to every task.
+
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import NamedTuple
+
+from numpy.typing import NDArray
+import numpy as np
+
+from battery import Battery, step_durations
+from budget_loader import default_mode_table
+from power_cache import load_timed_power_series
+from timeline import POWER_GENERATION_CSV
+
+METRICS = ("min_soc_wh", "unmet_wh", "energy_margin_wh")
+
+
+class Uncertainty(NamedTuple):
+    watts_tolerance: float = 0.1  # Every subsystem draws (1 +- tolerance) x its W
+    panel_degradation: float = 0.2  # Panel output is (1 - degradation, 1] x nominal
+    capacity_wh: tuple = (20.0,)  # Battery capacities, one is drawn per sample
+
+
+class MonteCarloResult(NamedTuple):
+    watts_scale: NDArray[np.float64]  # (N, S) factor on every subsystem's W
+    panel_factor: NDArray[np.float64]  # (N,) factor on the generated power
+    capacity_wh: NDArray[np.float64]  # (N,)
+    min_soc_wh: NDArray[np.float64]  # (N,) lowest state of charge of the run
+    unmet_wh: NDArray[np.float64]  # (N,) load the battery could not supply
+    energy_margin_wh: NDArray[np.float64]  # (N,) energy generated - energy drawn
+
+    def percentiles(self, q=(5, 50, 95)) -> dict:
+        """Return {metric: (len(q),) percentiles} for the metrics in METRICS."""
+        return {metric: np.percentile(getattr(self, metric), q) for metric in METRICS}
+
+    def failure_probability(self) -> float:
+        """Return the share of samples where some of the load went unmet."""
+        return float(np.mean(self.unmet_wh > 1e-9))
+
+
+class MonteCarloRunner:
+    """
+    This class samples parameter sets and simulates them, a chunk of samples at a
+    time as the lanes of one vectorized battery run.
+    """
+
+    def __init__(
+        self, times, power, mode_table=None, uncertainty=Uncertainty(), battery=None
+    ):
+        if mode_table is None:
+            mode_table = default_mode_table()
+        self.mode_table = mode_table
+        self.uncertainty = uncertainty
+        self.battery = Battery() if battery is None else battery  # Capacity is drawn
+        self.power = np.ascontiguousarray(power, dtype=np.float64)
+        self.step_seconds = step_durations(times)
+
+    @classmethod
+    def from_csv(
+        cls,
+        filepath=POWER_GENERATION_CSV,
+        time_column="Time (UTCG)",
+        power_column="Power (W)",
+        mode_table=None,
+        uncertainty=Uncertainty(),
+        battery=None,
+    ):
+        series = load_timed_power_series(filepath, time_column, power_column)
+        return cls(series.times, series.power, mode_table, uncertainty, battery)
+
+    def run(
+        self,
+        modes,
+        samples=10000,
+        seed=0,
+        chunk_size=256,
+        max_workers=None,
+        period_seconds=None,
+    ) -> MonteCarloResult:
+        """Simulate samples perturbed parameter sets.
+
+        Args:
+            modes (ArrayLike): FSM mode of every sample of the profile (names or
+                mode_table indices), or one mode for the whole profile
+            samples (int): Number of parameter sets
+            seed (int): Seed of the SeedSequence the chunks draw from
+            chunk_size (int): Parameter sets simulated together, (chunk_size, T)
+                arrays are held per worker
+            max_workers (int): Worker processes, 1 runs in this process
+            period_seconds (float): Orbit the sec_active modes are spread over, the
+                mode table's orbital period if None
+
+        Returns:
+            result (MonteCarloResult): (N,) parameters and margins of every sample
+        """
+        mode_ids = np.broadcast_to(
+            self.mode_table.mode_ids(modes), self.power.shape
+        ).astype(np.intp)
+        if period_seconds is None:
+            period_seconds = self.mode_table.period_seconds
+        divisor = np.where(self.mode_table.fixed_seconds, period_seconds, 100.0)
+        inputs = {
+            "power": self.power,
+            "step_seconds": self.step_seconds,
+            "mode_ids": mode_ids,
+            "watts": self.mode_table.watts,
+            "activity": self.mode_table.activity,
+            "divisor": divisor,
+        }
+
+        counts = [
+            min(chunk_size, samples - start) for start in range(0, samples, chunk_size)
+        ]
+        seeds = np.random.SeedSequence(seed).spawn(len(counts))
+        jobs = [
+            (seed_sequence, count, self.uncertainty, self.battery)
+            for seed_sequence, count in zip(seeds, counts)
+        ]
+
+        if max_workers == 1:
+            chunks = [run_chunk(inputs, *job) for job in jobs]
+        else:
+            with SharedArrays(inputs) as shared, ProcessPoolExecutor(
+                max_workers
+            ) as executor:
+                futures = [
+                    executor.submit(run_shared_chunk, shared.specs, *job)
+                    for job in jobs
+                ]
+                chunks = [future.result() for future in futures]
+
+        if not chunks:
+            empty = np.empty(0)
+            return MonteCarloResult(
+                np.empty((0, self.mode_table.watts.size)), *[empty] * 5
+            )
+        return MonteCarloResult(*(np.concatenate(field) for field in zip(*chunks)))
+
+
+def sample_parameters(uncertainty: Uncertainty, subsystems: int, count: int, rng):
+    """Draw count parameter sets, each input uniform over its range.
+
+    Returns:
+        watts_scale (NDArray): (count, subsystems) factors on the subsystem wattages
+        panel_factor (NDArray): (count,) factors on the generated power
+        capacity_wh (NDArray): (count,) battery capacities
+    """
+    tolerance = uncertainty.watts_tolerance
+    watts_scale = rng.uniform(1 - tolerance, 1 + tolerance, (count, subsystems))
+    panel_factor = 1 - rng.uniform(0, uncertainty.panel_degradation, count)
+    capacity_wh = rng.choice(np.asarray(uncertainty.capacity_wh, float), count)
+    return watts_scale, panel_factor, capacity_wh
+
+
+def run_chunk(
+    inputs: dict, seed_sequence, count, uncertainty: Uncertainty, battery: Battery
+):
+    """Sample and simulate count parameter sets as the lanes of one battery run."""
+    rng = np.random.default_rng(seed_sequence)
+    watts_scale, panel_factor, capacity_wh = sample_parameters(
+        uncertainty, inputs["watts"].size, count, rng
+    )
+
+    # (count, M) average load of every mode, then (count, T) along the profile
+    mode_load_w = (watts_scale * inputs["watts"]) @ inputs["activity"].T
+    mode_load_w /= inputs["divisor"]
+    load_w = mode_load_w[:, inputs["mode_ids"]]
+    generation_w = panel_factor[:, np.newaxis] * inputs["power"]
+
+    trace = battery.with_capacity(capacity_wh).simulate(
+        generation_w, load_w, inputs["step_seconds"]
+    )
+
+    margin_wh = (generation_w - load_w) @ inputs["step_seconds"] / 3600
+    return (
+        watts_scale,
+        panel_factor,
+        capacity_wh,
+        trace.soc_wh.min(axis=1),
+        -np.minimum(trace.clipped_wh, 0).sum(axis=1),
+        margin_wh,
+    )
+
+
+def run_shared_chunk(specs: dict, *job):
+    """run_chunk in a worker process, on the inputs in shared memory."""
+    inputs, blocks = attach_shared(specs)
+    try:
+        return run_chunk(inputs, *job)
+    finally:
+        del inputs
+        for block in blocks:
+            block.close()
+
+
+class SharedArrays:
+    """
+    This class copies arrays into shared memory blocks for the life of a with block.
+    specs describes them to attach_shared in another process.
+    """
+
+    def __init__(self, arrays: dict):
+        self.blocks = []
+        self.specs = {}
+        for name, array in arrays.items():
+            array = np.ascontiguousarray(array)
+            block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+            self.blocks.append(block)
+            np.ndarray(array.shape, array.dtype, buffer=block.buf)[...] = array
+            self.specs[name] = (block.name, array.shape, array.dtype.str)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        for block in self.blocks:
+            block.close()
+            block.unlink()
+
+
+def attach_shared(specs: dict) -> tuple[dict, list]:
+    """Return read-only views of the arrays in specs and the blocks to close."""
+    arrays = {}
+    blocks = []
+    for name, (block_name, shape, dtype) in specs.items():
+        block = shared_memory.SharedMemory(name=block_name)
+        blocks.append(block)
+        array = np.ndarray(shape, dtype, buffer=block.buf)
+        array.flags.writeable = False
+        arrays[name] = array
+    return arrays, blocks
@@ -0,0 +1,236 @@
+"""
+This is the output layer for the power model, it takes the rows the engines and FSMs
+used to print one at a time
+
+Input: rows of values (e.g. time, solar power, running total), one at a time or as
+columns of a whole batch
+
+Output: nothing (NullSink), the printed rows as before (PrintSink), a CSV or Parquet
+file written in batches (CSVSink, ParquetSink) or a console summary at most once per
+interval (ConsoleSummarySink)
+
+"""
+
+from abc import ABC, abstractmethod
+import csv
+import importlib.util
+import time
+
+import numpy as np
+
+
+class OutputSink(ABC):
+    """
+    This class is the interface of the sinks. write takes one row, write_batch the
+    columns of many rows.
+    """
+
+    def write(self, *values):
+        self.write_batch(*([value] for value in values))
+
+    @abstractmethod
+    def write_batch(self, *columns):
+        pass
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class NullSink(OutputSink):
+    """
+    This class drops every row, for simulations that only need the results.
+    """
+
+    def write(self, *values):
+        pass
+
+    def write_batch(self, *columns):
+        pass
+
+
+class PrintSink(OutputSink):
+    """
+    This class prints every row with a str.format template, the behaviour before
+    the sinks.
+    """
+
+    def __init__(self, template=None, file=None):
+        # e.g. "Time: {}, Solar Power: {} W", None to join the values with ", "
+        self.template = template
+        self.file = file
+
+    def format(self, values):
+        if self.template is None:
+            return ", ".join(str(value) for value in values)
+        return self.template.format(*values)
+
+    def write(self, *values):
+        print(self.format(values), file=self.file)
+
+    def write_batch(self, *columns):
+        for values in zip(*(as_list(column) for column in columns)):
+            print(self.format(values), file=self.file)
+
+
+class ConsoleSummarySink(PrintSink):
+    """
+    This class prints the row count and the latest row at most once per interval
+    seconds, and once more on close.
+    """
+
+    def __init__(self, template=None, interval=1.0, file=None):
+        super().__init__(template, file)
+        self.interval = interval
+        self.rows = 0
+        self.last = None  # Latest row
+        self.printed_at = None
+
+    def write(self, *values):
+        self.rows += 1
+        self.last = values
+        self.print_summary()
+
+    def write_batch(self, *columns):
+        count = len(columns[0]) if columns else 0
+        if count:
+            self.rows += count
+            self.last = tuple(as_list(column[-1:])[0] for column in columns)
+            self.print_summary()
+
+    def print_summary(self, force=False):
+        now = time.monotonic()
+        if force or self.printed_at is None or now - self.printed_at >= self.interval:
+            self.printed_at = now
+            if self.last is not None:
+                print(
+                    f"{self.rows} rows, last: {self.format(self.last)}", file=self.file
+                )
+
+    def close(self):
+        self.print_summary(force=True)
+
+
+class BufferedSink(OutputSink):
+    """
+    This class collects rows and hands them to write_chunks every batch_size rows,
+    so the file is written in a few large writes.
+    """
+
+    def __init__(self, columns, batch_size=65536):
+        self.columns = list(columns)  # Column names
+        self.batch_size = batch_size
+        self.rows = []  # Rows from write, not yet in chunks
+        self.chunks = []  # Columns from write_batch (and collected rows), in order
+        self.pending = 0  # Rows waiting to be written
+
+    def write(self, *values):
+        self.rows.append(values)
+        self.pending += 1
+        if self.pending >= self.batch_size:
+            self.flush()
+
+    def write_batch(self, *columns):
+        if len(columns) != len(self.columns):
+            raise ValueError(
+                f"Expected {len(self.columns)} columns, got {len(columns)}"
+            )
+        self.collect_rows()
+        self.chunks.append(columns)
+        self.pending += len(columns[0])
+        if self.pending >= self.batch_size:
+            self.flush()
+
+    def collect_rows(self):
+        if self.rows:
+            self.chunks.append(tuple(zip(*self.rows)))
+            self.rows = []
+
+    def flush(self):
+        self.collect_rows()
+        if self.chunks:
+            self.write_chunks(self.chunks)
+        self.chunks = []
+        self.pending = 0
+
+    @abstractmethod
+    def write_chunks(self, chunks):
+        """Write the collected (columns) chunks, in order."""
+
+
+class CSVSink(BufferedSink):
+    """
+    This class writes the rows to a CSV file, with the column names as header.
+    """
+
+    def __init__(self, filepath, columns, batch_size=65536):
+        super().__init__(columns, batch_size)
+        self.file = open(filepath, "w", newline="")
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(self.columns)
+
+    def write_chunks(self, chunks):
+        for columns in chunks:
+            self.writer.writerows(zip(*(as_list(column) for column in columns)))
+        self.file.flush()
+
+    def close(self):
+        super().close()
+        self.file.close()
+
+
+class ParquetSink(BufferedSink):
+    """
+    This class writes the rows to a Parquet file, one row group per flush. It needs
+    pyarrow, which is only imported here. Without it the sink fails when created,
+    CSVSink needs nothing beyond the standard library.
+    """
+
+    def __init__(self, filepath, columns, batch_size=65536):
+        if importlib.util.find_spec("pyarrow") is None:
+            raise ImportError("ParquetSink needs pyarrow, use CSVSink without it")
+        super().__init__(columns, batch_size)
+        self.filepath = filepath
+        self.writer = None  # Opened on the first flush, with the schema of the data
+
+    def write_chunks(self, chunks):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        table = pa.table(
+            {
+                name: np.concatenate([np.asarray(chunk[i]) for chunk in chunks])
+                for i, name in enumerate(self.columns)
+            }
+        )
+        if self.writer is None:
+            self.writer = pq.ParquetWriter(self.filepath, table.schema)
+        self.writer.write_table(table)
+
+    def close(self):
+        super().close()
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+
+
+def as_list(column):
+    """Return a column as a list of Python values (numpy scalars print differently)."""
+    return column.tolist() if hasattr(column, "tolist") else list(column)
+
+
+def default_sink(sink, template):
+    """Return sink, or a PrintSink with template if sink is None.
+
+    The engines and FSMs take any OutputSink. All of them run on the standard
+    library and numpy, except ParquetSink, which needs pyarrow.
+    """
+    return PrintSink(template) if sink is None else sink
@@ -0,0 +1,225 @@
+"""
+This is the CSV cache for the power model, it keeps the cleaned, typed columns of a
+solar power CSV in a binary sidecar so the CSV is only parsed once
+
+Input: the CSV data
+
+Output: the time labels, parsed times, power and solar intensity as (memory-mapped)
+numpy arrays
+
+Notes: The sidecar is the directory "<csv>.npycache" next to the CSV. It is rebuilt
+when the CSV's size or mtime changed and its content hash no longer matches. Its
+times.npy and power.npy can be opened as a PowerStore.
+
+"""
+
+import hashlib
+import json
+import os
+from typing import NamedTuple
+
+from numpy.typing import NDArray
+import numpy as np
+
+from power_store import POWER_FILE, TIMES_FILE, PowerStore, save_array
+from utcg_time import parse_utcg_time
+
+CACHE_SUFFIX = ".npycache"
+CACHE_VERSION = 3
+LABELS_FILE = "labels.npy"
+INTENSITY_FILE = "intensity.npy"
+INTENSITY_COLUMN = "Solar Intensity"
+
+
+class MissingColumnsError(ValueError):
+    pass
+
+
+class CSVParseError(ValueError):
+    """pandas' ParserError, raised as our own so callers need not import pandas."""
+
+
+class PowerSeries(NamedTuple):
+    labels: NDArray[np.bytes_] | None  # "Time (UTCG)" labels, None for a PowerStore
+    times: NDArray[np.datetime64] | None  # None if the labels are not a known format
+    power: NDArray[np.float64]
+    intensity: NDArray[np.float64] | None = None  # None if the CSV has no such column
+
+    def to_frame(self, time_column="Time (UTCG)", power_column="Power (W)"):
+        """Return the series as the frame process_csv_data has always returned."""
+        import pandas as pd
+
+        return pd.DataFrame(
+            {time_column: self.label_strings(), power_column: self.power}
+        )
+
+    def label_strings(self) -> NDArray:
+        """Return the time labels as str, the ISO times if there are none."""
+        if self.labels is None:
+            return np.datetime_as_string(self.times)
+        return self.labels.astype(str)
+
+
+def read_power_csv(
+    filepath,
+    time_column="Time (UTCG)",
+    power_column="Power (W)",
+    intensity_column=INTENSITY_COLUMN,
+):
+    """Parse and clean the CSV, without the cache.
+
+    Rows with a non-numeric power value (blank lines, the repeated headers of
+    multi-section STK exports) are dropped. The intensity column is optional.
+
+    Raises:
+        FileNotFoundError: The CSV does not exist
+        CSVParseError: The CSV is malformed
+        MissingColumnsError: The time or power column is missing
+    """
+    import pandas as pd
+
+    try:
+        data = pd.read_csv(filepath)
+    except pd.errors.ParserError as e:
+        raise CSVParseError(str(e)) from e
+    if not (time_column in data.columns and power_column in data.columns):
+        raise MissingColumnsError(
+            f"Columns '{time_column}' and '{power_column}' not found in CSV"
+        )
+
+    # Ensure the power column is numeric, and drop the rows where it is not
+    power = pd.to_numeric(data[power_column], errors="coerce")
+    keep = power.notna().to_numpy()
+
+    labels = data[time_column].to_numpy()[keep].astype("S")
+    try:
+        times = parse_utcg_time(labels).times
+    except ValueError:
+        times = None
+
+    intensity = None
+    if intensity_column in data.columns:
+        intensity = pd.to_numeric(data[intensity_column], errors="coerce")
+        intensity = intensity.to_numpy(dtype=np.float64)[keep]
+    return PowerSeries(labels, times, power.to_numpy(dtype=np.float64)[keep], intensity)
+
+
+def load_power_series(
+    filepath,
+    time_column="Time (UTCG)",
+    power_column="Power (W)",
+    use_cache=True,
+    intensity_column=INTENSITY_COLUMN,
+):
+    """Return the cleaned columns of the CSV, from the sidecar when it is current.
+
+    A cache hit memory-maps the arrays instead of reading the CSV. A miss parses the
+    CSV and writes the sidecar, if the directory is writable. filepath may also be a
+    PowerStore directory, which is memory-mapped as it is.
+    """
+    if os.path.isdir(filepath):
+        store = PowerStore.open(filepath)
+        return PowerSeries(None, store.times, store.power)
+    if not use_cache:
+        return read_power_csv(filepath, time_column, power_column, intensity_column)
+
+    directory = cache_directory(filepath)
+    stat = os.stat(filepath)
+    meta = read_meta(directory)
+    columns = [time_column, power_column, intensity_column]
+    if meta is not None and meta["columns"] == columns:
+        if (meta["size"], meta["mtime_ns"]) == (stat.st_size, stat.st_mtime_ns):
+            return read_sidecar(directory, meta)
+        if meta["size"] == stat.st_size and meta["sha256"] == file_hash(filepath):
+            # Touched but unchanged, remember the new mtime
+            meta["mtime_ns"] = stat.st_mtime_ns
+            write_meta(directory, meta)
+            return read_sidecar(directory, meta)
+
+    series = read_power_csv(filepath, time_column, power_column, intensity_column)
+    try:
+        write_sidecar(directory, series, stat, file_hash(filepath), columns)
+    except OSError:
+        pass  # Read-only location, run without the cache
+    return series
+
+
+def load_timed_power_series(
+    filepath, time_column="Time (UTCG)", power_column="Power (W)"
+):
+    """load_power_series, for the simulations that need the time of every sample.
+
+    Raises:
+        ValueError: The time column is not a known time format
+    """
+    series = load_power_series(filepath, time_column, power_column)
+    if series.times is None:
+        raise ValueError(f"Column '{time_column}' is not a known time format")
+    return series
+
+
+def cache_directory(filepath):
+    return os.fspath(filepath) + CACHE_SUFFIX
+
+
+def file_hash(filepath):
+    digest = hashlib.sha256()
+    with open(filepath, "rb") as file:
+        for chunk in iter(lambda: file.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def read_meta(directory):
+    try:
+        with open(os.path.join(directory, "meta.json")) as file:
+            meta = json.load(file)
+    except (OSError, ValueError):
+        return None
+    return meta if meta.get("version") == CACHE_VERSION else None
+
+
+def write_meta(directory, meta):
+    path = os.path.join(directory, "meta.json")
+    with open(path + ".tmp", "w") as file:
+        json.dump(meta, file)
+    os.replace(path + ".tmp", path)
+
+
+def read_sidecar(directory, meta):
+    def load(filename):
+        return np.load(os.path.join(directory, filename), mmap_mode="r")
+
+    times = load(TIMES_FILE).view("datetime64[ns]") if meta["has_times"] else None
+    intensity = load(INTENSITY_FILE) if meta["has_intensity"] else None
+    return PowerSeries(load(LABELS_FILE), times, load(POWER_FILE), intensity)
+
+
+def write_sidecar(directory, series, stat, sha256, columns):
+    os.makedirs(directory, exist_ok=True)
+
+    # meta.json marks the sidecar as complete, so it goes first and comes back last
+    meta_path = os.path.join(directory, "meta.json")
+    if os.path.exists(meta_path):
+        os.remove(meta_path)
+
+    # times.npy and power.npy are laid out as a PowerStore
+    save_array(directory, LABELS_FILE, series.labels)
+    save_array(directory, POWER_FILE, series.power)
+    if series.times is not None:
+        save_array(directory, TIMES_FILE, series.times.astype(np.int64))
+    if series.intensity is not None:
+        save_array(directory, INTENSITY_FILE, series.intensity)
+
+    write_meta(
+        directory,
+        {
+            "version": CACHE_VERSION,
+            "columns": columns,
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "sha256": sha256,
+            "has_times": series.times is not None,
+            "has_intensity": series.intensity is not None,
+        },
+    )
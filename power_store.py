@@ -0,0 +1,105 @@
+"""
+This is the memory-mapped store for the power model, it keeps long power time series
+on disk and hands out zero-copy views of them
+
+Input: a store directory holding times.npy (int64 nanoseconds since 1970-01-01 UTC)
+and power.npy (float32 or float64 watts)
+
+Output: slices, time windows and sliding windows over the series, as views of the
+read-only memory map, so worker processes share one page-cached copy
+
+"""
+
+import os
+
+from numpy.typing import ArrayLike, NDArray
+import numpy as np
+
+TIMES_FILE = "times.npy"
+POWER_FILE = "power.npy"
+
+
+class PowerStore:
+    """
+    This class wraps the (memory-mapped) time and power arrays of a power series.
+    Nothing in it copies the data.
+    """
+
+    def __init__(self, times_ns: NDArray[np.int64], power: NDArray[np.floating]):
+        self.times_ns = times_ns  # int64 nanoseconds since 1970-01-01 UTC
+        self.power = power
+
+    @classmethod
+    def create(
+        cls, directory, times: ArrayLike, power: ArrayLike, power_dtype=np.float64
+    ):
+        """Write a store and return it, memory-mapped.
+
+        Args:
+            directory (str): Store directory, created if needed
+            times (ArrayLike): (N,) sorted datetime64 times
+            power (ArrayLike): (N,) power samples in watts
+            power_dtype: np.float32 halves the size, np.float64 keeps the values exact
+        """
+        times_ns = np.asarray(times, dtype="datetime64[ns]").astype(np.int64)
+        power = np.asarray(power, dtype=power_dtype)
+        if times_ns.shape != power.shape or times_ns.ndim != 1:
+            raise ValueError("times and power must be 1-d arrays of the same length")
+
+        os.makedirs(directory, exist_ok=True)
+        save_array(directory, TIMES_FILE, times_ns)
+        save_array(directory, POWER_FILE, power)
+        return cls.open(directory)
+
+    @classmethod
+    def open(cls, directory):
+        """Memory-map an existing store read-only."""
+        return cls(
+            np.load(os.path.join(directory, TIMES_FILE), mmap_mode="r"),
+            np.load(os.path.join(directory, POWER_FILE), mmap_mode="r"),
+        )
+
+    @property
+    def times(self) -> NDArray[np.datetime64]:
+        return self.times_ns.view("datetime64[ns]")
+
+    def __len__(self):
+        return self.power.shape[0]
+
+    def slice(self, start=None, stop=None):
+        """Return the samples [start, stop) as a store over views."""
+        return PowerStore(self.times_ns[start:stop], self.power[start:stop])
+
+    def window(self, start_time=None, stop_time=None):
+        """Return the samples with start_time <= time < stop_time as views.
+
+        The bounds are found by binary search, so only a few pages of the time
+        array are touched.
+        """
+        start, stop = self.window_indices(start_time, stop_time)
+        return self.slice(start, stop)
+
+    def window_indices(self, start_time=None, stop_time=None) -> tuple[int, int]:
+        start = 0
+        stop = len(self)
+        if start_time is not None:
+            start = int(np.searchsorted(self.times_ns, as_nanoseconds(start_time)))
+        if stop_time is not None:
+            stop = int(np.searchsorted(self.times_ns, as_nanoseconds(stop_time)))
+        return start, max(start, stop)
+
+    def sliding_windows(self, samples: int) -> NDArray[np.floating]:
+        """Return a (N - samples + 1, samples) read-only view of the power windows."""
+        return np.lib.stride_tricks.sliding_window_view(self.power, samples)
+
+
+def as_nanoseconds(time) -> int:
+    return int(np.datetime64(time, "ns").astype(np.int64))
+
+
+def save_array(directory, filename, array):
+    """Write array as directory/filename, replacing any old file in one step."""
+    path = os.path.join(directory, filename)
+    with open(path + ".tmp", "wb") as file:
+        np.save(file, np.ascontiguousarray(array))
+    os.replace(path + ".tmp", path)
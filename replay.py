@@ -0,0 +1,128 @@
+"""
+This is the replay engine for the power model, it plays power series back in (scaled)
+real time on an asyncio event loop
+
+Input: the times and power of one or more series (e.g. SolarPowerModel.power_store())
+and a speed-up factor
+
+Output: every sample, published at its (scaled) time to the subscribers of its
+series, e.g. an FSM
+
+Notes: Every sample is due at a fixed offset from the start of the replay, so late
+wake-ups do not add up to drift. Any number of series can replay on one loop.
+
+"""
+
+import asyncio
+import inspect
+from typing import NamedTuple
+
+from numpy.typing import ArrayLike
+import numpy as np
+
+
+class PowerSample(NamedTuple):
+    source: str  # Name of the series, e.g. the satellite
+    index: int  # Sample number within the series
+    time: np.datetime64
+    power: float  # W
+
+
+async def ticks(interval, start=None):
+    """Yield 0, 1, 2, ... at start + n * interval on the loop's clock.
+
+    Ticks are due at fixed times rather than a sleep of interval after the last
+    one, so they do not drift. A late tick is yielded straight away.
+    """
+    loop = asyncio.get_running_loop()
+    start = loop.time() if start is None else start
+    tick = 0
+    while True:
+        delay = start + tick * interval - loop.time()
+        await asyncio.sleep(max(delay, 0))
+        yield tick
+        tick += 1
+
+
+class PowerReplay:
+    """
+    This class replays one power series to its subscribers.
+    """
+
+    def __init__(self, name, times: ArrayLike, power: ArrayLike, speedup=1.0):
+        self.name = name
+        self.times = np.asarray(times, dtype="datetime64[ns]")
+        self.power = np.asarray(power, dtype=np.float64)
+        self.speedup = speedup  # e.g. 600 plays 10 minutes of data per second
+        self.subscribers = []
+        self.published = 0  # Samples published so far
+        self.max_lateness = 0.0  # Latest a sample has been published, in seconds
+
+    @classmethod
+    def from_store(cls, name, store, speedup=1.0):
+        return cls(name, store.times, store.power, speedup)
+
+    def subscribe(self, subscriber):
+        """Call subscriber(sample) for every sample, awaiting it if it is async."""
+        self.subscribers.append(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        self.subscribers.remove(subscriber)
+
+    async def publish(self, sample: PowerSample):
+        pending = [
+            result
+            for result in (subscriber(sample) for subscriber in self.subscribers)
+            if inspect.isawaitable(result)
+        ]
+        if pending:
+            await asyncio.gather(*pending)
+
+    async def run(self, start=None):
+        """Publish every sample at its due time, start being the loop time of sample 0.
+
+        Cancelling the task stops the replay between two samples.
+        """
+        loop = asyncio.get_running_loop()
+        start = loop.time() if start is None else start
+        elapsed = (self.times - self.times[:1]).astype(np.int64) / 1e9
+        due_times = (start + elapsed / self.speedup).tolist()
+
+        self.published = 0
+        for index in range(len(due_times)):
+            # sleep(0) when late still lets the other replays on the loop run
+            delay = due_times[index] - loop.time()
+            await asyncio.sleep(max(delay, 0))
+            self.max_lateness = max(self.max_lateness, -delay)
+
+            await self.publish(
+                PowerSample(
+                    self.name, index, self.times[index], float(self.power[index])
+                )
+            )
+            self.published = index + 1
+
+
+class ReplayEngine:
+    """
+    This class runs many replays on one event loop, from a common start.
+    """
+
+    def __init__(self, replays=()):
+        self.replays = list(replays)
+
+    def add(self, replay: PowerReplay):
+        self.replays.append(replay)
+        return replay
+
+    async def run(self):
+        """Run all replays to the end. Cancelling (or one replay failing) stops all."""
+        start = asyncio.get_running_loop().time()
+        tasks = [asyncio.create_task(replay.run(start)) for replay in self.replays]
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
@@ -0,0 +1,176 @@
+"""
+This is the sample bus for the power model, it passes the solar power samples from
+the engine to the FSMs without either side waiting on the other
+
+Input: samples published by a SolarPowerModel (or a PowerReplay), one at a time or
+in batches
+
+Output: every sample, in order, in a bounded ring buffer per subscriber, read back
+in batches whenever the subscriber is ready
+
+Notes: A full buffer either holds the publisher back (backpressure, publish accepts
+fewer samples and the rest are published again later, put waits until there is
+room) or, with drop_oldest, makes room by dropping the oldest unread samples.
+
+"""
+
+import asyncio
+import sys
+from typing import NamedTuple
+
+from numpy.typing import ArrayLike, NDArray
+import numpy as np
+
+from replay import PowerSample
+
+
+class SampleBatch(NamedTuple):
+    source: str  # Name of the series, e.g. the satellite
+    index: NDArray[np.int64]  # (N,) sample numbers within the series
+    times: NDArray[np.datetime64]  # (N,) datetime64[ns]
+    power: NDArray[np.float64]  # (N,) W
+
+    def samples(self):
+        """Yield the batch one PowerSample at a time."""
+        for index, time, power in zip(self.index, self.times, self.power.tolist()):
+            yield PowerSample(self.source, int(index), time, power)
+
+
+class SampleRing:
+    """
+    This class is the bounded ring buffer of one subscriber. Samples are kept in
+    preallocated arrays, so writing and reading a batch costs a few numpy copies.
+    """
+
+    def __init__(self, source, capacity=4096, drop_oldest=False):
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        self.source = source
+        self.capacity = capacity
+        self.drop_oldest = drop_oldest  # Drop unread samples instead of blocking
+        self.index = np.zeros(capacity, dtype=np.int64)
+        self.times_ns = np.zeros(capacity, dtype=np.int64)
+        self.power = np.zeros(capacity, dtype=np.float64)
+        self.written = 0  # Samples written so far
+        self.read_count = 0  # Samples read (or dropped) so far
+        self.dropped = 0
+        self.on_read = None  # Called after every read, e.g. to wake a waiting bus
+
+    def __len__(self):
+        return self.written - self.read_count
+
+    def free(self):
+        return self.capacity - len(self)
+
+    def write(self, index, times_ns, power):
+        """Append samples, dropping the oldest ones if the buffer overflows.
+
+        Without drop_oldest the publisher must not write more than free() samples.
+        """
+        count = len(power)
+        if count > self.free() and not self.drop_oldest:
+            raise ValueError("Ring buffer is full, publish at most free() samples")
+
+        # Only the newest capacity samples can survive the write
+        skip = max(count - self.capacity, 0)
+        positions = (self.written + np.arange(skip, count)) % self.capacity
+        self.index[positions] = index[skip:]
+        self.times_ns[positions] = times_ns[skip:]
+        self.power[positions] = power[skip:]
+        self.written += count
+
+        overflow = len(self) - self.capacity
+        if overflow > 0:
+            self.read_count += overflow
+            self.dropped += overflow
+
+    def read(self, max_samples=None) -> SampleBatch:
+        """Take up to max_samples of the unread samples (all of them if None)."""
+        count = len(self) if max_samples is None else min(len(self), max_samples)
+        positions = (self.read_count + np.arange(count)) % self.capacity
+        self.read_count += count
+        batch = SampleBatch(
+            self.source,
+            self.index[positions],
+            self.times_ns[positions].view("datetime64[ns]"),
+            self.power[positions],
+        )
+        if count and self.on_read is not None:
+            self.on_read()
+        return batch
+
+
+class SampleBus:
+    """
+    This class publishes the samples of one series to any number of subscribers,
+    each with its own ring buffer.
+    """
+
+    def __init__(self, source):
+        self.source = source
+        self.subscribers = []
+        self.published = 0  # Samples accepted so far, the next sample number
+        self.rejected = 0  # Samples publish turned away because a subscriber was full
+        self.room_freed = asyncio.Event()  # Set when a subscriber reads
+
+    def subscribe(self, capacity=4096, drop_oldest=False) -> SampleRing:
+        ring = SampleRing(self.source, capacity, drop_oldest)
+        ring.on_read = self.room_freed.set
+        self.subscribers.append(ring)
+        return ring
+
+    def unsubscribe(self, ring: SampleRing):
+        self.subscribers.remove(ring)
+        ring.on_read = None
+        self.room_freed.set()
+
+    def room(self):
+        """Return how many samples every blocking subscriber can still take."""
+        return min(
+            (ring.free() for ring in self.subscribers if not ring.drop_oldest),
+            default=sys.maxsize,
+        )
+
+    def publish_batch(self, times: ArrayLike, power: ArrayLike) -> int:
+        """Publish samples to every subscriber.
+
+        Args:
+            times (ArrayLike): (N,) sample times, datetime64
+            power (ArrayLike): (N,) power in watts
+
+        Returns:
+            accepted (int): Number of samples published, from the start of the batch.
+                Fewer than N when a blocking subscriber is full, the rest has to be
+                published again once it has read.
+        """
+        times_ns = np.asarray(times, dtype="datetime64[ns]").view(np.int64)
+        power = np.asarray(power, dtype=np.float64)
+        if times_ns.shape != power.shape:
+            raise ValueError("times and power must have the same shape")
+
+        accepted = min(power.size, self.room())
+        index = self.published + np.arange(accepted, dtype=np.int64)
+        for ring in self.subscribers:
+            ring.write(index, times_ns[:accepted], power[:accepted])
+        self.published += accepted
+        return accepted
+
+    def publish(self, sample: PowerSample) -> bool:
+        """Publish one sample, return False (and count it in rejected) if a blocking
+        subscriber is full."""
+        if self.publish_batch([sample.time], [sample.power]) == 1:
+            return True
+        self.rejected += 1
+        return False
+
+    async def put(self, sample: PowerSample):
+        """Publish one sample, waiting while a blocking subscriber is full.
+
+        The sample's own index is not kept, samples are numbered as published. The
+        bus can subscribe to a PowerReplay with replay.subscribe(bus.put), the
+        replay then waits for the slowest blocking subscriber.
+        """
+        while self.room() < 1:
+            self.room_freed.clear()
+            await self.room_freed.wait()
+        self.publish_batch([sample.time], [sample.power])
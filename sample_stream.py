@@ -0,0 +1,115 @@
+"""
+This is the streaming reader for the power model, it reads the solar power samples
+one at a time without re-reading the CSV
+
+Input: the CSV data (a finished export or a file that is still being written)
+
+Output: the next (time, power) sample, in O(1) per sample
+
+"""
+
+import csv
+import time
+
+
+class PowerSampleStream:
+    """
+    This class keeps the CSV file open and a byte offset into it, so every call only
+    parses the next line.
+    """
+
+    def __init__(
+        self,
+        filepath,
+        time_column="Time (UTCG)",
+        power_column="Power (W)",
+        follow=False,
+        poll_interval=1.0,
+    ):
+        self.filepath = filepath
+        self.time_column = time_column
+        self.power_column = power_column
+        self.follow = follow  # Keep waiting for new lines at the end of the file
+        self.poll_interval = poll_interval
+        self.offset = 0
+        self.file = None
+        self.header = None
+
+    def open(self):
+        self.file = open(self.filepath, "rb")
+        self.file.seek(self.offset)
+        return self
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _read_line(self):
+        """Return the next complete line, or None if the writer has not finished it."""
+        line = self.file.readline()
+        if not line:
+            return None
+        if not line.endswith(b"\n") and self.follow:
+            # Partial line from a writer that is still appending, retry later
+            self.file.seek(self.offset)
+            return None
+        self.offset += len(line)
+        return line.decode("utf-8-sig").rstrip("\r\n")
+
+    def _parse_header(self, fields):
+        if self.time_column in fields and self.power_column in fields:
+            self.header = (
+                fields.index(self.time_column),
+                fields.index(self.power_column),
+            )
+            return True
+        return False
+
+    def read_sample(self):
+        """Parse the next sample after the current offset.
+
+        Header lines, blank lines and rows with a non-numeric power value are
+        skipped, the same rows process_csv_data drops.
+
+        Returns:
+            sample (tuple[str, float] | None): (time, power) or None at the end of the data
+        """
+        if self.file is None:
+            self.open()
+
+        while True:
+            line = self._read_line()
+            if line is None:
+                return None
+
+            fields = next(csv.reader([line]), [])
+            if self._parse_header(fields) or self.header is None:
+                continue
+
+            time_index, power_index = self.header
+            if len(fields) <= max(time_index, power_index):
+                continue
+            try:
+                solar_power = float(fields[power_index])
+            except ValueError:
+                continue
+            if solar_power != solar_power:  # NaN
+                continue
+            return fields[time_index], solar_power
+
+    def __iter__(self):
+        while True:
+            sample = self.read_sample()
+            if sample is not None:
+                yield sample
+            elif self.follow:
+                time.sleep(self.poll_interval)
+            else:
+                return
@@ -0,0 +1,251 @@
+"""
+This is the mode scheduler for the power model, it plans when to run the payload
+modes (camera, centrifuge) so that they get as much time as the battery allows
+
+Input: the generation profile and sunlit windows (e.g. from SolarPowerModel), the
+mode table and the battery
+
+Output: a mission plan, the mode of every block (an orbit from sunrise, by default)
+with the state of charge along the horizon, and the payload time of every mode
+
+Notes: The planner is a greedy interval heuristic. Blocks start at sunrise, so a
+payload block has the whole sunlit part of its orbit to recharge. Going forward in
+time, every block gets the payload mode with the least time so far whose run keeps
+the battery above the reserve (or no lower than the base mode would), and the base
+mode otherwise. Each decision simulates
+the block once for all candidate modes (as battery lanes), so a 30-day horizon at
+1-minute resolution is planned in a fraction of a second.
+
+"""
+
+from typing import NamedTuple
+
+from numpy.typing import ArrayLike, NDArray
+import numpy as np
+
+import julian_time
+from battery import Battery, step_durations
+from budget_loader import default_mode_table
+from sun_intervals import run_lengths
+
+PAYLOAD_MODES = ("camera", "centrifuge")
+DAY_SECONDS = 86400
+
+
+class MissionPlan(NamedTuple):
+    modes: list[str]  # Mode of every block
+    start_seconds: NDArray[np.float64]  # (K,) block starts, from the horizon start
+    stop_seconds: NDArray[np.float64]  # (K,) block ends
+    sample_seconds: NDArray[np.float64]  # (T,) planning grid
+    soc_wh: NDArray[np.float64]  # (T,) state of charge at the end of every step
+    first_breach: int | None  # First step below the reserve, None if there is none
+
+    def schedule(self) -> list:
+        """Return the plan as (mode, duration in seconds) segments, e.g. for
+        MissionTimeline.run, with consecutive blocks of one mode merged."""
+        segments = []
+        for mode, start, stop in zip(
+            self.modes, self.start_seconds.tolist(), self.stop_seconds.tolist()
+        ):
+            if segments and segments[-1][0] == mode:
+                segments[-1] = (mode, segments[-1][1] + stop - start)
+            else:
+                segments.append((mode, stop - start))
+        return segments
+
+    def mode_seconds(self) -> dict:
+        """Return {mode: seconds planned in it}."""
+        totals = {}
+        for mode, start, stop in zip(
+            self.modes, self.start_seconds.tolist(), self.stop_seconds.tolist()
+        ):
+            totals[mode] = totals.get(mode, 0.0) + stop - start
+        return totals
+
+
+class ModeScheduler:
+    """
+    This class plans the payload modes over a (repeating) generation profile.
+    """
+
+    def __init__(
+        self,
+        times: ArrayLike,
+        power: ArrayLike,
+        sunlit: ArrayLike | None = None,
+        mode_table=None,
+        battery=None,
+        period_seconds=None,
+    ):
+        """
+        Args:
+            times (ArrayLike): (N,) profile times, datetime64 or seconds
+            power (ArrayLike): (N,) generated power in watts
+            sunlit (ArrayLike): (N,) True where the sample is sunlit, power > 0 if None
+            mode_table (ModePowerTable): The Power Budget workbook's if None
+            battery (Battery): A full 20 Wh battery if None
+            period_seconds (float): Orbit, the block length and the time the
+                sec_active modes are spread over, the mode table's orbital period
+                if None
+        """
+        if mode_table is None:
+            mode_table = default_mode_table()
+        self.mode_table = mode_table
+        self.battery = Battery() if battery is None else battery
+        if period_seconds is None:
+            period_seconds = mode_table.period_seconds
+        self.period_seconds = period_seconds
+        self.load_w = mode_table.average_power_w(period_seconds)
+
+        if julian_time.is_numeric(times):
+            self.seconds = np.asarray(times, dtype=np.float64)
+        else:
+            self.seconds = julian_time.seconds_since(times)
+        self.seconds = self.seconds - self.seconds[0]
+        self.power = np.asarray(power, dtype=np.float64)
+        self.sunlit = self.power > 0 if sunlit is None else np.asarray(sunlit, bool)
+        # The profile repeats after its last sample is held for one step
+        self.profile_seconds = float(
+            self.seconds[-1] + step_durations(self.seconds)[-1]
+        )
+
+    @classmethod
+    def from_model(cls, model, mode_table=None, battery=None, threshold=None):
+        """Plan over a SolarPowerModel's series and its sunlit windows."""
+        store = model.power_store()
+        intervals = model.sun_intervals(threshold)
+        if store is None or intervals is None:
+            raise ValueError(f"No power series could be loaded from {model.filepath}")
+
+        # Sample by sample sunlit flags, back from the intervals
+        samples = np.searchsorted(store.times, intervals.start)
+        lengths = np.diff(np.append(samples, len(store)))
+        sunlit = np.repeat(intervals.sunlit, lengths)
+        return cls(store.times, store.power, sunlit, mode_table, battery)
+
+    def profile(self, sample_seconds: NDArray[np.float64]):
+        """Return the generation and sunlit flags at times from the profile start,
+        the profile repeating past its end."""
+        wrapped = np.mod(sample_seconds, self.profile_seconds)
+        generation = np.interp(wrapped, self.seconds, self.power)
+        sample = np.searchsorted(self.seconds, wrapped, side="right") - 1
+        return generation, self.sunlit[sample]
+
+    def block_starts(self, sunlit: NDArray[np.bool_], step_seconds) -> NDArray:
+        """Return the first step of every block: every sunrise, and every period
+        after it until the next one."""
+        starts, run_values = run_lengths(sunlit)
+        sunrises = starts[:-1][run_values]
+        bounds = np.unique(np.concatenate([[0], sunrises, [sunlit.size]]))
+
+        block_steps = max(int(round(self.period_seconds / step_seconds)), 1)
+        blocks = [
+            np.arange(start, stop, block_steps)
+            for start, stop in zip(bounds[:-1], bounds[1:])
+        ]
+        return np.concatenate(blocks) if blocks else np.zeros(0, dtype=np.intp)
+
+    def plan(
+        self,
+        horizon_seconds=30 * DAY_SECONDS,
+        step_seconds=60.0,
+        base_mode="low_power",
+        payload_modes=PAYLOAD_MODES,
+        reserve_soc=0.3,
+        prelude=(),
+    ) -> MissionPlan:
+        """Plan the horizon.
+
+        Args:
+            horizon_seconds (float): Length of the plan
+            step_seconds (float): Resolution of the plan
+            base_mode (str): Mode of the blocks without payload
+            payload_modes (tuple): Modes whose time is maximized
+            reserve_soc (float): Fraction of the capacity a payload block must never
+                go below
+            prelude (list): (mode, duration in seconds) segments run first as they
+                are, e.g. [("detumbling", 10800), ("antenna_deploy", 5400)]
+
+        Returns:
+            plan (MissionPlan): Block modes, SoC along the horizon and the first step
+                below the reserve (only base mode or prelude blocks can get there)
+        """
+        steps = int(np.ceil(horizon_seconds / step_seconds))
+        sample_seconds = np.arange(steps) * step_seconds
+        generation, sunlit = self.profile(sample_seconds)
+
+        battery = self.battery
+        capacity = float(battery.capacity_wh)
+        reserve_wh = max(reserve_soc, battery.min_soc) * capacity
+
+        # Prelude segments first, then the blocks from sunrise to sunrise
+        prelude_modes = [mode for mode, _ in prelude]
+        prelude_stops = np.cumsum([duration for _, duration in prelude])
+        prelude_steps = np.minimum(
+            np.ceil(prelude_stops / step_seconds).astype(np.intp), steps
+        )
+        first = int(prelude_steps[-1]) if len(prelude) else 0
+        starts = np.concatenate(
+            [
+                [0] if len(prelude) else [],
+                prelude_steps[:-1],
+                first + self.block_starts(sunlit[first:], step_seconds),
+            ]
+        ).astype(np.intp)
+        stops = np.append(starts[1:], steps)
+
+        candidates = [base_mode, *payload_modes]
+        candidate_ids = self.mode_table.mode_ids(candidates)
+        candidate_load = self.load_w[candidate_ids][:, np.newaxis]
+        fixed_ids = self.mode_table.mode_ids(prelude_modes)
+        payload_seconds = np.zeros(len(payload_modes))
+
+        soc = np.empty(steps)
+        modes = []
+        soc_now = float(np.clip(battery.initial_soc, battery.min_soc, 1.0)) * capacity
+        for block, (start, stop) in enumerate(zip(starts.tolist(), stops.tolist())):
+            if start >= stop:
+                modes.append(
+                    prelude_modes[block] if block < len(prelude) else base_mode
+                )
+                continue
+
+            if block < len(prelude):
+                load = self.load_w[fixed_ids[block]]
+            else:
+                load = candidate_load
+            trace = battery.with_capacity(capacity, soc_now / capacity).simulate(
+                generation[start:stop], load, step_seconds
+            )
+            trace_soc = np.atleast_2d(trace.soc_wh)
+            trace_clipped = np.atleast_2d(trace.clipped_wh)
+
+            choice = 0
+            if block >= len(prelude):
+                # A payload may not take the battery below the reserve, or below
+                # where the base mode would take it anyway, nor leave load unmet
+                floor = min(reserve_wh, trace_soc[0].min()) - 1e-9
+                ok = (trace_soc[1:].min(axis=1) >= floor) & (
+                    trace_clipped[1:].min(axis=1) > -1e-9
+                )
+                if ok.any():
+                    # Least payload time so far first, so the payloads share the orbits
+                    payload = int(np.flatnonzero(ok)[np.argmin(payload_seconds[ok])])
+                    payload_seconds[payload] += (stop - start) * step_seconds
+                    choice = payload + 1
+                modes.append(candidates[choice])
+            else:
+                modes.append(prelude_modes[block])
+
+            soc[start:stop] = trace_soc[choice]
+            soc_now = float(trace_soc[choice, -1])
+
+        breach = np.flatnonzero(soc < reserve_wh - 1e-9)
+        return MissionPlan(
+            modes,
+            starts * step_seconds,
+            stops * step_seconds,
+            sample_seconds,
+            soc,
+            int(breach[0]) if breach.size else None,
+        )
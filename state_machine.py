@@ -0,0 +1,327 @@
+"""
+This is the state machine for the power model, it moves the FSM between its modes
+(detumbling, antenna_deploy, detumbed_beacon, idle, low_power, camera, centrifuge)
+by an explicit transition table instead of if/elif chains over the action names
+
+Input: the transition table (which mode may follow which, guards on the state of
+charge and the generated power, entry and exit energy costs) and transition events
+(requested mode, SoC, power), one at a time or a whole log
+
+Output: the current mode, whether every request was accepted and the energy the
+transitions cost
+
+Notes: Modes are integers (their mode_table index), so a request is a few list
+lookups. A log is replayed without a Python loop per event: every event maps each
+possible current mode to the next one (looked up from a small table of targets and
+guard outcomes), and the maps are composed chunk by chunk, as in
+battery.clamped_cumsum.
+
+"""
+
+from typing import NamedTuple
+
+from numpy.typing import ArrayLike, NDArray
+import numpy as np
+
+from mode_table import lookup_ids
+
+ANY_STATE = "*"
+
+
+class ReplayResult(NamedTuple):
+    states: NDArray[np.intp]  # (N,) mode after every event
+    accepted: NDArray[np.bool_]  # (N,) the event's transition was taken
+    energy_wh: NDArray[np.float64]  # (N,) exit + entry cost of every mode change
+
+
+class TransitionTable:
+    """
+    This class holds the allowed transitions between modes as (modes x modes) arrays.
+    """
+
+    def __init__(self, states: list[str]):
+        self.states = list(states)
+        self.state_index = {state: index for index, state in enumerate(self.states)}
+        count = len(self.states)
+        self.allowed = np.zeros((count, count), dtype=bool)  # [from, to]
+        self.min_soc_wh = np.zeros((count, count))  # Guard: SoC >= this
+        self.min_power_w = np.zeros((count, count))  # Guard: generated power >= this
+        self.entry_wh = np.zeros(count)  # Energy to enter the mode
+        self.exit_wh = np.zeros(count)  # Energy to leave the mode
+
+    def state_ids(self, states: ArrayLike) -> NDArray[np.intp]:
+        """Return the indices of an array of mode names (or indices)."""
+        return lookup_ids(states, self.state_index, "state")
+
+    def allow(self, source, target, min_soc_wh=0.0, min_power_w=0.0):
+        """Allow source -> target when the guards hold, "*" standing for any mode."""
+        sources = (
+            np.arange(len(self.states))
+            if source == ANY_STATE
+            else self.state_ids([source])
+        )
+        targets = (
+            np.arange(len(self.states))
+            if target == ANY_STATE
+            else self.state_ids([target])
+        )
+        cells = np.ix_(sources, targets)
+        self.allowed[cells] = True
+        self.min_soc_wh[cells] = min_soc_wh
+        self.min_power_w[cells] = min_power_w
+        return self
+
+    def set_costs(self, state, entry_wh=0.0, exit_wh=0.0):
+        index = self.state_index[state]
+        self.entry_wh[index] = entry_wh
+        self.exit_wh[index] = exit_wh
+        return self
+
+    def guard_tables(self):
+        """Tabulate the transitions for every requested mode and guard outcome.
+
+        The guards only compare the SoC and the power with the few distinct
+        thresholds of the table, so an event is fully described by its target and
+        how many thresholds its SoC and power reach.
+
+        Returns:
+            soc_levels, power_levels (NDArray): Sorted distinct thresholds
+            reached (NDArray): (M, soc levels + 1, power levels + 1, M) mode reached
+                from every mode
+            ok (NDArray): Same shape, True where the guards and the table allow it
+        """
+        soc_levels = np.unique(self.min_soc_wh)
+        power_levels = np.unique(self.min_power_w)
+        # (target, 1, 1, source) index of every threshold among the levels
+        soc_guard = np.searchsorted(soc_levels, self.min_soc_wh).T[:, None, None, :]
+        power_guard = np.searchsorted(power_levels, self.min_power_w).T[
+            :, None, None, :
+        ]
+        soc_reached = np.arange(soc_levels.size + 1)[:, None, None]
+        power_reached = np.arange(power_levels.size + 1)[:, None]
+
+        ok = (
+            self.allowed.T[:, None, None, :]
+            & (soc_reached > soc_guard)
+            & (power_reached > power_guard)
+        )
+        count = len(self.states)
+        reached = np.where(ok, np.arange(count)[:, None, None, None], np.arange(count))
+        return soc_levels, power_levels, reached, ok
+
+    def event_classes(self, soc_levels, power_levels, soc_wh, power_w):
+        """Return how many SoC and power thresholds every event reaches."""
+        classes = []
+        for levels, values in ((soc_levels, soc_wh), (power_levels, power_w)):
+            values = np.asarray(values, dtype=np.float64)
+            reached = np.searchsorted(levels, values, side="right")
+            reached[np.isnan(values)] = 0  # NaN passes no guard, as in dispatch
+            classes.append(reached)
+        return classes
+
+    def replay(
+        self,
+        targets: ArrayLike,
+        soc_wh: ArrayLike = np.inf,
+        power_w: ArrayLike = np.inf,
+        initial=0,
+        chunk_size=None,
+    ) -> ReplayResult:
+        """Replay a log of transition requests from the initial mode.
+
+        Args:
+            targets (ArrayLike): (N,) requested modes, names or indices
+            soc_wh (ArrayLike): (N,) SoC at every request, no guard if not given
+            power_w (ArrayLike): (N,) generated power at every request
+            initial (int | str): Mode before the first request
+            chunk_size (int): Events composed together, about sqrt(N) if None
+
+        Returns:
+            result (ReplayResult): (N,) modes, acceptance and transition costs
+        """
+        targets = self.state_ids(targets).ravel()
+        events = targets.size
+        if not isinstance(initial, (int, np.integer)):
+            initial = self.state_index[initial]
+        if events == 0:
+            empty = np.zeros(0)
+            return ReplayResult(empty.astype(np.intp), empty.astype(bool), empty)
+
+        soc_wh = np.broadcast_to(soc_wh, targets.shape)
+        power_w = np.broadcast_to(power_w, targets.shape)
+        soc_levels, power_levels, reached, ok = self.guard_tables()
+        soc_class, power_class = self.event_classes(
+            soc_levels, power_levels, soc_wh, power_w
+        )
+        # Every event is a row of the flattened (class x mode) table of the mode
+        # reached, plus an identity row for the padding past the end
+        count = len(self.states)
+        table = np.concatenate([reached.reshape(-1, count), [np.arange(count)]])
+        table = table.ravel().astype(np.intp)
+        rows = np.ravel_multi_index(
+            (targets, soc_class, power_class), reached.shape[:3]
+        )
+
+        if chunk_size is None:
+            chunk_size = int(np.ceil(np.sqrt(events)))
+        chunks = -(-events // chunk_size)
+
+        # (chunk_size, chunks) offsets into the table, so every position of every
+        # chunk is one contiguous row
+        offsets = np.full(chunks * chunk_size, table.size - count)
+        offsets[:events] = rows * count
+        blocks = np.ascontiguousarray(offsets.reshape(chunks, chunk_size).T)
+
+        # Every chunk as one map, composed position by position for all chunks
+        chunk_map = np.broadcast_to(np.arange(count), (chunks, count))
+        for step in blocks:
+            chunk_map = table[step[:, np.newaxis] + chunk_map]
+
+        # Chain the chunk maps for the mode every chunk starts from
+        chunk_start = np.empty(chunks, dtype=np.intp)
+        state = initial
+        for chunk in range(chunks):
+            chunk_start[chunk] = state
+            state = int(chunk_map[chunk, state])
+
+        # Fill in the modes of all chunks at once
+        states = np.empty((chunk_size, chunks), dtype=np.intp)
+        state = chunk_start
+        for position, step in enumerate(blocks):
+            state = table[step + state]
+            states[position] = state
+        states = states.T.reshape(-1)[:events]
+
+        before = np.concatenate([[initial], states[:-1]])
+        accepted = ok[targets, soc_class, power_class, before]
+        changed = states != before
+        energy = np.where(changed, self.exit_wh[before] + self.entry_wh[states], 0.0)
+        return ReplayResult(states, accepted, energy)
+
+
+class StateMachine:
+    """
+    This class is the current mode of one FSM, moved by requests against a
+    TransitionTable.
+    """
+
+    def __init__(self, table: TransitionTable, initial="idle"):
+        self.table = table
+        self.state = table.state_index[initial]
+        self.transition_wh = 0.0  # Energy the accepted mode changes cost so far
+
+        # Per-event dispatch reads single cells, which is faster on lists
+        self.allowed_list = table.allowed.tolist()
+        self.min_soc_list = table.min_soc_wh.tolist()
+        self.min_power_list = table.min_power_w.tolist()
+        self.entry_list = table.entry_wh.tolist()
+        self.exit_list = table.exit_wh.tolist()
+
+    @property
+    def state_name(self) -> str:
+        return self.table.states[self.state]
+
+    def can_transition(self, target: int, soc_wh=np.inf, power_w=np.inf) -> bool:
+        source = self.state
+        return (
+            self.allowed_list[source][target]
+            and soc_wh >= self.min_soc_list[source][target]
+            and power_w >= self.min_power_list[source][target]
+        )
+
+    def dispatch(self, target: int, soc_wh=np.inf, power_w=np.inf) -> bool:
+        """Move to the target mode (an index) if the table allows it now."""
+        if not self.can_transition(target, soc_wh, power_w):
+            return False
+        source = self.state
+        if target != source:
+            self.transition_wh += self.exit_list[source] + self.entry_list[target]
+            self.state = target
+        return True
+
+    def request(self, state: str, soc_wh=np.inf, power_w=np.inf) -> bool:
+        """dispatch by mode name."""
+        try:
+            target = self.table.state_index[state]
+        except KeyError:
+            raise ValueError(f"Unknown state: {state}") from None
+        return self.dispatch(target, soc_wh, power_w)
+
+    def enter(self, state: str, soc_wh=np.inf, power_w=np.inf):
+        """request, raising ValueError if the table does not allow it now."""
+        if not self.request(state, soc_wh, power_w):
+            raise ValueError(f"Transition {self.state_name} -> {state} is not allowed")
+
+    def replay(self, targets, soc_wh=np.inf, power_w=np.inf) -> ReplayResult:
+        """Replay a log of requests from the current mode and end in its last mode."""
+        result = self.table.replay(targets, soc_wh, power_w, self.state)
+        if result.states.size:
+            self.state = int(result.states[-1])
+            self.transition_wh += float(result.energy_wh.sum())
+        return result
+
+    def replay_where(
+        self, targets, feasible: NDArray[np.bool_], soc_wh=np.inf, power_w=np.inf
+    ) -> NDArray[np.bool_]:
+        """Replay only the requests where feasible, e.g. the ones with enough power.
+
+        Returns:
+            accepted (NDArray): (N,) feasible and allowed by the table
+        """
+        requested = np.flatnonzero(feasible)
+        result = self.replay(
+            np.broadcast_to(targets, feasible.shape)[requested],
+            np.broadcast_to(soc_wh, feasible.shape)[requested],
+            np.broadcast_to(power_w, feasible.shape)[requested],
+        )
+        accepted = np.zeros(feasible.shape, dtype=bool)
+        accepted[requested] = result.accepted
+        return accepted
+
+
+def open_transitions(mode_table):
+    """Return a table where every mode may follow every other, without guards."""
+    return TransitionTable(mode_table.modes).allow(ANY_STATE, ANY_STATE)
+
+
+def default_transitions(
+    mode_table, capacity_wh=20.0, payload_reserve=0.0, recovery_soc=0.0
+):
+    """Return the mission's transition table over the modes of mode_table.
+
+    detumbling -> antenna_deploy -> detumbed_beacon -> idle, and back to detumbling
+    from detumbed_beacon or idle. camera and centrifuge may be entered from any other
+    mode but detumbling, and idle from antenna_deploy too. Any mode may drop to
+    low_power, which returns to idle. Every mode may be requested again while in it.
+
+    The SoC guards are opt-in: payload_reserve and recovery_soc are the fractions of
+    capacity_wh needed to enter a payload mode and to leave low_power. The plans of
+    scheduler.ModeScheduler follow the table without them, the scheduler keeps the
+    SoC over whole blocks instead (a payload block often starts at sunrise, nearly
+    empty).
+    """
+    table = TransitionTable(mode_table.modes)
+    payload_wh = payload_reserve * capacity_wh
+    rules = [
+        ("detumbling", "antenna_deploy", 0.0),
+        ("antenna_deploy", "detumbed_beacon", 0.0),
+        ("antenna_deploy", "idle", 0.0),
+        ("detumbed_beacon", "idle", 0.0),
+        ("detumbed_beacon", "detumbling", 0.0),
+        ("idle", "detumbling", 0.0),
+        (ANY_STATE, "low_power", 0.0),
+        ("low_power", "idle", recovery_soc * capacity_wh),
+    ]
+    for payload in ("camera", "centrifuge"):
+        rules += [
+            (source, payload, payload_wh)
+            for source in table.states
+            if source not in ("detumbling", payload)
+        ]
+    for source, target, min_soc_wh in rules:
+        if {source, target} - {ANY_STATE} <= set(table.states):
+            table.allow(source, target, min_soc_wh)
+    for state in table.states:
+        if not table.allowed[table.state_index[state], table.state_index[state]]:
+            table.allow(state, state)
+    return table
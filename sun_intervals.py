@@ -0,0 +1,79 @@
+"""
+This is the interval extraction for the power model, it turns the sample by sample
+"Solar Intensity" column (or power > threshold) into sunlit and eclipse intervals
+
+Input: the time, power and intensity columns of a power series
+
+Output: one record per sunlit or eclipse interval, with start, end, duration and the
+energy generated in it, a few per orbit instead of one per sample
+
+"""
+
+from typing import NamedTuple
+
+from numpy.typing import ArrayLike, NDArray
+import numpy as np
+
+from energy_index import EnergyIndex
+
+
+class SunIntervals(NamedTuple):
+    sunlit: NDArray[np.bool_]  # (K,) True for sunlit, False for eclipse
+    start: NDArray  # (K,) first sample time of the interval
+    stop: NDArray  # (K,) first sample time of the next interval (last: last sample)
+    duration_seconds: NDArray[np.float64]
+    energy_wh: NDArray[np.float64]
+
+    def select(self, sunlit=True):
+        """Return only the sunlit (or only the eclipse) intervals."""
+        keep = self.sunlit == sunlit
+        return SunIntervals(*(field[keep] for field in self))
+
+
+def run_lengths(values: ArrayLike) -> tuple[NDArray[np.intp], NDArray]:
+    """Run-length encode values.
+
+    Returns:
+        starts (NDArray[np.intp]): (K + 1,) index of the first sample of every run,
+            and the number of samples at the end
+        run_values (NDArray): (K,) value of every run
+    """
+    values = np.asarray(values)
+    if values.size == 0:
+        return np.zeros(1, dtype=np.intp), values[:0]
+    change = np.flatnonzero(values[1:] != values[:-1]) + 1
+    starts = np.concatenate([[0], change, [values.size]]).astype(np.intp)
+    return starts, values[starts[:-1]]
+
+
+def extract_intervals(
+    times: ArrayLike,
+    power: ArrayLike,
+    sunlit: ArrayLike,
+    index: EnergyIndex | None = None,
+) -> SunIntervals:
+    """Group the samples into sunlit and eclipse intervals.
+
+    An interval runs from its first sample to the first sample of the next one, so
+    the intervals tile the series without gaps.
+
+    Args:
+        times (ArrayLike): (N,) sorted sample times, datetime64 or seconds
+        power (ArrayLike): (N,) power in watts
+        sunlit (ArrayLike): (N,) True where the sample is sunlit
+        index (EnergyIndex): Index over times and power, built if not given
+
+    Returns:
+        intervals (SunIntervals): (K,) intervals, in time order
+    """
+    times = np.asarray(times)
+    if index is None:
+        index = EnergyIndex(times, power)
+
+    starts, run_values = run_lengths(np.asarray(sunlit, dtype=bool))
+    first = starts[:-1]
+    last = np.minimum(starts[1:], times.size - 1)
+
+    duration = index.seconds[last] - index.seconds[first]
+    energy = index.cumulative_wh[last] - index.cumulative_wh[first]
+    return SunIntervals(run_values, times[first], times[last], duration, energy)
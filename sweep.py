@@ -0,0 +1,234 @@
+"""
+This is the parameter sweep for the power model, it evaluates the FSM modes over a
+grid of battery capacities, duty cycles and state times instead of one hand-edited
+set of values at a time
+
+Input: the values of every axis: battery capacities (FSM_w_timer.FSM's
+battery_capacity), the %_active (or sec_active) of chosen (mode, subsystem) cells
+and state times in seconds
+
+Output: a labelled cube, (capacity, duty cycle axes..., state time, mode), of the
+energy every mode draws, its average power, the time spent in it and whether the
+battery covers it
+
+Notes: The grid is evaluated chunk_size points at a time, as (points, modes) arrays
+broadcast from the (modes x subsystems) table, so memory stays bounded on grids of
+any size. Pass a directory to keep the cube in .npy memmaps instead of memory.
+
+"""
+
+import os
+from typing import NamedTuple
+
+from numpy.typing import ArrayLike, NDArray
+import numpy as np
+
+from budget_loader import default_mode_table
+
+CAPACITY_AXIS = "capacity_wh"
+STATE_TIME_AXIS = "state_time"
+MODE_AXIS = "mode"
+
+
+class SweepResult(NamedTuple):
+    dims: tuple  # Axis names, in the order of the cube's axes
+    coords: dict  # Axis name -> (n,) values of the axis
+    energy_wh: NDArray[np.float64]  # Energy the subsystems draw in the mode
+    average_power_w: NDArray[np.float64]  # Average load of the mode
+    time_spent: NDArray[np.float64]  # As FSM_w_timer counts it, in seconds
+    feasible: NDArray[np.bool_]  # energy_wh <= capacity_wh
+
+    @property
+    def shape(self):
+        return self.energy_wh.shape
+
+    def axis(self, name) -> int:
+        return self.dims.index(name)
+
+    def margin_wh(self) -> NDArray[np.float64]:
+        """Return the capacity left after the mode's energy, < 0 where infeasible."""
+        capacity = np.asarray(self.coords[CAPACITY_AXIS], dtype=np.float64)
+        shape = [1] * len(self.dims)
+        shape[self.axis(CAPACITY_AXIS)] = capacity.size
+        return capacity.reshape(shape) - self.energy_wh
+
+    def sel(self, **labels) -> dict:
+        """Select by axis values, e.g. sel(capacity_wh=20, mode="idle").
+
+        Returns:
+            selection (dict): field name -> the selected part of every cube field
+        """
+        index = [slice(None)] * len(self.dims)
+        for name, value in labels.items():
+            matches = np.flatnonzero(np.asarray(self.coords[name]) == value)
+            if matches.size == 0:
+                raise ValueError(f"{value!r} is not a value of axis '{name}'")
+            index[self.axis(name)] = int(matches[0])
+        index = tuple(index)
+        return {
+            field: getattr(self, field)[index]
+            for field in ("energy_wh", "average_power_w", "time_spent", "feasible")
+        }
+
+
+class ParameterSweep:
+    """
+    This class holds the axes of a sweep over a mode table.
+    """
+
+    def __init__(
+        self,
+        capacity_wh: ArrayLike = (20.0,),
+        duty_cycles=None,
+        state_time: ArrayLike = (100.0,),
+        mode_table=None,
+        modes=None,
+        period_seconds=None,
+    ):
+        """
+        Args:
+            capacity_wh (ArrayLike): Battery capacities in Wh
+            duty_cycles (dict): (mode, subsystem) -> values of that cell of the mode
+                table, %_active or sec_active as the mode counts it
+            state_time (ArrayLike): State times in seconds (%_active modes)
+            mode_table (ModePowerTable): The Power Budget workbook's if None
+            modes (list): Modes to evaluate, all of them if None
+            period_seconds (float): Orbit the sec_active modes are spread over, the
+                mode table's orbital period if None
+        """
+        if mode_table is None:
+            mode_table = default_mode_table()
+        self.mode_table = mode_table
+        self.capacity_wh = np.atleast_1d(np.asarray(capacity_wh, dtype=np.float64))
+        self.state_time = np.atleast_1d(np.asarray(state_time, dtype=np.float64))
+        self.modes = list(mode_table.modes if modes is None else modes)
+        self.mode_ids = mode_table.mode_ids(self.modes)
+        if period_seconds is None:
+            period_seconds = mode_table.period_seconds
+        self.period_seconds = period_seconds
+
+        duty_cycles = {} if duty_cycles is None else duty_cycles
+        self.duty_names = [f"{mode}.{subsystem}" for mode, subsystem in duty_cycles]
+        self.duty_values = [
+            np.atleast_1d(np.asarray(values, dtype=np.float64))
+            for values in duty_cycles.values()
+        ]
+        # Cells in the (modes x subsystems) activity matrix of the swept modes
+        cell_modes = [mode for mode, _ in duty_cycles]
+        cell_subsystems = [subsystem for _, subsystem in duty_cycles]
+        self.duty_cells = (
+            lookup_positions(cell_modes, self.modes, "mode"),
+            mode_table.subsystem_ids(np.array(cell_subsystems, dtype=str)),
+        )
+
+    @property
+    def dims(self) -> tuple:
+        return (CAPACITY_AXIS, *self.duty_names, STATE_TIME_AXIS, MODE_AXIS)
+
+    @property
+    def grid_shape(self) -> tuple:
+        """Shape of the parameter axes, without the mode axis."""
+        return (
+            self.capacity_wh.size,
+            *(values.size for values in self.duty_values),
+            self.state_time.size,
+        )
+
+    def coords(self) -> dict:
+        return {
+            CAPACITY_AXIS: self.capacity_wh,
+            **dict(zip(self.duty_names, self.duty_values)),
+            STATE_TIME_AXIS: self.state_time,
+            MODE_AXIS: np.array(self.modes),
+        }
+
+    def run(self, chunk_size=65536, directory=None) -> SweepResult:
+        """Evaluate every mode at every point of the grid.
+
+        Args:
+            chunk_size (int): Grid points evaluated at once, (chunk_size, modes)
+                arrays are held
+            directory (str): Write the cube to .npy memmaps in this directory
+
+        Returns:
+            result (SweepResult): (capacity, duty cycles..., state time, mode) cube
+        """
+        shape = (*self.grid_shape, len(self.modes))
+        fields = {
+            "energy_wh": np.float64,
+            "average_power_w": np.float64,
+            "time_spent": np.float64,
+            "feasible": np.bool_,
+        }
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+            cube = {
+                name: np.lib.format.open_memmap(
+                    os.path.join(directory, f"{name}.npy"), "w+", dtype, shape
+                )
+                for name, dtype in fields.items()
+            }
+        else:
+            cube = {name: np.empty(shape, dtype) for name, dtype in fields.items()}
+
+        points = int(np.prod(self.grid_shape))
+        flat = {
+            name: array.reshape(points, len(self.modes)) for name, array in cube.items()
+        }
+        for start in range(0, points, chunk_size):
+            stop = min(start + chunk_size, points)
+            chunk = self.evaluate(np.arange(start, stop))
+            for name, values in chunk.items():
+                flat[name][start:stop] = values
+
+        if directory is not None:
+            for array in cube.values():
+                array.flush()
+        return SweepResult(self.dims, self.coords(), **cube)
+
+    def evaluate(self, points: NDArray[np.intp]) -> dict:
+        """Evaluate the grid points with the given flat indices, (P, modes) each."""
+        index = np.unravel_index(points, self.grid_shape)
+        capacity = self.capacity_wh[index[0]]
+        state_time = self.state_time[index[-1]]
+
+        # The (modes x subsystems) matrix gives the row sums and the watt-weighted
+        # sums of every mode, broadcast to (P, M). A swept cell only moves them by
+        # (value - table value) and (value - table value) x its subsystem's W.
+        activity = self.mode_table.activity[self.mode_ids]
+        weighted = np.repeat(
+            (activity @ self.mode_table.watts)[np.newaxis], points.size, axis=0
+        )
+        activity_sum = np.repeat(activity.sum(axis=1)[np.newaxis], points.size, axis=0)
+        cell_modes, cell_subsystems = self.duty_cells
+        for cell, values in enumerate(self.duty_values):
+            mode, subsystem = cell_modes[cell], cell_subsystems[cell]
+            change = values[index[1 + cell]] - activity[mode, subsystem]
+            weighted[:, mode] += change * self.mode_table.watts[subsystem]
+            activity_sum[:, mode] += change
+
+        fixed_seconds = self.mode_table.fixed_seconds[self.mode_ids]
+        average_power = weighted / np.where(fixed_seconds, self.period_seconds, 100.0)
+        time_spent = np.where(fixed_seconds, activity_sum, state_time[:, np.newaxis])
+        energy = (
+            np.where(
+                fixed_seconds, weighted, weighted * state_time[:, np.newaxis] / 100
+            )
+            / 3600
+        )
+        return {
+            "energy_wh": energy,
+            "average_power_w": average_power,
+            "time_spent": time_spent,
+            "feasible": energy <= capacity[:, np.newaxis],
+        }
+
+
+def lookup_positions(names, values, kind) -> NDArray[np.intp]:
+    """Return the position of every name in values."""
+    try:
+        return np.array([values.index(name) for name in names], dtype=np.intp)
+    except ValueError:
+        raise ValueError(
+            f"Unknown {kind} names: {sorted(set(names) - set(values))}"
+        ) from None
@@ -0,0 +1,122 @@
+"""
+This is the mission timeline for the power model, it runs a schedule of FSM modes
+(detumbling -> antenna_deploy -> detumbed_beacon -> idle/camera/centrifuge) over a
+solar power profile
+
+Input: the power profile (Power_Generation.csv by default) and a schedule of
+(mode, duration in seconds) segments
+
+Output: the energy generated and drawn in every segment and mode, the battery state
+of charge after every sample and the first sample where the load cannot be met
+
+"""
+
+from typing import NamedTuple
+
+from numpy.typing import NDArray
+import numpy as np
+
+from battery import Battery, step_durations
+from budget_loader import default_mode_table
+from energy_index import EnergyIndex
+from power_cache import load_timed_power_series
+
+POWER_GENERATION_CSV = "Power_Generation.csv"
+
+
+class TimelineResult(NamedTuple):
+    modes: list[str]  # Mode of every segment
+    start_seconds: NDArray[np.float64]  # (K,) segment starts, from the first sample
+    stop_seconds: NDArray[np.float64]  # (K,) segment ends
+    generated_wh: NDArray[np.float64]  # (K,) solar energy generated in the segment
+    consumed_wh: NDArray[np.float64]  # (K,) energy the segment's mode draws
+    sample_seconds: NDArray[np.float64]  # (T,) samples the schedule covers
+    soc_wh: NDArray[np.float64]  # (T,) state of charge after every sample
+    first_infeasible: int | None  # First sample whose load the battery cannot meet
+
+    def mode_energy_wh(self) -> dict:
+        """Return {mode: (generated Wh, consumed Wh)} summed over the segments."""
+        names, inverse = np.unique(self.modes, return_inverse=True)
+        generated = np.bincount(inverse, self.generated_wh, names.size)
+        consumed = np.bincount(inverse, self.consumed_wh, names.size)
+        return {
+            name: (float(gen), float(con))
+            for name, gen, con in zip(names.tolist(), generated, consumed)
+        }
+
+
+class MissionTimeline:
+    """
+    This class steps a schedule of modes through a power profile.
+    """
+
+    def __init__(self, times, power, mode_table=None, battery=None):
+        if mode_table is None:
+            mode_table = default_mode_table()
+        self.mode_table = mode_table
+        self.battery = Battery() if battery is None else battery
+
+        # Prefix sums of the energy, window energies are lookups
+        self.index = EnergyIndex(times, power)
+        self.seconds = self.index.seconds
+        self.power = self.index.power
+
+    @classmethod
+    def from_csv(
+        cls,
+        filepath=POWER_GENERATION_CSV,
+        time_column="Time (UTCG)",
+        power_column="Power (W)",
+        mode_table=None,
+        battery=None,
+    ):
+        series = load_timed_power_series(filepath, time_column, power_column)
+        return cls(series.times, series.power, mode_table, battery)
+
+    def run(self, schedule, start_seconds=0.0) -> TimelineResult:
+        """Run the schedule from start_seconds after the first sample.
+
+        Args:
+            schedule (list): (mode name, duration in seconds) segments, in order
+            start_seconds (float): Offset of the first segment into the profile
+
+        Returns:
+            result (TimelineResult): Per-segment energy, SoC and first infeasible sample
+        """
+        modes = [mode for mode, _ in schedule]
+        mode_ids = self.mode_table.mode_ids(modes)
+        durations = np.array([duration for _, duration in schedule], dtype=np.float64)
+        if np.any(durations < 0):
+            raise ValueError("Segment durations must not be negative")
+
+        bounds = (
+            self.seconds[0]
+            + start_seconds
+            + np.concatenate([[0.0], np.cumsum(durations)])
+        )
+        load_w = self.mode_table.average_power_w()[mode_ids]
+
+        generated = np.diff(self.index.energy_at(bounds))
+        consumed = load_w * durations / 3600
+
+        # Samples inside the schedule, each with the load of the segment it falls in
+        first, last = np.searchsorted(self.seconds, bounds[[0, -1]])
+        sample_seconds = self.seconds[first:last]
+        segment = np.searchsorted(bounds, sample_seconds, side="right") - 1
+        trace = self.battery.simulate(
+            self.power[first:last],
+            load_w[segment],
+            step_durations(self.seconds[first : last + 1])[: last - first],
+        )
+
+        unmet = np.flatnonzero(trace.clipped_wh < -1e-12)
+        return TimelineResult(
+            modes,
+            bounds[:-1] - self.seconds[0],
+            bounds[1:] - self.seconds[0],
+            generated,
+            consumed,
+            sample_seconds - self.seconds[0],
+            trace.soc_wh,
+            int(unmet[0]) if unmet.size else None,
+        )
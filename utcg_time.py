@@ -0,0 +1,173 @@
+"""
+This is the timestamp parser for the power model, it turns the "Time (UTCG)" column
+of the STK exports into a monotonic time axis
+
+Input: the time labels, either "mm:ss.0" clock labels (the hour is dropped by the
+export, so they wrap every hour) or full STK UTCG timestamps ("1 Jun 2024 12:00:00.000")
+
+Output: datetime64[ns] times and the seconds elapsed since the epoch
+
+"""
+
+from typing import NamedTuple
+
+from numpy.typing import ArrayLike, NDArray
+import numpy as np
+
+DEFAULT_EPOCH = np.datetime64("2000-01-01T00:00:00", "ns")
+STK_UTCG_FORMAT = "%d %b %Y %H:%M:%S.%f"
+
+
+class ParsedTime(NamedTuple):
+    times: NDArray[np.datetime64]
+    elapsed_seconds: NDArray[np.float64]
+
+
+def parse_utcg_time(labels: ArrayLike, epoch=None) -> ParsedTime:
+    """Parse a "Time (UTCG)" column into a monotonic time axis.
+
+    Clock labels ("mm:ss.f" or "hh:mm:ss.f") carry no date, so every backwards step
+    is taken as a rollover of the dropped field (one hour for "mm:ss", one day for
+    "hh:mm:ss"). Their elapsed seconds count from the top of the first label's hour
+    (or day) and the times are placed after epoch, DEFAULT_EPOCH if not given.
+
+    Full timestamps are parsed as they are, and their elapsed seconds count from
+    epoch, the first timestamp if not given.
+
+    Args:
+        labels (ArrayLike): (N,) time labels, all in the same format
+        epoch: Reference time (anything np.datetime64 accepts)
+
+    Returns:
+        parsed (ParsedTime): (N,) datetime64[ns] times and (N,) elapsed seconds
+    """
+    labels = np.asarray(labels)
+    if labels.size == 0:
+        return ParsedTime(
+            np.empty(0, dtype="datetime64[ns]"), np.empty(0, dtype=np.float64)
+        )
+
+    first_label = labels[0]
+    if isinstance(first_label, bytes):
+        first_label = first_label.decode()
+    if is_clock_label(str(first_label)):
+        seconds, fields = clock_seconds(labels)
+        elapsed = unwrap_clock(seconds, 3600.0 if fields == 2 else 86400.0)
+        epoch = DEFAULT_EPOCH if epoch is None else np.datetime64(epoch, "ns")
+        times = epoch + np.round(elapsed * 1e9).astype("timedelta64[ns]")
+        return ParsedTime(times, elapsed)
+
+    times = parse_timestamps(labels)
+    epoch = times[0] if epoch is None else np.datetime64(epoch, "ns")
+    elapsed = (times - epoch).astype(np.int64) / 1e9
+    return ParsedTime(times, elapsed)
+
+
+def is_clock_label(label: str) -> bool:
+    return bool(label) and set(label.strip()) <= set("0123456789:.")
+
+
+def clock_seconds(labels: NDArray) -> tuple[NDArray[np.float64], int]:
+    """Convert clock labels to seconds within the hour (or day).
+
+    The labels are viewed as a (N, width) byte matrix. Exports write every label
+    with the same layout, so each column gets one weight (e.g. 600, 60, 10, 1, 0.1
+    for "mm:ss.f") and the seconds are a weighted sum over the columns. Labels with
+    mixed layouts fall back to folding the digits in column by column. Either way
+    the work per row is done by numpy, not by Python.
+
+    Returns:
+        seconds (NDArray[np.float64]): (N,) seconds given by every label
+        fields (int): 2 for "mm:ss" labels, 3 for "hh:mm:ss" labels
+    """
+    raw = np.char.strip(labels.astype("S"))
+    chars = raw.view(np.uint8).reshape(raw.shape[0], raw.dtype.itemsize)
+
+    fields = raw[0].count(b":") + 1
+    if fields not in (2, 3):
+        raise ValueError("Time labels must be 'mm:ss.f' or 'hh:mm:ss.f'")
+
+    digit = is_digit(chars)
+    same_layout = (chars == chars[0]) | (digit & digit[0])
+    if same_layout.all():
+        seconds = np.zeros(chars.shape[0])
+        for column, weight in enumerate(layout_weights(raw[0])):
+            if weight:
+                seconds += (chars[:, column] - ord("0")) * weight
+        return seconds, fields
+
+    if np.any((chars == ord(":")).sum(axis=1) != fields - 1):
+        raise ValueError("Time labels must all have the same number of fields")
+    return fold_clock_digits(chars), fields
+
+
+def is_digit(chars: NDArray[np.uint8]) -> NDArray[np.bool_]:
+    return (chars >= ord("0")) & (chars <= ord("9"))
+
+
+def layout_weights(label: bytes) -> list[float]:
+    """Return the seconds each character of a clock label is worth."""
+    weights = [0.0] * len(label)
+    integer_part, _, fraction_part = label.partition(b".")
+
+    # Integer digits, right to left: units of the field, times 60 per colon passed
+    place, field_scale = 1.0, 1.0
+    for position in range(len(integer_part) - 1, -1, -1):
+        if integer_part[position] == ord(":"):
+            place, field_scale = 1.0, field_scale * 60
+        elif chr(integer_part[position]).isdigit():
+            weights[position] = place * field_scale
+            place *= 10
+
+    for offset, char in enumerate(fraction_part, start=1):
+        if chr(char).isdigit():
+            weights[len(integer_part) + offset] = 10.0**-offset
+    return weights
+
+
+def fold_clock_digits(chars: NDArray[np.uint8]) -> NDArray[np.float64]:
+    """Fold the digits of clock labels with any layout in, column by column."""
+    digit = is_digit(chars)
+    is_colon = chars == ord(":")
+    in_fraction = np.cumsum(chars == ord("."), axis=1) > 0
+    digits = chars.astype(np.float64) - ord("0")
+
+    count = chars.shape[0]
+    seconds = np.zeros(count)
+    field_value = np.zeros(count)
+    fraction = np.zeros(count)
+    scale = np.ones(count)
+    for column in range(chars.shape[1]):
+        integer_digit = digit[:, column] & ~in_fraction[:, column]
+        field_value = np.where(
+            integer_digit, field_value * 10 + digits[:, column], field_value
+        )
+
+        fraction_digit = digit[:, column] & in_fraction[:, column]
+        scale = np.where(fraction_digit, scale / 10, scale)
+        fraction += np.where(fraction_digit, digits[:, column] * scale, 0.0)
+
+        colon = is_colon[:, column]
+        seconds = np.where(colon, (seconds + field_value) * 60, seconds)
+        field_value = np.where(colon, 0.0, field_value)
+
+    return seconds + field_value + fraction
+
+
+def unwrap_clock(seconds: NDArray[np.float64], period: float) -> NDArray[np.float64]:
+    """Add one period for every backwards step, making the clock monotonic."""
+    rollovers = np.cumsum(np.diff(seconds, prepend=seconds[:1]) < 0)
+    return seconds + period * rollovers
+
+
+def parse_timestamps(labels: NDArray) -> NDArray[np.datetime64]:
+    """Parse full STK UTCG ("1 Jun 2024 12:00:00.000") or ISO 8601 timestamps."""
+    import pandas as pd
+
+    if labels.dtype.kind == "S":
+        labels = labels.astype(str)
+    try:
+        times = pd.to_datetime(labels, format=STK_UTCG_FORMAT)
+    except ValueError:
+        times = pd.to_datetime(labels, format="ISO8601")
+    return times.to_numpy(dtype="datetime64[ns]")